@@ -0,0 +1,218 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Offline collectors benchmark: every collector against a synthetic /proc and
+/sys tree (fake_root.py: many mounts, thousands of sockets and pids) and a
+full agent loop iteration (all collectors due + ping + events) against a
+local stub HTTPS server (stub_server.py).
+
+Per benchmark: median / min time (us) and allocations (tracemalloc: peak and
+retained KB of one run). Save the results of a commit with --json and check
+another one against them with --compare: exit 1 if a min time (steadier than
+the median) regressed more than --threshold percent and MIN_REGRESSION_US.
+Same host and fixture sizes, nothing else running.
+
+python3 benchmarks/bench_collectors.py [--iterations N] [--json out.json]
+                                       [--compare base.json] [--threshold 20]
+"""
+# Standard
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+import globals
+from fake_root import FakeRoot
+from stub_server import StubServer
+
+# Smaller changes are noise
+MIN_REGRESSION_US = 20
+SIZES = {"cores": 64, "disks": 24, "mounts": 200, "interfaces": 48, "pids": 3000,
+         "sockets": 5000, "listening": 300}
+
+
+def measure(func, iterations, before=None):
+    """ (median us, min us, peak KB, retained KB) """
+    times = []
+    for _ in range(iterations):
+        if before:
+            before()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1e6)
+    if before:
+        before()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_size = tracemalloc.get_traced_memory()[0]
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_us": round(statistics.median(times), 1),
+        "min_us": round(min(times), 1),
+        "alloc_peak_kb": round((peak - start_size) / 1024, 1),
+        "retained_kb": round((current - start_size) / 1024, 1),
+    }
+
+
+def bench_collectors(fake, iterations):
+    from collectors import (
+        LoadAvgCollector, MemoryCollector, DisksCollector, DiskStatsCollector,
+        NetDevCollector, CpuCollector, TopProcessesCollector, ListenPortsCollector,
+    )
+    results = {}
+    collectors = [
+        LoadAvgCollector(), MemoryCollector(), DisksCollector(), DiskStatsCollector(),
+        NetDevCollector(), CpuCollector(), TopProcessesCollector(), ListenPortsCollector(),
+    ]
+    for collector in collectors:
+        if collector.name == "listen_ports":
+            # Cold: full /proc/<pid>/fd walk of the socket index
+            start = time.perf_counter()
+            collector.collect()
+            results["listen_ports_first"] = {
+                "median_us": round((time.perf_counter() - start) * 1e6, 1)
+            }
+        else:
+            # First sample of the rate collectors
+            collector.collect()
+            fake.tick()
+        result = collector.collect()
+        if result is None:
+            raise RuntimeError(f"Collector {collector.name} returned no data on the fixture")
+        results[collector.name] = measure(collector.collect, iterations, before=fake.tick)
+        if hasattr(collector, "statvfs_pool"):
+            collector.statvfs_pool.shutdown()
+
+    return results
+
+
+def bench_loop(fake, tmp, iterations):
+    import monnet_agent_linux as agent
+    from collectors import (
+        CollectorRegistry, LoadAvgCollector, MemoryCollector, DisksCollector,
+        DiskStatsCollector, NetDevCollector, CpuCollector, TopProcessesCollector,
+        ListenPortsCollector,
+    )
+    from datastore import Datastore
+    from event_processor import EventProcessor
+    from metrics_history import MetricsHistory
+    from stats_buffer import MetricSampler
+
+    server = StubServer().start()
+    agent.config = {
+        "token": "bench", "id": 1, "interval": 5, "default_interval": 5, "ignore_cert": True,
+        "server_host": server.address, "server_endpoint": "/",
+    }
+    registry = CollectorRegistry()
+    for collector in (LoadAvgCollector(), MemoryCollector(), DisksCollector(),
+                      DiskStatsCollector(), NetDevCollector(), CpuCollector(),
+                      TopProcessesCollector(), ListenPortsCollector()):
+        registry.register(collector)
+    datastore = Datastore(os.path.join(tmp, "datastore.json"))
+    event_processor = EventProcessor()
+    sampler = MetricSampler()
+    history = MetricsHistory(os.path.join(tmp, "history"))
+
+    def iteration():
+        for collector in registry.collectors.values():
+            collector.next_run = 0
+        agent.collect(registry, datastore, sampler, history)
+        agent.ping(registry, datastore, event_processor, None, history)
+
+    # First samples and cold caches
+    for _ in range(2):
+        iteration()
+        fake.tick()
+    try:
+        result = measure(iteration, iterations, before=fake.tick)
+        result["requests"] = server.requests
+    finally:
+        registry.shutdown()
+        history.close()
+        server.stop()
+
+    return {"loop": result}
+
+
+def compare(results, base_file, threshold):
+    """ Print the min time changes, True if some regressed over threshold percent """
+    with open(base_file, "r") as f:
+        base = json.load(f)["results"]
+    regressed = False
+    print(f"\nAgainst {base_file} (min us):")
+    for name, result in results.items():
+        field = "min_us" if "min_us" in result else "median_us"
+        old = base.get(name, {}).get(field)
+        if not old:
+            continue
+        new = result[field]
+        change = (new - old) / old * 100
+        flag = ""
+        if change > threshold and new - old > MIN_REGRESSION_US:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"  {name:20s} {old:12.1f} -> {new:12.1f} us  {change:+6.1f}%{flag}")
+
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--json", help="save the results")
+    parser.add_argument("--compare", help="results file to compare with")
+    parser.add_argument("--threshold", type=float, default=20,
+                        help="regression percent (default 20)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        fake = FakeRoot(tmp, **SIZES).build()
+        print(f"Fixture built in {time.perf_counter() - start:.1f}s: {SIZES}")
+        globals.PROC_ROOT = fake.proc
+        globals.SYS_ROOT = fake.sys
+        # Emitted debug messages would measure syslog
+        from log_linux import set_log_level
+        set_log_level("info")
+
+        results = bench_collectors(fake, args.iterations)
+        results.update(bench_loop(fake, tmp, args.iterations))
+
+    print(f"\n{'benchmark':20s} {'median us':>12s} {'min us':>12s} {'peak KB':>10s} {'kept KB':>10s}")
+    for name, result in results.items():
+        print(f"{name:20s} " + " ".join(
+            f"{result[field]:{width}.1f}" if field in result else f"{'-':>{width}s}"
+            for field, width in (("median_us", 12), ("min_us", 12),
+                                 ("alloc_peak_kb", 10), ("retained_kb", 10))
+        ))
+
+    if args.json:
+        try:
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                    text=True, cwd=os.path.dirname(__file__)).stdout.strip()
+        except OSError:
+            commit = None
+        with open(args.json, "w") as f:
+            json.dump({
+                "meta": {"commit": commit, "python": platform.python_version(),
+                         "sizes": SIZES, "iterations": args.iterations},
+                "results": results
+            }, f, indent=2)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Listening ports scan: native /proc/net and sock_diag against `ss -tulnp`
+
+Opens thousands of listening sockets in this process and forks idle children
+holding open files (many processes / fds to walk) then times each method.
+
+python3 benchmarks/bench_listen_ports.py [tcp_sockets] [udp_sockets] [iterations] [children]
+"""
+# Standard
+import sys
+import os
+import resource
+import signal
+import socket
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+import proc_net
+import info_linux
+from socket_index import SocketInodeIndex
+
+
+def open_sockets(tcp_count, udp_count):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = tcp_count + udp_count + 256
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+    sockets = []
+    for _ in range(tcp_count):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.bind(("127.0.0.1", 0))
+        s.listen()
+        sockets.append(s)
+    for _ in range(udp_count):
+        s = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+        s.bind(("::1", 0))
+        sockets.append(s)
+
+    return sockets
+
+
+def fork_children(count, files=64):
+    """ Idle children with open files, they also inherit the listening sockets """
+    pids = []
+    for _ in range(count):
+        pid = os.fork()
+        if pid == 0:
+            handles = [open(os.devnull, "rb") for _ in range(files)]
+            signal.pause()
+            os._exit(len(handles))
+        pids.append(pid)
+
+    return pids
+
+
+def bench(label, func, iterations):
+    try:
+        func()
+    except (OSError, FileNotFoundError) as e:
+        print(f"{label:<32} unavailable: {e}")
+        return
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(iterations):
+        result = func()
+    wall_ms = (time.perf_counter() - start) / iterations * 1000
+    cpu_ms = (time.process_time() - cpu_start) / iterations * 1000
+    print(f"{label:<32} {len(result):>7} items {wall_ms:>9.2f} ms wall {cpu_ms:>9.2f} ms cpu")
+
+
+def main():
+    tcp_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    udp_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    children = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    sockets = open_sockets(tcp_count, udp_count)
+    # Children fork after the sockets: they share them, like prefork servers
+    pids = fork_children(children)
+    time.sleep(0.5)
+    print(f"{len(sockets)} sockets opened, {children} children, {iterations} iterations\n")
+
+    bench("proc_net.read_listen_sockets", proc_net.read_listen_sockets, iterations)
+    bench("proc_net.netlink_listen_sockets", proc_net.netlink_listen_sockets, iterations)
+    bench("proc_net.socket_owners", proc_net.socket_owners, iterations)
+    bench("native get_listen_ports_info", info_linux.get_listen_ports_info, iterations)
+    # Warm incremental index, steady state between runs
+    socket_index = SocketInodeIndex()
+    bench(
+        "native + SocketInodeIndex",
+        lambda: info_linux.get_listen_ports_info(socket_index), iterations
+    )
+    # ss cpu time is on the child, wall time is the relevant one
+    bench("ss get_listen_ports_info_ss", info_linux.get_listen_ports_info_ss, iterations)
+
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+    for s in sockets:
+        s.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Per call logging cost: old log() (level dict, openlog/closelog every message,
+payload formatted by the caller) against the queued writer with lazy args,
+for a filtered (debug with max level info) and an emitted message.
+
+python3 benchmarks/bench_logging.py [iterations]
+"""
+# Standard
+import sys
+import os
+import syslog
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+import log_linux
+
+PAYLOAD = {
+    "id": 1, "cmd": "ping", "token": "73a7a18ce78742aa8aadacbe6a918dd8",
+    "data": {"disksinfo": [{"mountpoint": f"/m{i}", "percent": 50.1} for i in range(10)]},
+}
+
+
+def old_log(message, priority="info", max_level="info"):
+    syslog_level = {
+        "emerg": syslog.LOG_EMERG,
+        "alert": syslog.LOG_ALERT,
+        "crit": syslog.LOG_CRIT,
+        "err": syslog.LOG_ERR,
+        "warning": syslog.LOG_WARNING,
+        "notice": syslog.LOG_NOTICE,
+        "info": syslog.LOG_INFO,
+        "debug": syslog.LOG_DEBUG,
+    }
+    if priority not in syslog_level:
+        raise ValueError(priority)
+    if max_level not in syslog_level:
+        raise ValueError(max_level)
+    if syslog_level[priority] <= syslog_level[max_level]:
+        syslog.openlog(logoption=syslog.LOG_PID, facility=syslog.LOG_USER)
+        syslog.syslog(syslog_level[priority], message)
+        syslog.closelog()
+
+
+def timed(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    log_linux.set_log_level("info")
+    results = [
+        ("old filtered", timed(lambda: old_log(f"Payload: {PAYLOAD}", "debug"), iterations)),
+        ("new filtered", timed(lambda: log_linux.log("Payload: %s", "debug", PAYLOAD), iterations)),
+        ("old emitted", timed(lambda: old_log(f"Payload: {PAYLOAD}", "info"), iterations)),
+    ]
+    # Emitted: caller cost, the writer thread drains the queue meanwhile
+    batch = min(iterations, log_linux.LOG_QUEUE_SIZE // 2)
+    elapsed = 0.0
+    for _ in range(0, iterations, batch):
+        elapsed += timed(lambda: log_linux.log("Payload: %s", "info", PAYLOAD), batch) * batch
+        log_linux.writer.stop()
+    results.append(("new emitted", elapsed / iterations))
+    for name, cost in results:
+        print(f"{name:14s} {cost:8.2f} us/call")
+    print(f"dropped {log_linux.writer.dropped}")
+
+
+if __name__ == "__main__":
+    main()
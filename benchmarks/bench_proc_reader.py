@@ -0,0 +1,88 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Per tick /proc cost: open + parse everything against the persistent
+descriptors reader (proc_reader)
+
+python3 benchmarks/bench_proc_reader.py [iterations]
+"""
+# Standard
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+import info_linux
+from proc_reader import proc_reader
+
+
+def old_memory_info():
+    meminfo = {}
+    with open("/proc/meminfo", "r") as f:
+        for line in f:
+            key, value = line.split(":")
+            meminfo[key.strip()] = int(value.split()[0]) * 1024
+
+    return meminfo
+
+
+def old_cpu_stats():
+    with open("/proc/stat", "r") as f:
+        for line in f:
+            if line.startswith("cpu "):
+                parts = line.split()
+                return tuple(map(int, parts[1:6]))
+    return None
+
+
+def old_uptime():
+    with open('/proc/uptime', 'r') as f:
+        return float(f.readline().split()[0])
+
+
+def old_tick():
+    old_memory_info()
+    old_cpu_stats()
+    old_uptime()
+
+
+def new_tick():
+    proc_reader.meminfo()
+    proc_reader.cpu_times()
+    proc_reader.uptime()
+
+
+def bench(label, func, iterations):
+    func()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(iterations):
+        func()
+    wall_us = (time.perf_counter() - start) / iterations * 1000000
+    cpu_us = (time.process_time() - cpu_start) / iterations * 1000000
+    print(f"{label:<28} {wall_us:>9.1f} us wall {cpu_us:>9.1f} us cpu")
+
+    return wall_us
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{iterations} iterations\n")
+
+    bench("meminfo open+parse all", old_memory_info, iterations)
+    bench("meminfo proc_reader", proc_reader.meminfo, iterations)
+    bench("stat open+parse", old_cpu_stats, iterations)
+    bench("stat proc_reader", proc_reader.cpu_times, iterations)
+    bench("uptime open+parse", old_uptime, iterations)
+    bench("uptime proc_reader", proc_reader.uptime, iterations)
+    bench("get_memory_info()", info_linux.get_memory_info, iterations)
+    print()
+    before = bench("tick before", old_tick, iterations)
+    after = bench("tick after", new_tick, iterations)
+    print(f"\nspeedup x{before / after:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Top processes scan cost with many processes
+
+Forks idle children and times ProcessTable.scan() + top()
+
+python3 benchmarks/bench_process_table.py [children] [iterations]
+"""
+# Standard
+import sys
+import os
+import signal
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from process_table import ProcessTable
+
+
+def fork_children(count):
+    pids = []
+    for _ in range(count):
+        pid = os.fork()
+        if pid == 0:
+            signal.pause()
+            os._exit(0)
+        pids.append(pid)
+
+    return pids
+
+
+def main():
+    children = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    pids = fork_children(children)
+    try:
+        table = ProcessTable()
+        table.scan()
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        for _ in range(iterations):
+            table.scan()
+            table.top()
+        wall_ms = (time.perf_counter() - start) / iterations * 1000
+        cpu_ms = (time.process_time() - cpu_start) / iterations * 1000
+        print(
+            f"{len(table.slots)} processes tracked, {iterations} iterations: "
+            f"{wall_ms:.2f} ms wall {cpu_ms:.2f} ms cpu per scan"
+        )
+    finally:
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+        for pid in pids:
+            os.waitpid(pid, 0)
+
+
+if __name__ == "__main__":
+    main()
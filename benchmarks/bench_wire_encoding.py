@@ -0,0 +1,109 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Bytes per ping and CPU per encode of the wire encodings
+
+python3 benchmarks/bench_wire_encoding.py [iterations]
+"""
+# Standard
+import sys
+import os
+import json
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from wire_encoding import WireEncoder, msgpack
+from delta_encoder import DeltaEncoder
+
+
+def build_meta():
+    return {
+        "timestamp": "2024-12-01T10:00:00.000000+00:00",
+        "timezone": "CET",
+        "hostname": "host-0001.example.net",
+        "nodename": "host-0001",
+        "ip_address": "192.168.1.10",
+        "agent_version": "0.131",
+        "uuid": "0f8fad5b-d9cb-469f-a165-70867728950e"
+    }
+
+
+def build_state(mounts=20):
+    return {
+        "loadavg": {"1min": 0.52, "5min": 0.61, "15min": 0.7, "usage": 13.0},
+        "meminfo": {
+            "total": 15934, "available": 9811, "free": 2012, "used": 6123,
+            "cache_used": 7011, "cache_percent": 44.0, "percent": 38.43
+        },
+        "disksinfo": [
+            {
+                "device": f"/dev/sd{chr(97 + i % 26)}{i}", "mountpoint": f"/mnt/vol{i}",
+                "fstype": "ext4", "total": 102400, "used": 40960 + i, "free": 61440 - i,
+                "percent": 40.0
+            } for i in range(mounts)
+        ],
+        "iowait": 0.25
+    }
+
+
+def build_payload(data, meta):
+    return {
+        "id": 12, "cmd": "ping", "token": "73a7a18ce78742aa8aadacbe6a918dd8",
+        "interval": 10, "version": "0.131", "data": data, "meta": meta
+    }
+
+
+def bench(label, encoder, payload, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        body, _headers = encoder.encode(payload)
+    cpu_us = (time.process_time() - start) / iterations * 1e6
+    print(f"{label:<40} {len(body):>8} bytes {cpu_us:>10.1f} us/encode")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    meta = build_meta()
+    state = build_state()
+
+    # Delta payload: one disk changed
+    delta_encoder = DeltaEncoder(full_every=100)
+    delta_encoder.encode(state)
+    changed = build_state()
+    changed["disksinfo"][3]["used"] += 1
+    delta = delta_encoder.encode(changed)
+
+    samples = {
+        "full state": state,
+        "delta one disk": delta,
+    }
+
+    baseline_len = len(json.dumps(build_payload(state, meta)))
+    start = time.process_time()
+    for _ in range(iterations):
+        json.dumps(build_payload(state, meta))
+    baseline_us = (time.process_time() - start) / iterations * 1e6
+    print(f"{'baseline json.dumps full state':<40} {baseline_len:>8} bytes "
+          f"{baseline_us:>10.1f} us/encode")
+
+    encodings = ["json"] + (["msgpack"] if msgpack else [])
+    for name, data in samples.items():
+        for encoding in encodings:
+            for use_gzip in (False, True):
+                for acked in (False, True):
+                    encoder = WireEncoder()
+                    encoder.encoding = encoding
+                    encoder.gzip = use_gzip
+                    encoder.compact_meta(meta)
+                    if acked:
+                        encoder.meta_acked = encoder.meta_id
+                    payload = build_payload(data, encoder.compact_meta(meta))
+                    label = f"{name} {encoding}{'+gzip' if use_gzip else ''}"
+                    label += " meta_ack" if acked else ""
+                    bench(label, encoder, payload, iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Synthetic /proc and /sys trees for the collector benchmarks (globals.PROC_ROOT
+and globals.SYS_ROOT pointed at them). Deterministic: same sizes, same content.
+
+FakeRoot(path, **sizes).build() writes:
+    proc: meminfo, stat (+ intr), uptime, loadavg, diskstats, net/dev,
+          net/{tcp,tcp6,udp,udp6}, net/route, mounts, self/mountinfo,
+          <pid>/{stat,comm,fd/*} (socket fds link to the net/* inodes)
+    sys:  block/* (physical and virtual), class/net/*/speed
+    mnt:  one directory per disk mount (statvfs target)
+
+tick() advances the counters (stat, diskstats, net/dev) in place: the files
+keep their inode, as the persistent descriptors of proc_reader expect.
+"""
+# Standard
+import os
+import random
+
+MEMINFO_KEYS = (
+    "MemTotal", "MemFree", "MemAvailable", "Buffers", "Cached", "SwapCached", "Active",
+    "Inactive", "Active(anon)", "Inactive(anon)", "Active(file)", "Inactive(file)",
+    "Unevictable", "Mlocked", "SwapTotal", "SwapFree", "Zswap", "Zswapped", "Dirty",
+    "Writeback", "AnonPages", "Mapped", "Shmem", "KReclaimable", "Slab", "SReclaimable",
+    "SUnreclaim", "KernelStack", "PageTables", "SecPageTables", "NFS_Unstable", "Bounce",
+    "WritebackTmp", "CommitLimit", "Committed_AS", "VmallocTotal", "VmallocUsed",
+    "VmallocChunk", "Percpu", "HardwareCorrupted", "AnonHugePages", "ShmemHugePages",
+    "ShmemPmdMapped", "FileHugePages", "FilePmdMapped", "HugePages_Total", "HugePages_Free",
+    "HugePages_Rsvd", "HugePages_Surp", "Hugepagesize", "Hugetlb", "DirectMap4k",
+    "DirectMap2M", "DirectMap1G",
+)
+NET_HEADER = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt" \
+             "   uid  timeout inode\n"
+COMMS = ("nginx", "postgres", "java", "python3", "sshd", "systemd", "bash", "node", "redis-server")
+
+
+class FakeRoot:
+    """ Synthetic host tree under path """
+    def __init__(self, path: str, cores: int = 64, disks: int = 24, mounts: int = 200,
+                 interfaces: int = 48, pids: int = 3000, sockets: int = 5000,
+                 listening: int = 300):
+        self.path = path
+        self.proc = os.path.join(path, "proc")
+        self.sys = os.path.join(path, "sys")
+        self.cores = cores
+        self.disks = disks
+        self.mounts = mounts
+        self.interfaces = interfaces
+        self.pids = pids
+        self.sockets = sockets
+        self.listening = listening
+        self.ticks = 0
+        self.random = random.Random(42)
+
+    def _write(self, relative: str, content: str):
+        filename = os.path.join(self.path, relative)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # In place: same inode
+        with open(filename, "w") as f:
+            f.write(content)
+
+    def build(self) -> "FakeRoot":
+        """ Write the whole tree """
+        self._meminfo()
+        self._mounts()
+        self._net_sockets()
+        self._processes()
+        self._sys()
+        self._write("proc/loadavg", "1.25 0.98 0.77 3/1520 43210\n")
+        self._write("proc/net/route",
+                    "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+                    "eth0\t00000000\t0102A8C0\t0003\t0\t0\t100\t00000000\t0\t0\t0\n")
+        self.tick()
+
+        return self
+
+    def tick(self):
+        """ Advance the counters of stat, diskstats, net/dev and uptime """
+        self.ticks += 1
+        rnd = self.random
+        t = self.ticks
+        lines = []
+        for row in range(self.cores + 1):
+            scale = self.cores if row == 0 else 1
+            name = "cpu " if row == 0 else f"cpu{row - 1} "
+            values = [(1000 + t * rnd.randint(5, 40)) * scale, 10 * scale,
+                      (500 + t * rnd.randint(2, 20)) * scale, (90000 + t * rnd.randint(40, 90)) * scale,
+                      (100 + t * rnd.randint(0, 5)) * scale, 0, 50 * scale, 0, 0, 0]
+            lines.append(name + " ".join(map(str, values)))
+        lines.append("intr " + " ".join(str(t * rnd.randint(0, 100)) for _ in range(1200)))
+        lines.append(f"ctxt {t * 123456}\nbtime 1700000000\nprocesses {40000 + t}")
+        lines.append("procs_running 3\nprocs_blocked 0")
+        lines.append("softirq " + " ".join(str(t * rnd.randint(0, 1000)) for _ in range(11)))
+        self._write("proc/stat", "\n".join(lines) + "\n")
+
+        lines = []
+        for index in range(self.disks):
+            for name in [f"sd{self._disk(index)}"] + [f"sd{self._disk(index)}{p}" for p in (1, 2)]:
+                values = [t * 120, 5, t * 9600, t * 300, t * 80, 2, t * 6400, t * 200,
+                          0, t * 350, t * 500, 0, 0, 0, 0, 0, 0]
+                lines.append(f"   8       {index * 16} {name} " + " ".join(map(str, values)))
+        for index in range(8):
+            lines.append(f"   7       {index} loop{index} 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0")
+        self._write("proc/diskstats", "\n".join(lines) + "\n")
+
+        lines = ["Inter-|   Receive                                                |  Transmit",
+                 " face |bytes    packets errs drop fifo frame compressed multicast"
+                 "|bytes    packets errs drop fifo colls carrier compressed"]
+        for name in self._interfaces():
+            rx = t * rnd.randint(10000, 10000000)
+            tx = t * rnd.randint(10000, 10000000)
+            lines.append(f"{name:>6}: {rx} {rx // 1000} 0 {t % 3} 0 0 0 0 "
+                         f"{tx} {tx // 1000} 0 0 0 0 0 0")
+        self._write("proc/net/dev", "\n".join(lines) + "\n")
+        self._write("proc/uptime", f"{100000 + t}.42 {6000000 + t * 60}.10\n")
+
+    @staticmethod
+    def _disk(index: int) -> str:
+        return chr(ord("a") + index % 26) * (1 + index // 26)
+
+    def _interfaces(self):
+        physical = max(1, self.interfaces // 4)
+        return (["lo"] + [f"eth{i}" for i in range(physical)]
+                + [f"veth{i:04x}" for i in range(self.interfaces - physical)])
+
+    def _meminfo(self):
+        lines = []
+        for index, key in enumerate(MEMINFO_KEYS):
+            value = 65536000 if key == "MemTotal" else 1000 + index * 7919
+            lines.append(f"{key + ':':<16}{value:>8} kB")
+        self._write("proc/meminfo", "\n".join(lines) + "\n")
+
+    def _mounts(self):
+        mountinfo = []
+        mounts = []
+        for index in range(self.mounts):
+            if index < self.disks * 2:
+                mountpoint = os.path.join(self.path, "mnt", f"disk{index}")
+                os.makedirs(mountpoint, exist_ok=True)
+                device, fstype = f"/dev/sd{self._disk(index // 2)}{index % 2 + 1}", "ext4"
+            elif index % 3:
+                mountpoint, device, fstype = f"/run/user/{index}", "tmpfs", "tmpfs"
+            else:
+                mountpoint, device, fstype = f"/var/lib/docker/overlay2/{index:064x}/merged", \
+                    "overlay", "overlay"
+            mountinfo.append(f"{index + 20} 1 8:{index} / {mountpoint} rw,relatime shared:{index} "
+                             f"- {fstype} {device} rw,errors=remount-ro")
+            mounts.append(f"{device} {mountpoint} {fstype} rw,relatime 0 0")
+        self._write("proc/self/mountinfo", "\n".join(mountinfo) + "\n")
+        self._write("proc/mounts", "\n".join(mounts) + "\n")
+
+    def _net_sockets(self):
+        files = {"tcp": [], "tcp6": [], "udp": [], "udp6": []}
+        for inode in range(1, self.sockets + 1):
+            name = ("tcp", "tcp", "tcp6", "udp", "udp6")[inode % 5]
+            listen = inode <= self.listening
+            state = ("0A" if name.startswith("tcp") else "07") if listen else "01"
+            port = 1000 + inode if listen else 40000 + inode % 20000
+            if name.endswith("6"):
+                local = f"00000000000000000000000000000000:{port:04X}"
+                remote = f"0000000000000000FFFF00000100007F:{(443 if not listen else 0):04X}"
+            else:
+                local = f"0100007F:{port:04X}" if inode % 2 else f"00000000:{port:04X}"
+                remote = "00000000:0000" if listen else "0A00000A:01BB"
+            files[name].append(f"{len(files[name]):4d}: {local} {remote} {state} 00000000:00000000 "
+                               f"00:00000000 00000000  1000        0 {inode} 1 0000000000000000 "
+                               "100 0 0 10 0")
+        for name, lines in files.items():
+            self._write(f"proc/net/{name}", NET_HEADER + "\n".join(lines) + "\n")
+
+    def _processes(self):
+        for pid in range(1, self.pids + 1):
+            comm = COMMS[pid % len(COMMS)]
+            fields = ["S", "1", str(pid), str(pid), "0", "-1", "4194560", "1000", "0", "0", "0",
+                      str(pid * 13 % 100000), str(pid * 7 % 50000), "0", "0", "20", "0", "1", "0",
+                      str(1000 + pid), str(100000000 + pid * 4096), str(2000 + pid % 50000)]
+            fields += ["0"] * 30
+            self._write(f"proc/{pid}/stat", f"{pid} ({comm}) " + " ".join(fields) + "\n")
+            self._write(f"proc/{pid}/comm", comm + "\n")
+            fd_dir = os.path.join(self.proc, str(pid), "fd")
+            os.makedirs(fd_dir, exist_ok=True)
+            targets = ["/dev/null", "/dev/null", "/dev/null", f"/var/log/{comm}.log"]
+            # Sockets spread over the processes
+            targets += [f"socket:[{inode}]" for inode in range(pid, self.sockets + 1, self.pids)]
+            for fd, target in enumerate(targets):
+                link = os.path.join(fd_dir, str(fd))
+                if not os.path.islink(link):
+                    os.symlink(target, link)
+
+    def _sys(self):
+        for index in range(self.disks):
+            name = f"sd{self._disk(index)}"
+            device = os.path.join(self.sys, "devices", "pci0000:00", f"0000:00:{index:02x}.0",
+                                  "block", name)
+            os.makedirs(device, exist_ok=True)
+            self._link(device, os.path.join(self.sys, "block", name))
+        for index in range(8):
+            device = os.path.join(self.sys, "devices", "virtual", "block", f"loop{index}")
+            os.makedirs(device, exist_ok=True)
+            self._link(device, os.path.join(self.sys, "block", f"loop{index}"))
+        for name in self._interfaces():
+            if name.startswith("eth"):
+                self._write(f"sys/class/net/{name}/speed", "10000\n")
+
+    @staticmethod
+    def _link(target: str, link: str):
+        os.makedirs(os.path.dirname(link), exist_ok=True)
+        if not os.path.islink(link):
+            os.symlink(target, link)
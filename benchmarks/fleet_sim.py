@@ -0,0 +1,546 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Fleet simulator: N virtual agents in one process (asyncio) to load test the
+Monnet server
+
+Every virtual agent follows the agent protocol (see monnet_agent_linux.py):
+starting notification, ping every interval (server "refresh" applied) with the
+changed collectors data, rule events of its metrics (EventProcessor +
+EventAggregator) as notifications and app_shutdown at the end. Each one has its
+own id (--first-id + n), token (--token, or --token-prefix + id), hostname and
+a seeded metrics random walk with CPU / memory / disk incidents (--incidents:
+probability per ping).
+
+--local starts a stand-in server (asyncio version of stub_server.py: pong to
+every request) and points the agents to it. Notifications wait the response
+(the agent closes without reading it) to measure the server time.
+
+Report: requests and failures per command, achieved request rate and server
+latency (connect + TLS + request + response, as the agent sees it) percentiles.
+
+python3 benchmarks/fleet_sim.py --local --agents 2000 --duration 120
+python3 benchmarks/fleet_sim.py --server monnet.example:443 --endpoint /feedme.php \\
+                                --token-prefix sim --agents 500 --ignore-cert
+"""
+
+# Standard
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import signal
+import ssl
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+import globals
+import time_utils
+from constants import LogLevel
+from constants import EventType
+from datastore import Datastore
+from event_processor import EventProcessor
+from event_aggregator import EventAggregator
+from log_linux import set_log_level
+from stub_server import self_signed_context
+from wire_encoding import WireEncoder
+
+# Concurrent requests (open connections / file descriptors)
+MAX_CONNECTIONS = 256
+# Request timeout (seconds)
+TIMEOUT = 30
+# Progress line every (seconds)
+REPORT_INTERVAL = 10
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """ Nearest rank percentile of a sorted list """
+    if not ordered:
+        return 0.0
+
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class FleetStats:
+    """ Requests, failures, latencies and bytes per command """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.bytes_sent = 0
+        self.missed_pings = 0
+        # Progress window
+        self.window_requests = 0
+        self.window_latencies: List[float] = []
+
+    def success(self, cmd: str, latency: float, sent: int):
+        """ Answered request """
+        self.requests[cmd] = self.requests.get(cmd, 0) + 1
+        self.latencies.setdefault(cmd, []).append(latency)
+        self.bytes_sent += sent
+        self.window_requests += 1
+        self.window_latencies.append(latency)
+
+    def failure(self, cmd: str, error: Exception):
+        """ Request without answer """
+        self.failures[cmd] = self.failures.get(cmd, 0) + 1
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def progress(self, elapsed: float, in_flight: int) -> str:
+        """ Window line and new window """
+        ordered = sorted(self.window_latencies)
+        line = (f"[{time.monotonic() - self.started:6.0f}s]"
+                f" {self.window_requests / elapsed:8.1f} req/s"
+                f"  p50 {percentile(ordered, 0.5) * 1000:7.1f} ms"
+                f"  p95 {percentile(ordered, 0.95) * 1000:7.1f} ms"
+                f"  failures {sum(self.failures.values())}  in flight {in_flight}")
+        self.window_requests = 0
+        self.window_latencies = []
+
+        return line
+
+    def report(self, agents: int, interval: float) -> str:
+        """ Final report """
+        elapsed = time.monotonic() - self.started
+        total = sum(self.requests.values())
+        lines = [
+            f"Agents {agents}, interval {interval}s, {elapsed:.1f}s",
+            f"Requests {total} ({total / elapsed:.1f} req/s, ping target "
+            f"{agents / interval:.1f} req/s), failures {sum(self.failures.values())}, "
+            f"missed pings {self.missed_pings}, sent {self.bytes_sent / 1024 ** 2:.2f} MB",
+            f"{'command':24s} {'ok':>8s} {'failed':>8s} {'p50 ms':>9s} {'p95 ms':>9s} "
+            f"{'p99 ms':>9s} {'max ms':>9s}",
+        ]
+        for cmd in sorted(set(self.requests) | set(self.failures)):
+            ordered = sorted(self.latencies.get(cmd, []))
+            lines.append(
+                f"{cmd:24s} {self.requests.get(cmd, 0):8d} {self.failures.get(cmd, 0):8d} "
+                + " ".join(f"{percentile(ordered, fraction) * 1000:9.1f}"
+                           for fraction in (0.5, 0.95, 0.99, 1.0))
+            )
+        if self.errors:
+            lines.append(f"Errors: {self.errors}")
+
+        return "\n".join(lines)
+
+
+class Fleet:
+    """ Shared HTTPS client side of the virtual agents """
+    def __init__(self, server: str, endpoint: str, ignore_cert: bool,
+                 max_connections: int, timeout: float):
+        host, _, port = server.partition(":")
+        self.host = host
+        self.port = int(port or 443)
+        self.endpoint = endpoint
+        if ignore_cert:
+            self.context = ssl._create_unverified_context()
+        else:
+            self.context = ssl.create_default_context()
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.stats = FleetStats()
+
+    @property
+    def in_flight(self) -> int:
+        """ Open requests """
+        return self.max_connections - self.semaphore._value
+
+    async def post(self, cmd: str, body: bytes, headers: dict) -> Optional[dict]:
+        """
+        POST a payload (one connection per request, as the agent)
+
+        Returns:
+            dict or None: json response, None on error
+        """
+        async with self.semaphore:
+            start = time.monotonic()
+            try:
+                status, raw = await asyncio.wait_for(self._request(body, headers), self.timeout)
+            except (OSError, asyncio.TimeoutError, ssl.SSLError, ValueError) as e:
+                self.stats.failure(cmd, e)
+                return None
+            self.stats.success(cmd, time.monotonic() - start, len(body))
+        if status != 200:
+            self.stats.failure(cmd, ValueError(f"HTTP {status}"))
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            self.stats.failure(cmd, e)
+            return None
+
+    async def _request(self, body: bytes, headers: dict) -> Tuple[int, bytes]:
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self.context, server_hostname=self.host
+        )
+        try:
+            head = [f"POST {self.endpoint} HTTP/1.1", f"Host: {self.host}",
+                    f"Content-Length: {len(body)}", "Connection: close"]
+            head += [f"{name}: {value}" for name, value in headers.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+
+        return parse_response(response)
+
+
+def parse_response(response: bytes) -> Tuple[int, bytes]:
+    """ (status, body) of a raw HTTP/1.1 response (Content-Length, chunked or close) """
+    head, _, body = response.partition(b"\r\n\r\n")
+    lines = head.split(b"\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get(b"transfer-encoding", b"").lower() == b"chunked":
+        chunks = []
+        while body:
+            size_line, _, body = body.partition(b"\r\n")
+            size = int(size_line.split(b";")[0], 16)
+            if size == 0:
+                break
+            chunks.append(body[:size])
+            body = body[size + 2:]
+        body = b"".join(chunks)
+    elif b"content-length" in headers:
+        body = body[:int(headers[b"content-length"])]
+    if headers.get(b"content-encoding") == b"gzip":
+        body = gzip.decompress(body)
+
+    return status, body
+
+
+class VirtualAgent:
+    """ One simulated host """
+    def __init__(self, fleet: Fleet, idx: int, token: str, interval: float,
+                 incidents: float, seed: int):
+        self.fleet = fleet
+        self.idx = idx
+        self.token = token
+        self.interval = interval
+        self.incidents = incidents
+        self.random = rnd = random.Random(seed)
+        self.wire_encoder = WireEncoder()
+        self.datastore = Datastore(os.devnull)
+        self.event_processor = EventProcessor()
+        self.event_aggregator = EventAggregator()
+        hostname = f"sim-{idx:05d}"
+        self.static_meta = {
+            "timezone": "UTC", "hostname": hostname, "nodename": hostname,
+            "ip_address": f"10.{idx // 65536 % 256}.{idx // 256 % 256}.{idx % 256}",
+            "agent_version": str(globals.AGENT_VERSION),
+        }
+        self.ncpu = rnd.choice((2, 4, 8, 16))
+        self.cpu_base = rnd.uniform(3, 50)
+        self.memory_total = rnd.choice((2048, 4096, 8192, 16384, 65536))
+        self.memory_base = rnd.uniform(20, 70)
+        self.disks = [
+            {"device": f"/dev/sda{n + 1}", "mountpoint": mountpoint, "fstype": "ext4",
+             "total": rnd.choice((20480, 102400, 512000)), "percent": rnd.uniform(10, 75)}
+            for n, mountpoint in enumerate(("/", "/var", "/home", "/srv")[:rnd.randint(1, 4)])
+        ]
+        # incident: (kind, until)
+        self.incident: Optional[Tuple[str, float]] = None
+        self.uptime = rnd.uniform(3600, 90 * 86400)
+
+    def _meta(self) -> dict:
+        meta = {"timestamp": time_utils.get_datatime(), "uuid": f"{self.idx}-{time.time_ns()}"}
+        meta.update(self.static_meta)
+
+        return self.wire_encoder.compact_meta(meta)
+
+    async def _send(self, cmd: str, data: dict) -> Optional[dict]:
+        payload = {
+            "id": self.idx,
+            "cmd": cmd,
+            "token": self.token,
+            "version": globals.AGENT_VERSION,
+            "encodings": self.wire_encoder.capabilities(),
+            "data": data,
+            "meta": self._meta(),
+        }
+        if cmd == "ping":
+            payload["interval"] = self.interval
+        body, headers = self.wire_encoder.encode(payload)
+        name = data.get("name", cmd) if cmd == "notification" else cmd
+        response = await self.fleet.post(name, body, headers)
+        if response is None:
+            # As the agent: full meta after a failed request
+            self.wire_encoder.forget_meta()
+
+        return response
+
+    async def notify(self, name: str, data: dict):
+        """ Notification, the response is not used (as the agent) """
+        data = dict(data)
+        data["name"] = name
+        await self._send("notification", data)
+
+    def sample(self, now: float) -> List[Tuple[str, dict, dict]]:
+        """
+        Metrics random walk step
+
+        Returns:
+            list: (datastore key, collector result, ping payload)
+        """
+        rnd = self.random
+        if self.incident and self.incident[1] <= now:
+            self.incident = None
+        if self.incident is None and rnd.random() < self.incidents:
+            self.incident = (rnd.choice(("cpu", "memory", "disk")), now + rnd.uniform(60, 300))
+        kind = self.incident[0] if self.incident else None
+
+        usage = rnd.uniform(92, 99) if kind == "cpu" else \
+            min(100.0, max(0.0, self.cpu_base + rnd.gauss(0, 5)))
+        iowait = round(abs(rnd.gauss(0, 1.5)), 2)
+        total = {"usage": round(usage, 2), "user": round(usage * 0.7, 2), "nice": 0.0,
+                 "system": round(usage * 0.3, 2), "idle": round(100 - usage - iowait, 2),
+                 "iowait": iowait, "irq": 0.0, "softirq": 0.1, "steal": 0.0}
+        cores = [
+            dict(total, core=core, usage=round(min(100.0, max(0.0, usage + rnd.gauss(0, 8))), 2))
+            for core in range(self.ncpu)
+        ]
+        cpu = {"total": total, "cores": cores}
+        load1 = round(usage / 100 * self.ncpu, 2)
+        loadavg = {"loadavg": {"1min": load1, "5min": round(load1 * 0.9, 2),
+                               "15min": round(load1 * 0.8, 2),
+                               "usage": round(load1 / self.ncpu * 100, 2)}}
+
+        self.memory_base = min(85.0, max(5.0, self.memory_base + rnd.gauss(0, 0.5)))
+        percent = rnd.uniform(91, 98) if kind == "memory" else self.memory_base
+        used = int(self.memory_total * percent / 100)
+        memory = {"meminfo": {"total": self.memory_total,
+                              "available": self.memory_total - used,
+                              "free": int((self.memory_total - used) * 0.4), "used": used,
+                              "cache_used": int(self.memory_total * 0.1), "cache_percent": 10.0,
+                              "percent": round(percent, 2)}}
+
+        disks = []
+        for n, disk in enumerate(self.disks):
+            disk["percent"] = min(89.0, disk["percent"] + rnd.uniform(0, 0.01))
+            disk_percent = rnd.uniform(91, 99) if kind == "disk" and n == 0 else disk["percent"]
+            used = int(disk["total"] * disk_percent / 100)
+            disks.append({"device": disk["device"], "mountpoint": disk["mountpoint"],
+                          "fstype": disk["fstype"], "total": disk["total"], "used": used,
+                          "free": disk["total"] - used, "percent": round(disk_percent, 2)})
+
+        return [
+            ("last_load_avg", loadavg, loadavg),
+            ("last_memory_info", memory, memory),
+            ("last_disk_info", {"disksinfo": disks}, {"disksinfo": disks}),
+            ("last_cpu", cpu, {"cpu": cpu, "iowait": iowait}),
+        ]
+
+    async def send_events(self, force: bool = False):
+        """ Due aggregated events """
+        for event in self.event_aggregator.flush(force=force):
+            await self.notify(event["name"], event["data"])
+
+    async def ping(self):
+        """ Ping with the changed data, events, apply the response """
+        extra_data = {}
+        for key, result, payload in self.sample(time.monotonic()):
+            if result != self.datastore.get_data(key):
+                self.datastore.update_data(key, result)
+                extra_data.update(payload)
+        response = await self._send("ping", extra_data)
+
+        self.event_aggregator.add(self.event_processor.process_changes(self.datastore))
+        await self.send_events()
+
+        if response and response.get("cmd") == "pong" and response.get("token") == self.token:
+            self.wire_encoder.negotiate(response)
+            refresh = response.get("refresh")
+            if refresh and int(refresh) != self.interval:
+                self.interval = int(refresh)
+
+    async def run(self, stop: asyncio.Event, start_delay: float):
+        """ Agent life: starting, pings until stop, app_shutdown """
+        try:
+            await asyncio.wait_for(stop.wait(), start_delay)
+            return
+        except asyncio.TimeoutError:
+            pass
+        loop = asyncio.get_running_loop()
+        await self.notify("starting", {
+            "msg": datetime.now().strftime("%H:%M:%S"), "ncpu": self.ncpu,
+            "uptime": self.uptime, "log_level": LogLevel.NOTICE, "event_type": EventType.STARTING
+        })
+        next_ping = loop.time()
+        while not stop.is_set():
+            await self.ping()
+            next_ping += self.interval
+            delay = next_ping - loop.time()
+            if delay < 0:
+                # Server too slow for the interval
+                self.fleet.stats.missed_pings += 1
+                next_ping = loop.time()
+                delay = 0
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        await self.send_events(force=True)
+        await self.notify("app_shutdown", {
+            "msg": "Signal receive: SIGTERM. Closing application.",
+            "log_level": LogLevel.ALERT, "event_type": EventType.APP_SHUTDOWN
+        })
+
+
+class StandInServer:
+    """
+        Local stand-in of the Monnet server: pong (same token, refresh) to every
+        POST, self signed certificate.
+    """
+    def __init__(self, refresh: int, port: int = 0):
+        self.refresh = refresh
+        self.port = port
+        self.server = None
+        self.requests = 0
+        self.tmp = tempfile.TemporaryDirectory()
+
+    async def start(self) -> str:
+        """ Listen on 127.0.0.1, returns host:port """
+        self.server = await asyncio.start_server(
+            self._handle, "127.0.0.1", self.port, ssl=self_signed_context(self.tmp.name),
+            backlog=1024
+        )
+        port = self.server.sockets[0].getsockname()[1]
+
+        return f"127.0.0.1:{port}"
+
+    async def stop(self):
+        """ Close the listener """
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.tmp.cleanup()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            headers = {}
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get(b"content-length", 0)))
+            self.requests += 1
+            token = None
+            try:
+                if headers.get(b"content-encoding") == b"gzip":
+                    body = gzip.decompress(body)
+                if headers.get(b"content-type", b"").endswith(b"json"):
+                    token = json.loads(body).get("token")
+            except (OSError, ValueError):
+                pass
+            response = json.dumps({
+                "cmd": "pong", "token": token, "version": globals.AGENT_VERSION,
+                "response_msg": True, "refresh": self.refresh, "data": []
+            }).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         b"Connection: close\r\nContent-Length: %d\r\n\r\n" % len(response)
+                         + response)
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+
+async def simulate(args) -> FleetStats:
+    """ Run the fleet until --duration or SIGINT / SIGTERM """
+    standin = None
+    server = args.server
+    if args.local:
+        standin = StandInServer(args.refresh or args.interval)
+        server = await standin.start()
+        print(f"Stand-in server on {server}")
+    fleet = Fleet(server, args.endpoint, args.ignore_cert or args.local,
+                  args.max_connections, args.timeout)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    agents = [
+        VirtualAgent(
+            fleet, args.first_id + n,
+            args.token or f"{args.token_prefix}{args.first_id + n}",
+            args.interval, args.incidents, args.seed + n
+        )
+        for n in range(args.agents)
+    ]
+    # Spread the starts over the ramp (default one interval): no thundering herd
+    ramp = args.interval if args.ramp is None else args.ramp
+    tasks = [
+        asyncio.create_task(agent.run(stop, ramp * n / max(1, args.agents)))
+        for n, agent in enumerate(agents)
+    ]
+
+    async def progress():
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), REPORT_INTERVAL)
+            except asyncio.TimeoutError:
+                print(fleet.stats.progress(REPORT_INTERVAL, fleet.in_flight))
+
+    reporter = asyncio.create_task(progress())
+    if args.duration:
+        try:
+            await asyncio.wait_for(stop.wait(), args.duration)
+        except asyncio.TimeoutError:
+            stop.set()
+    await asyncio.gather(*tasks)
+    await reporter
+    if standin:
+        await standin.stop()
+
+    return fleet.stats
+
+
+def main(argv: Optional[List[str]] = None) -> FleetStats:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--server", default="localhost:443", help="host:port")
+    parser.add_argument("--endpoint", default="/feedme.php")
+    parser.add_argument("--local", action="store_true", help="start a local stand-in server")
+    parser.add_argument("--ignore-cert", action="store_true")
+    parser.add_argument("--interval", type=int, default=30, help="initial ping interval")
+    parser.add_argument("--refresh", type=int, help="stand-in server refresh (default interval)")
+    parser.add_argument("--duration", type=float, default=60, help="seconds, 0 until SIGINT")
+    parser.add_argument("--ramp", type=float, help="start spread seconds (default interval)")
+    parser.add_argument("--first-id", type=int, default=1)
+    parser.add_argument("--token", help="same token for all the agents")
+    parser.add_argument("--token-prefix", default="sim")
+    parser.add_argument("--incidents", type=float, default=0.002,
+                        help="incident (CPU/memory/disk over thresholds) probability per ping")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT)
+    args = parser.parse_args(argv)
+    # Thousands of agents: only warnings to syslog
+    set_log_level("warning")
+
+    stats = asyncio.run(simulate(args))
+    print(stats.report(args.agents, args.interval))
+
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Local stub of the Monnet HTTPS endpoint for benchmarks: answers every POST
+with a valid pong (same token) and counts requests and bytes. The self signed
+certificate is generated with openssl (the agent config uses ignore_cert).
+"""
+# Standard
+import gzip
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def self_signed_context(directory: str) -> ssl.SSLContext:
+    """ Server TLS context with a new self signed certificate """
+    cert = os.path.join(directory, "stub.crt")
+    key = os.path.join(directory, "stub.key")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key,
+         "-out", cert, "-days", "1", "-subj", "/CN=localhost"],
+        check=True, capture_output=True
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+
+    return context
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """ POST: pong """
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server.requests += 1
+        server.bytes_received += len(body)
+        token = None
+        try:
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            if self.headers.get("Content-Type", "").endswith("json"):
+                token = json.loads(body).get("token")
+        except (OSError, ValueError):
+            pass
+        response = json.dumps({
+            "cmd": "pong", "token": token, "version": 0.1, "response_msg": True,
+            "refresh": server.refresh, "data": []
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """ Notifications close without reading the response: ignore those errors """
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ssl.SSLError, ConnectionError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubServer:
+    """ Threaded stub on 127.0.0.1, random port """
+    def __init__(self, refresh: int = 5):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.httpd = StubHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.httpd.socket = self_signed_context(self.tmp.name).wrap_socket(
+            self.httpd.socket, server_side=True
+        )
+        self.httpd.requests = 0
+        self.httpd.bytes_received = 0
+        self.httpd.refresh = refresh
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def address(self) -> str:
+        """ host:port """
+        host, port = self.httpd.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        """ POST requests received """
+        return self.httpd.requests
+
+    def start(self) -> "StubServer":
+        """ Serve in a thread """
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """ Stop serving """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.tmp.cleanup()
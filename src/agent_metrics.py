@@ -0,0 +1,126 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Agent self instrumentation: counters and histograms of the agent own cost
+
+Compact report (ping "agent_metrics", AGENT_METRICS_INTERVAL):
+{
+    'up': int,                # Agent uptime (seconds)
+    'cpu': float,             # Agent CPU time, user + system (seconds)
+    'rss': float,             # Agent RSS (MB)
+    'c': {name: int},         # Counters (since start)
+    'h': {name: [count, sum, max, [bucket counts]]}
+                              # Histograms since the previous report, bucket
+                              # upper bounds in AGENT_METRICS_BUCKETS (+ overflow)
+    'col': {name: [runs, errors, timeouts, avg cpu ms, avg wall ms]}
+}
+"""
+
+# Standard
+import bisect
+import os
+import time
+from typing import Dict, Optional, Tuple
+# Local
+import globals
+from proc_reader import ProcFile
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+# The agent itself, not under PROC_ROOT
+SELF_STATM = ProcFile("/proc/self/statm")
+
+
+class Histogram:
+    """ Fixed buckets (upper bounds), last bucket is the overflow """
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        """ Clear the observations """
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """ Add an observation """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def compact(self) -> list:
+        """ [count, sum, max, counts] """
+        return [self.count, round(self.total, 4), round(self.max, 4), list(self.counts)]
+
+
+class AgentMetrics:
+    """
+        Registry of the agent metrics. Counters are cumulative, histograms
+        are reset on every report (interval distribution).
+    """
+    def __init__(self, bounds: Optional[Tuple[float, ...]] = None):
+        self.bounds = tuple(bounds or globals.AGENT_METRICS_BUCKETS)
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.started = time.monotonic()
+
+    def count(self, name: str, value: int = 1):
+        """ Increment a counter """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """ Add a value (seconds) to a histogram """
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(self.bounds)
+        histogram.observe(value)
+
+    @staticmethod
+    def process() -> Tuple[float, float]:
+        """ Agent (CPU seconds, RSS MB) """
+        times = os.times()
+        try:
+            pages = SELF_STATM.read(
+                lambda buffer, length: int(buffer[:length].split()[1])
+            )
+        except (OSError, IndexError, ValueError):
+            pages = 0
+
+        return times.user + times.system, pages * PAGE_SIZE / 1024 ** 2
+
+    def report(self, collectors: Optional[Dict[str, dict]] = None, reset: bool = True) -> dict:
+        """
+        Compact report (see module doc)
+
+        Args:
+            collectors (dict): CollectorRegistry.stats()
+            reset (bool): start a new histograms interval
+        """
+        cpu, rss = self.process()
+        report = {
+            "up": int(time.monotonic() - self.started),
+            "cpu": round(cpu, 2),
+            "rss": round(rss, 1),
+            "c": dict(self.counters),
+            "h": {name: histogram.compact() for name, histogram in self.histograms.items()},
+        }
+        if collectors:
+            report["col"] = {
+                name: [stats["runs"], stats["errors"], stats["timeouts"],
+                       round(stats["avg_cpu"] * 1000, 2), round(stats["avg_wall"] * 1000, 2)]
+                for name, stats in collectors.items()
+            }
+        if reset:
+            for histogram in self.histograms.values():
+                histogram.reset()
+
+        return report
+
+
+# Agent wide registry
+agent_metrics = AgentMetrics()
@@ -0,0 +1,30 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Pluggable collectors (see base.py)
+"""
+
+from .base import Collector, CollectorRegistry
+from .system import (
+    LoadAvgCollector,
+    MemoryCollector,
+    DisksCollector,
+    DiskStatsCollector,
+    NetDevCollector,
+    CpuCollector,
+    TopProcessesCollector,
+    ListenPortsCollector,
+)
+
+__all__ = [
+    "Collector",
+    "CollectorRegistry",
+    "LoadAvgCollector",
+    "MemoryCollector",
+    "DisksCollector",
+    "DiskStatsCollector",
+    "NetDevCollector",
+    "CpuCollector",
+    "TopProcessesCollector",
+    "ListenPortsCollector",
+]
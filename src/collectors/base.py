@@ -0,0 +1,274 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Collector interface and registry
+"""
+
+# Standard
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, wait
+from typing import Any, Dict, Optional
+# Local
+import globals
+from log_linux import log
+from worker_pool import WorkerPool
+
+
+class Collector:
+    """
+        Base collector. Subclasses set name/key and implement collect()
+
+        name: Registry name, also used in config "collectors": {name: {...}}
+        key: Datastore key of the last value sent to the server
+        interval: Seconds between runs
+        timeout: Seconds to wait for a run before giving up on it
+        expensive: Throttled when the agent CPU budget is exceeded
+    """
+    name = "collector"
+    key = None
+    interval = globals.COLLECTOR_DEFAULT_INTERVAL
+    timeout = globals.COLLECTOR_DEFAULT_TIMEOUT
+    expensive = False
+
+    def __init__(self, interval: Optional[float] = None, timeout: Optional[float] = None):
+        if interval:
+            self.interval = interval
+        if timeout:
+            self.timeout = timeout
+        self.enabled = True
+        self.throttle = 1
+        self.next_run = 0.0
+        self.pending = None
+        # Abandoned (timed out) runs still running
+        self.hung = 0
+        self.last_result = None
+        self.last_time = None
+        self.runs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.last_cpu = 0.0
+        self.last_wall = 0.0
+        self.total_cpu = 0.0
+        self.total_wall = 0.0
+
+    def collect(self) -> Any:
+        """ Return the collected data """
+        raise NotImplementedError
+
+    def payload(self, result) -> dict:
+        """ Result as ping data. Default: result is already a dict """
+        return result
+
+    def stats(self) -> dict:
+        """ Runtime cost """
+        return {
+            "interval": self.interval * self.throttle,
+            "runs": self.runs,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "hung": self.hung,
+            "last_cpu": round(self.last_cpu, 5),
+            "last_wall": round(self.last_wall, 5),
+            "avg_cpu": round(self.total_cpu / self.runs, 5) if self.runs else 0,
+            "avg_wall": round(self.total_wall / self.runs, 5) if self.runs else 0,
+        }
+
+
+def process_cpu() -> float:
+    """ Agent process CPU seconds, user + system of all threads """
+    times = os.times()
+
+    return times.user + times.system
+
+
+def _timed_collect(collector: Collector):
+    """ Worker side: run collect() measuring thread CPU and wall time """
+    cpu_start = time.thread_time()
+    wall_start = time.monotonic()
+    result = collector.collect()
+
+    return result, time.thread_time() - cpu_start, time.monotonic() - wall_start
+
+
+class CollectorRegistry:
+    """
+        Keep the collectors, run the due ones in a small persistent pool of
+        daemon workers (never blocks the scheduler more than COLLECTOR_WAIT, a
+        collector is not run again while its previous run is pending) with per
+        collector timeout. A run over its timeout is abandoned (its worker is
+        replaced), the collector is not run again until that run returns:
+        collectors keep state between runs (socket index, counters), two runs
+        at once would corrupt it.
+        Agent wide CPU budget: process CPU time (all threads) as a fraction of
+        one core over COLLECTOR_BUDGET_WINDOW seconds. Over budget the interval
+        of expensive collectors is doubled, up to COLLECTOR_MAX_THROTTLE times,
+        and relaxed again under half the budget.
+    """
+    def __init__(self, cpu_budget: Optional[float] = None, workers: Optional[int] = None):
+        self.cpu_budget = cpu_budget or globals.COLLECTOR_CPU_BUDGET
+        self.budget_window = globals.COLLECTOR_BUDGET_WINDOW
+        self.collectors: Dict[str, Collector] = {}
+        self.pool = WorkerPool(workers or globals.COLLECTOR_WORKERS, "collector")
+        # (monotonic time, agent process cpu seconds) of the budget checks
+        self.cpu_samples = deque()
+        self.last_budget_check = 0.0
+        # Abandoned runs still running: future -> collector
+        self.abandoned: Dict[Future, Collector] = {}
+
+    def register(self, collector: Collector) -> Collector:
+        """ Add a collector """
+        if collector.name in self.collectors:
+            raise ValueError(f"Collector already registered: {collector.name}")
+        self.collectors[collector.name] = collector
+
+        return collector
+
+    def configure(self, collectors_config: Optional[dict]):
+        """
+        Apply config overrides
+
+        Args:
+            collectors_config (dict): {name: {"interval": s, "timeout": s, "enabled": bool}}
+        """
+        for name, options in (collectors_config or {}).items():
+            collector = self.collectors.get(name)
+            if collector is None:
+                log(f"Config for unknown collector: {name}", "warning")
+                continue
+            collector.interval = options.get("interval", collector.interval)
+            collector.timeout = options.get("timeout", collector.timeout)
+            collector.enabled = options.get("enabled", collector.enabled)
+
+    def get(self, name: str) -> Optional[Collector]:
+        """ Collector by name """
+        return self.collectors.get(name)
+
+    def latest(self, name: str) -> Any:
+        """ Last result of a collector """
+        collector = self.collectors.get(name)
+
+        return collector.last_result if collector else None
+
+    def run_due(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Run the due collectors. Waits up to COLLECTOR_WAIT for them, slower runs
+        are harvested on later calls and abandoned after the collector timeout.
+
+        Returns:
+            dict: {name: result} of the collector runs finished now
+        """
+        if now is None:
+            now = time.monotonic()
+        results = {}
+        submitted = []
+        for future in [future for future in self.abandoned if future.done()]:
+            # Finished after the timeout, stale
+            self.abandoned.pop(future).hung -= 1
+        for collector in self.collectors.values():
+            if collector.pending is not None:
+                self._harvest(collector, now, results)
+                if collector.pending is not None:
+                    continue
+            if not collector.enabled or collector.next_run > now:
+                continue
+            if collector.hung:
+                # Previous run still running
+                continue
+            future = self.pool.submit(_timed_collect, collector)
+            collector.pending = (future, now)
+            submitted.append(future)
+            self._schedule_next(collector, now)
+
+        if submitted:
+            wait(submitted, timeout=globals.COLLECTOR_WAIT)
+            for collector in self.collectors.values():
+                if collector.pending is not None and collector.pending[0] in submitted:
+                    self._harvest(collector, now, results)
+            self._apply_budget(time.monotonic())
+
+        return results
+
+    def trigger(self, name: str):
+        """ Run a collector on the next run_due() (event driven) """
+        collector = self.collectors.get(name)
+        if collector is not None:
+            collector.next_run = 0.0
+
+    def stats(self) -> dict:
+        """ Stats of all collectors """
+        return {name: collector.stats() for name, collector in self.collectors.items()}
+
+    def cpu_usage(self, now: Optional[float] = None) -> float:
+        """ Agent CPU seconds per second over the budget window """
+        if now is None:
+            now = time.monotonic()
+        self.cpu_samples.append((now, process_cpu()))
+        # Keep the oldest sample inside the window as reference
+        while len(self.cpu_samples) > 2 and now - self.cpu_samples[1][0] >= self.budget_window:
+            self.cpu_samples.popleft()
+        start, start_cpu = self.cpu_samples[0]
+        if now <= start:
+            return 0.0
+
+        return (self.cpu_samples[-1][1] - start_cpu) / (now - start)
+
+    def shutdown(self):
+        """ Stop the workers, hung collectors do not block the agent exit (daemon threads) """
+        self.pool.shutdown()
+
+    def _harvest(self, collector: Collector, now: float, results: dict):
+        future, submitted_at = collector.pending
+        if not future.done():
+            if now - submitted_at <= collector.timeout:
+                return
+            # Running: its worker is replaced. Queued: cancelled
+            if self.pool.abandon(future):
+                collector.hung += 1
+                self.abandoned[future] = collector
+            if not future.done() or future.cancelled():
+                collector.timeouts += 1
+                collector.pending = None
+                log(f"Collector {collector.name} timeout ({collector.timeout}s)", "warning")
+                return
+        collector.pending = None
+        try:
+            result, cpu, wall = future.result()
+        except Exception as e:
+            collector.errors += 1
+            log(f"Collector {collector.name} error: {e}", "err")
+            return
+        self._account(collector, cpu, wall)
+        collector.last_result = result
+        collector.last_time = submitted_at
+        results[collector.name] = result
+
+    def _schedule_next(self, collector: Collector, now: float):
+        interval = collector.interval * collector.throttle
+        next_run = collector.next_run + interval
+        collector.next_run = next_run if next_run > now else now + interval
+
+    def _account(self, collector: Collector, cpu: float, wall: float):
+        collector.runs += 1
+        collector.last_cpu = cpu
+        collector.last_wall = wall
+        collector.total_cpu += cpu
+        collector.total_wall += wall
+
+    def _apply_budget(self, now: float):
+        if now - self.last_budget_check < globals.COLLECTOR_BUDGET_CHECK:
+            return
+        self.last_budget_check = now
+        usage = self.cpu_usage(now)
+        for collector in self.collectors.values():
+            if not collector.expensive:
+                continue
+            if usage > self.cpu_budget and collector.throttle < globals.COLLECTOR_MAX_THROTTLE:
+                collector.throttle *= 2
+                log(
+                    f"CPU budget exceeded ({usage:.4f} > {self.cpu_budget}),"
+                    f" throttling {collector.name} x{collector.throttle}", "notice"
+                )
+            elif usage < self.cpu_budget / 2 and collector.throttle > 1:
+                collector.throttle //= 2
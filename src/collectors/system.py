@@ -0,0 +1,153 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+System collectors (info_linux)
+"""
+
+# Local
+import globals
+import info_linux
+from socket_index import SocketInodeIndex
+from mounts import MountTable
+from statvfs_pool import StatvfsPool
+from diskstats import DiskStats
+from netdev import NetDev
+from cpu_stat import CpuStat
+from process_table import ProcessTable
+from .base import Collector
+
+
+class LoadAvgCollector(Collector):
+    """ Load average and loadavg based usage """
+    name = "load_avg"
+    key = "last_load_avg"
+    interval = globals.STATS_SAMPLE_INTERVAL
+
+    def collect(self):
+        return info_linux.get_load_avg()
+
+
+class MemoryCollector(Collector):
+    """ /proc/meminfo """
+    name = "memory"
+    key = "last_memory_info"
+    interval = globals.STATS_SAMPLE_INTERVAL
+
+    def collect(self):
+        return info_linux.get_memory_info()
+
+
+class DisksCollector(Collector):
+    """ Mounted filesystems usage. network_fs: include nfs/cifs... mounts """
+    name = "disks"
+    key = "last_disk_info"
+    interval = 10
+
+    def __init__(self, interval=None, timeout=None, network_fs=False):
+        super().__init__(interval, timeout)
+        if network_fs:
+            mount_filter = info_linux.is_disk_or_network_mount
+        else:
+            mount_filter = info_linux.is_disk_mount
+        self.mount_table = MountTable(mount_filter=mount_filter)
+        self.statvfs_pool = StatvfsPool()
+
+    def collect(self):
+        return info_linux.get_disks_info(self.mount_table, self.statvfs_pool)
+
+
+class DiskStatsCollector(Collector):
+    """ Per block device throughput, IOPS, await and utilization (/proc/diskstats) """
+    name = "diskstats"
+    key = "last_diskstats"
+    interval = 10
+
+    def __init__(self, interval=None, timeout=None):
+        super().__init__(interval, timeout)
+        self.diskstats = DiskStats()
+
+    def collect(self):
+        stats = self.diskstats.sample()
+        if stats is None:
+            # First sample, no rates yet
+            return None
+
+        return {"diskstats": stats}
+
+
+class NetDevCollector(Collector):
+    """ Per network interface traffic, errors, drops and link utilization (/proc/net/dev) """
+    name = "netdev"
+    key = "last_netdev"
+    interval = 10
+
+    def __init__(self, interval=None, timeout=None, ignore=None):
+        super().__init__(interval, timeout)
+        self.netdev = NetDev(ignore)
+
+    def collect(self):
+        stats = self.netdev.sample()
+        if stats is None:
+            # First sample, no rates yet
+            return None
+
+        return {"netdev": stats}
+
+
+class CpuCollector(Collector):
+    """
+        CPU time breakdown percents, total and per core, from one /proc/stat
+        read. Also sent as "iowait" (total) in the ping.
+    """
+    name = "cpu"
+    key = "last_cpu"
+    interval = globals.STATS_SAMPLE_INTERVAL
+
+    def __init__(self, interval=None, timeout=None, cores=True):
+        super().__init__(interval, timeout)
+        self.cores = cores
+        self.cpu_stat = CpuStat()
+
+    def collect(self):
+        if not self.cpu_stat.sample():
+            # First sample, no percents yet
+            return None
+
+        return self.cpu_stat.snapshot(self.cores)
+
+    def payload(self, result):
+        return {"cpu": result, "iowait": result["total"]["iowait"]}
+
+
+class TopProcessesCollector(Collector):
+    """ Top CPU / RSS processes. Not part of the ping, attached to CPU/memory events """
+    name = "top_processes"
+    key = "last_top_processes"
+    interval = 10
+    expensive = True
+
+    def __init__(self, interval=None, timeout=None):
+        super().__init__(interval, timeout)
+        self.process_table = ProcessTable()
+
+    def collect(self):
+        if not self.process_table.scan():
+            return None
+
+        return self.process_table.top()
+
+
+class ListenPortsCollector(Collector):
+    """ Listening ports. Not part of the ping, sent as notification on change """
+    name = "listen_ports"
+    key = "last_listen_ports_info"
+    interval = globals.PORTS_CHECK_INTERVAL
+    timeout = 30
+    expensive = True
+
+    def __init__(self, interval=None, timeout=None):
+        super().__init__(interval, timeout)
+        self.socket_index = SocketInodeIndex()
+
+    def collect(self):
+        return info_linux.get_listen_ports_info(self.socket_index)
@@ -19,3 +19,7 @@ class EventType:
     HOST_BECOME_ON = 14
     HOST_BECOME_OFF = 15
     NEW_HOST_DISCOVERY = 16
+    HIGH_DISK_IO = 17
+    HIGH_NETWORK_USAGE = 18
+    HIGH_NETWORK_DROPS = 19
+    EVENTS_SUPPRESSED = 20
@@ -0,0 +1,146 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+CPU time breakdown from /proc/stat, total and per core
+
+    cpu  user nice system idle iowait irq softirq steal guest guest_nice
+    cpu0 ...
+guest/guest_nice are already accounted in user/nice. Counters are u64 ticks
+(no wrap), iowait can go backwards: negative deltas count as 0.
+"""
+
+# Standard
+from array import array
+from typing import Optional
+# Local
+from proc_reader import proc_reader as default_proc_reader
+
+CPU_FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+NFIELDS = len(CPU_FIELDS)
+IDLE = CPU_FIELDS.index("idle")
+IOWAIT = CPU_FIELDS.index("iowait")
+
+
+class CpuStat:
+    """
+        One /proc/stat read per sample. Counters and percents are kept in
+        preallocated arrays: row 0 total, row n + 1 core n, NFIELDS columns.
+        Reallocated only if the number of cores changes (hotplug).
+    """
+    def __init__(self, proc_reader=None):
+        self.proc_reader = proc_reader or default_proc_reader
+        self.rows = 0
+        self.last = array("Q")
+        self.current = array("Q")
+        self.percent = array("d")
+        # Busy (100 - idle - iowait) percent per row
+        self.busy = array("d")
+        # Core number of each row > 0 (offline cores are not listed)
+        self.core_ids = array("i")
+        self.samples = 0
+
+    def _allocate(self, rows: int):
+        self.rows = rows
+        self.last = array("Q", bytes(8 * rows * NFIELDS))
+        self.current = array("Q", bytes(8 * rows * NFIELDS))
+        self.percent = array("d", bytes(8 * rows * NFIELDS))
+        self.busy = array("d", bytes(8 * rows))
+        self.core_ids = array("i", bytes(4 * rows))
+        self.samples = 0
+
+    def _parse(self, buffer, length: int) -> int:
+        """ cpu lines into self.current, returns the number of rows """
+        current = self.current
+        rows = 0
+        pos = 0
+        while pos < length and buffer.startswith(b"cpu", pos):
+            end = buffer.find(b"\n", pos, length)
+            if end < 0:
+                end = length
+            fields = buffer[pos:end].split()
+            if rows < self.rows:
+                base = rows * NFIELDS
+                for i in range(NFIELDS):
+                    current[base + i] = int(fields[i + 1]) if i + 1 < len(fields) else 0
+                if rows:
+                    self.core_ids[rows] = int(fields[0][3:])
+            rows += 1
+            pos = end + 1
+
+        return rows
+
+    def sample(self) -> bool:
+        """
+        Read /proc/stat and update the percents since the previous sample
+
+        Returns:
+            bool: True if percents are available (not the first sample)
+        """
+        file = self.proc_reader.file("stat")
+        rows = file.read(self._parse)
+        if rows != self.rows:
+            # First sample or cores hotplug
+            self._allocate(rows)
+            file.read(self._parse)
+        self.samples += 1
+        if self.samples >= 2:
+            self._compute()
+        # current buffer is reused as next last
+        self.last, self.current = self.current, self.last
+
+        return self.samples >= 2
+
+    def _compute(self):
+        last, current, percent, busy = self.last, self.current, self.percent, self.busy
+        deltas = [0] * NFIELDS
+        for row in range(self.rows):
+            base = row * NFIELDS
+            total = 0
+            for i in range(NFIELDS):
+                delta = current[base + i] - last[base + i]
+                if delta < 0:
+                    delta = 0
+                deltas[i] = delta
+                total += delta
+            if total == 0:
+                # Offline core or no elapsed ticks
+                for i in range(NFIELDS):
+                    percent[base + i] = 0.0
+                busy[row] = 0.0
+                continue
+            for i in range(NFIELDS):
+                percent[base + i] = deltas[i] * 100.0 / total
+            busy[row] = 100.0 - percent[base + IDLE] - percent[base + IOWAIT]
+
+    def usage(self, row: int = 0) -> float:
+        """ Busy percent of the last interval (row 0 total) """
+        return round(self.busy[row], 2)
+
+    def iowait(self, row: int = 0) -> float:
+        """ iowait percent of the last interval (row 0 total) """
+        return round(self.percent[row * NFIELDS + IOWAIT], 2)
+
+    def breakdown(self, row: int = 0) -> dict:
+        """ {"usage": busy, field: percent...} of a row """
+        base = row * NFIELDS
+        result = {"usage": round(self.busy[row], 2)}
+        for i, name in enumerate(CPU_FIELDS):
+            result[name] = round(self.percent[base + i], 2)
+
+        return result
+
+    def snapshot(self, cores: bool = True) -> Optional[dict]:
+        """
+        Returns:
+            dict: {"total": breakdown, "cores": [{"core": n, ...breakdown}]}
+                  None before the second sample
+        """
+        if self.samples < 2:
+            return None
+        result = {"total": self.breakdown(0)}
+        if cores:
+            result["cores"] = [
+                {"core": self.core_ids[row], **self.breakdown(row)} for row in range(1, self.rows)
+            ]
+
+        return result
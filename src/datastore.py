@@ -3,14 +3,20 @@
 """
 
 import json
-from typing import Optional, Dict, Any
+import os
+import time
+from typing import Optional, Dict, Any, Callable, Set
+# Local
+import globals
 from log_linux import log
 
-from typing import Optional, Dict, Any
-
 class Datastore:
     """
         Keep data and Save/Load from disk in json format
+
+        Updates only mark the key dirty, save_data() writes the snapshot (temp
+        file + fsync + rename, never a half written file) if something changed.
+        Other components state can be attached and is saved/loaded with the data.
     """
     def __init__(self, filename: str = "datastore.json"):
         """
@@ -22,8 +28,15 @@ class Datastore:
             "last_load_avg": None,
             "last_memory_info": None,
             "last_disk_info": None,
-            "last_iowait": 0,
+            "last_cpu": None,
         }
+        self.dirty: Set[str] = set()
+        # name -> (dump, restore)
+        self.attached: Dict[str, tuple] = {}
+        # name -> last saved dump
+        self.attached_saved: Dict[str, Any] = {}
+        self.loaded: Dict[str, Any] = {}
+        self.saves = 0
 
     def update_data(self, key: str, data: Dict[str, Any]):
         """
@@ -33,8 +46,7 @@ class Datastore:
         if key not in self.data:
             log(f"New data set added: {key}")
         self.data[key] = data
-        # TODO save on exit or each X time
-        self.save_data()
+        self.dirty.add(key)
 
     def get_data(self, key: str) -> Optional[Dict[str, Any]]:
         """
@@ -47,3 +59,76 @@ class Datastore:
         Returns a list of all registered keys.
         """
         return list(self.data.keys())
+
+    def attach(self, name: str, dump: Callable[[], Any], restore: Callable[[Any], None]):
+        """
+        Persist other state with the datastore
+
+        :param dump: returns the json serializable state, saved when it changes
+        :param restore: receives the saved state (if loaded)
+        """
+        self.attached[name] = (dump, restore)
+        if name in self.loaded:
+            try:
+                restore(self.loaded.pop(name))
+            except Exception as e:
+                log(f"Datastore: can't restore {name}: {e}", "warning")
+        self.attached_saved[name] = dump()
+
+    def save_data(self, force: bool = False) -> bool:
+        """
+        Write the snapshot if some key or attached state changed
+
+        Returns:
+            bool: True if written
+        """
+        attached = {name: dump() for name, (dump, _restore) in self.attached.items()}
+        if not force and not self.dirty and attached == self.attached_saved:
+            return False
+        snapshot = {
+            "version": globals.AGENT_VERSION,
+            "saved": time.time(),
+            "data": self.data,
+            "attached": attached,
+        }
+        tmp_filename = f"{self.filename}.tmp"
+        try:
+            with open(tmp_filename, "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_filename, self.filename)
+        except (OSError, TypeError, ValueError) as e:
+            log(f"Datastore: error saving {self.filename}: {e}", "err")
+            return False
+        self.dirty.clear()
+        self.attached_saved = attached
+        self.saves += 1
+
+        return True
+
+    def load_data(self, max_age: Optional[float] = None) -> bool:
+        """
+        Load the saved snapshot, ignored if older than max_age seconds
+        (DATASTORE_MAX_AGE). Call before attach().
+
+        Returns:
+            bool: True if loaded
+        """
+        max_age = max_age or globals.DATASTORE_MAX_AGE
+        try:
+            with open(self.filename, "r") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            log(f"Datastore: can't load {self.filename}: {e}", "warning")
+            return False
+        if not isinstance(snapshot, dict) or time.time() - snapshot.get("saved", 0) > max_age:
+            log("Datastore: saved snapshot too old, ignored", "info")
+            return False
+        self.data.update(snapshot.get("data", {}))
+        self.loaded = snapshot.get("attached", {})
+        log(f"Datastore: loaded {self.filename}", "info")
+
+        return True
@@ -0,0 +1,178 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Field level delta encoding for ping payloads
+
+Full snapshot:
+{
+    'seq': int,               # Sequence number, +1 every encoded payload
+    'full': True,
+    'state': dict             # Whole current state
+}
+
+Delta:
+{
+    'seq': int,
+    'delta': dict             # Only changed leaves. Absent when nothing changed
+}
+
+Inside a delta:
+    dict:        {'key': new_value, ..., '_del': [removed keys]}
+    keyed list:  {'_upd': [changed entries], '_del': [removed entry keys]}
+                 Changed entries only carry the list key plus the changed fields,
+                 new entries are sent whole.
+
+Only the parts a ChangeTracker reports as changed are diffed. The last state
+is kept by reference (collectors build new results every run, never modify
+the returned ones), no deep copies.
+"""
+
+# Local
+import globals
+from fingerprint import ChangeTracker
+
+
+class DeltaEncoder:
+    """
+        Keep the last state sent and build field level deltas against it.
+        A full snapshot is sent on the first payload, every full_every payloads
+        and whenever resync() is called (lost ping, server request).
+    """
+    def __init__(self, full_every: int = None, list_keys: dict = None):
+        """
+        :param full_every: Payloads between full snapshots
+        :param list_keys: {list name: entry field used as key}
+        """
+        self.full_every = full_every or globals.DELTA_FULL_EVERY
+        self.list_keys = list_keys if list_keys is not None else globals.DELTA_LIST_KEYS
+        self.seq = 0
+        self.last_state = None
+        self.since_full = 0
+        self.tracker = ChangeTracker(self.list_keys)
+
+    def resync(self):
+        """ Force a full snapshot on the next encode """
+        self.last_state = None
+        self.tracker.forget("state")
+
+    def dump(self) -> dict:
+        """ Encoder state (Datastore persistence) """
+        return {"seq": self.seq, "since_full": self.since_full, "last_state": self.last_state}
+
+    def restore(self, saved: dict):
+        """ Continue the saved sequence, the server keeps the same last state """
+        self.seq = saved["seq"]
+        self.since_full = saved["since_full"]
+        self.last_state = saved["last_state"]
+        # No fingerprints of the saved state: next delta compares everything
+        self.tracker.forget("state")
+
+    def encode(self, state: dict) -> dict:
+        """
+        Encode the current state
+
+        Args:
+            state (dict): Current whole state
+
+        Returns:
+            dict: Full snapshot or delta payload
+        """
+        self.seq += 1
+        changes = self.tracker.update("state", state)
+
+        if self.last_state is None or self.since_full >= self.full_every:
+            self.last_state = dict(state)
+            self.since_full = 0
+            return {"seq": self.seq, "full": True, "state": state}
+
+        self.since_full += 1
+        delta = self._diff_changes(self.last_state, state, changes)
+        self.last_state = dict(state)
+        payload = {"seq": self.seq}
+        if delta:
+            payload["delta"] = delta
+
+        return payload
+
+    def _diff_changes(self, old: dict, new: dict, changes: dict) -> dict:
+        """ _diff_dict of the changed parts only """
+        delta = {}
+        removed = []
+        for key, changed in changes.items():
+            if key not in new:
+                if key in old:
+                    removed.append(key)
+            elif key not in old:
+                delta[key] = new[key]
+            else:
+                if changed is None:
+                    value = self._diff_value(key, old[key], new[key])
+                else:
+                    value = self._diff_keyed_list(
+                        self.list_keys[key], old[key], new[key], set(changed)
+                    ) or None
+                if value is not None:
+                    delta[key] = value
+        # Removed keys not fingerprinted (restored state)
+        removed += [key for key in old if key not in new and key not in changes]
+        if removed:
+            delta["_del"] = removed
+
+        return delta
+
+    def _diff_dict(self, old: dict, new: dict) -> dict:
+        """ Changed/new leaves and removed keys of new against old """
+        delta = {}
+        for key, value in new.items():
+            if key not in old:
+                delta[key] = value
+                continue
+            changed = self._diff_value(key, old[key], value)
+            if changed is not None:
+                delta[key] = changed
+        removed = [key for key in old if key not in new]
+        if removed:
+            delta["_del"] = removed
+
+        return delta
+
+    def _diff_value(self, key, old, new):
+        """ Return the delta for a value or None if unchanged """
+        if isinstance(old, dict) and isinstance(new, dict):
+            return self._diff_dict(old, new) or None
+        if key in self.list_keys and isinstance(old, list) and isinstance(new, list):
+            return self._diff_keyed_list(self.list_keys[key], old, new) or None
+        if old != new:
+            return new
+
+        return None
+
+    def _diff_keyed_list(self, entry_key: str, old: list, new: list, only: set = None) -> dict:
+        """
+        Per entry diff of lists of dicts identified by entry_key
+        only: identities of the changed entries (others are not compared)
+        """
+        old_entries = {entry.get(entry_key): entry for entry in old}
+        new_keys = set()
+        updated = []
+        for entry in new:
+            ident = entry.get(entry_key)
+            new_keys.add(ident)
+            if only is not None and ident not in only:
+                continue
+            old_entry = old_entries.get(ident)
+            if old_entry is None:
+                updated.append(entry)
+            elif old_entry != entry:
+                changed = self._diff_dict(old_entry, entry)
+                changed[entry_key] = ident
+                updated.append(changed)
+
+        delta = {}
+        if updated:
+            delta["_upd"] = updated
+        removed = [ident for ident in old_entries if ident not in new_keys]
+        if removed:
+            delta["_del"] = removed
+
+        return delta
@@ -0,0 +1,127 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Block devices I/O stats from /proc/diskstats
+
+/proc/diskstats fields after "major minor name":
+    0 reads  1 reads merged  2 sectors read  3 ms reading
+    4 writes 5 writes merged 6 sectors written 7 ms writing
+    8 ios in progress 9 ms doing io (io_ticks) 10 weighted ms ...
+Sectors are always 512 bytes. A counter lower than in the previous sample is
+a reset (device removed and added again with the same name, driver reload),
+not a wrap: 64 bit counters do not wrap and a wrong 2^32/2^64 jump would be a
+huge bogus rate. The device is skipped for that sample, its counters are the
+new baseline.
+"""
+
+# Standard
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+# Local
+import globals
+from proc_reader import proc_reader as default_proc_reader
+
+SECTOR_SIZE = 512
+COUNTER_FIELDS = 11
+
+
+def parse_diskstats(buffer, length: int) -> Dict[str, Tuple[int, ...]]:
+    """
+    Returns:
+        dict: {device: (11 counters)}
+    """
+    devices = {}
+    for line in bytes(buffer[:length]).splitlines():
+        fields = line.split()
+        if len(fields) < 3 + COUNTER_FIELDS:
+            continue
+        devices[fields[2].decode()] = tuple(map(int, fields[3:3 + COUNTER_FIELDS]))
+
+    return devices
+
+
+def counter_deltas(current: Tuple[int, ...], last: Tuple[int, ...]) -> Optional[List[int]]:
+    """ Counter increments, None if any counter went backwards (reset) """
+    delta = [c - p for c, p in zip(current, last)]
+    if min(delta, default=0) < 0:
+        return None
+
+    return delta
+
+
+class DiskStats:
+    """
+        Per device throughput, IOPS, await and utilization between samples.
+        Only whole physical disks: partitions (not in /sys/block) and virtual
+        devices (loop, ram, zram, dm, md...: /sys/devices/virtual) are skipped.
+    """
+    def __init__(self, sys_root: Optional[str] = None, proc_reader=None):
+        self.sys_root = sys_root or globals.SYS_ROOT
+        self.proc_reader = proc_reader or default_proc_reader
+        # device -> accepted
+        self.devices: Dict[str, bool] = {}
+        self.last: Optional[Dict[str, Tuple[int, ...]]] = None
+        self.last_time = 0.0
+
+    def is_physical_disk(self, device: str) -> bool:
+        """ Whole, non virtual, block device (cached) """
+        accepted = self.devices.get(device)
+        if accepted is None:
+            # cciss/c0d0 is cciss!c0d0 in sysfs
+            path = os.path.join(self.sys_root, "block", device.replace("/", "!"))
+            accepted = (
+                os.path.exists(path)
+                and "/devices/virtual/" not in os.path.realpath(path)
+            )
+            self.devices[device] = accepted
+
+        return accepted
+
+    def sample(self, now: Optional[float] = None) -> Optional[List[dict]]:
+        """
+        Rates since the previous sample
+
+        Returns:
+            list: [{"device", "read_bytes", "write_bytes" (per second), "read_iops",
+                    "write_iops", "await" (ms), "util" (percent)}]
+                  None on the first sample
+        """
+        if now is None:
+            now = time.monotonic()
+        all_devices = self.proc_reader.file("diskstats").read(parse_diskstats)
+        if len(self.devices) > len(all_devices):
+            # Forget removed devices
+            self.devices = {
+                device: accepted for device, accepted in self.devices.items()
+                if device in all_devices
+            }
+        current = {
+            device: counters for device, counters in all_devices.items()
+            if self.is_physical_disk(device)
+        }
+        last, elapsed = self.last, now - self.last_time
+        self.last, self.last_time = current, now
+        if last is None or elapsed <= 0:
+            return None
+
+        stats = []
+        for device, counters in current.items():
+            previous = last.get(device)
+            if previous is None:
+                continue
+            delta = counter_deltas(counters, previous)
+            if delta is None:
+                continue
+            ios = delta[0] + delta[4]
+            stats.append({
+                "device": device,
+                "read_bytes": round(delta[2] * SECTOR_SIZE / elapsed),
+                "write_bytes": round(delta[6] * SECTOR_SIZE / elapsed),
+                "read_iops": round(delta[0] / elapsed, 2),
+                "write_iops": round(delta[4] / elapsed, 2),
+                "await": round((delta[3] + delta[7]) / ios, 2) if ios else 0,
+                "util": round(min(delta[9] / (elapsed * 1000) * 100, 100), 2),
+            })
+
+        return stats
@@ -0,0 +1,138 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Event storm suppression and aggregation
+
+Events of the same class (event name) within EVENT_AGGREGATION_WINDOW
+seconds (plus a random jitter, hosts degrading together do not send at the
+same instant) are sent as one notification: the most severe event data plus
+"count" and "aggregated" (data of the others).
+
+Every class has a token bucket (EVENT_RATE_BURST tokens, one more each
+EVENT_RATE_PERIOD seconds) and all classes share a global one. Events
+without token are dropped and counted, the count goes as "suppressed" in the
+next notification of the class, or in an events_suppressed notification
+(at most one each EVENT_RATE_PERIOD).
+"""
+
+# Standard
+import random
+import time
+from typing import Dict, List, Optional
+# Local
+import globals
+from constants import LogLevel
+from constants import EventType
+from log_linux import log
+
+
+class TokenBucket:
+    """ capacity tokens, refilled one every period seconds """
+    def __init__(self, capacity: float, period: float, now: float):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        """ Consume a token if available """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.period)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+
+        return True
+
+
+class EventAggregator:
+    """
+        add() the EventProcessor events, flush() returns the notifications to send
+    """
+    def __init__(self, window: Optional[float] = None, jitter: Optional[float] = None,
+                 burst: Optional[int] = None, period: Optional[float] = None):
+        self.window = window if window is not None else globals.EVENT_AGGREGATION_WINDOW
+        self.jitter = jitter if jitter is not None else globals.EVENT_AGGREGATION_JITTER
+        self.burst = burst or globals.EVENT_RATE_BURST
+        self.period = period or globals.EVENT_RATE_PERIOD
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.global_bucket = None
+        # class -> {"due": time, "events": [data]}
+        self.groups: Dict[str, dict] = {}
+        # class -> dropped events not reported yet
+        self.suppressed: Dict[str, int] = {}
+        self.total_suppressed = 0
+        self.last_report = float("-inf")
+
+    def add(self, events: List[Dict], now: Optional[float] = None):
+        """ Queue events, drop them over the rate limits """
+        if now is None:
+            now = time.monotonic()
+        if self.global_bucket is None:
+            # Global limit: a few classes worth of burst
+            self.global_bucket = TokenBucket(self.burst * 4, self.period / 4, now)
+        for event in events:
+            name = event["name"]
+            group = self.groups.get(name)
+            if group is None:
+                bucket = self.buckets.get(name)
+                if bucket is None:
+                    bucket = self.buckets[name] = TokenBucket(self.burst, self.period, now)
+                if not bucket.take(now) or not self.global_bucket.take(now):
+                    self.suppressed[name] = self.suppressed.get(name, 0) + 1
+                    self.total_suppressed += 1
+                    log("Event suppressed (rate limit): %s", "debug", name)
+                    continue
+                group = self.groups[name] = {
+                    "due": now + self.window + random.uniform(0, self.jitter),
+                    "events": []
+                }
+            # Joining an open group costs no token
+            group["events"].append(event["data"])
+
+    def flush(self, now: Optional[float] = None, force: bool = False) -> List[Dict]:
+        """
+        Notifications due (all with force)
+
+        Returns:
+            list: [{"name": str, "data": dict}]
+        """
+        if now is None:
+            now = time.monotonic()
+        notifications = []
+        for name, group in list(self.groups.items()):
+            if not force and group["due"] > now:
+                continue
+            del self.groups[name]
+            notifications.append({"name": name, "data": self._summarize(name, group["events"])})
+
+        # Suppressed counts of classes without a notification to carry them,
+        # at most once per period
+        if self.suppressed and (force or now - self.last_report >= self.period):
+            self.last_report = now
+            notifications.append({
+                "name": "events_suppressed",
+                "data": {
+                    "suppressed": self.suppressed,
+                    "event_value": sum(self.suppressed.values()),
+                    "log_level": LogLevel.NOTICE,
+                    "event_type": EventType.EVENTS_SUPPRESSED
+                }
+            })
+            self.suppressed = {}
+
+        return notifications
+
+    def _summarize(self, name: str, events: List[dict]) -> dict:
+        # Most severe (lowest log level), then highest value
+        events.sort(key=lambda data: (data.get("log_level", LogLevel.INFO),
+                                      -(data.get("event_value") or 0)))
+        data = dict(events[0])
+        if len(events) > 1:
+            data["count"] = len(events)
+            data["aggregated"] = events[1:]
+        suppressed = self.suppressed.pop(name, 0)
+        if suppressed:
+            data["suppressed"] = suppressed
+
+        return data
@@ -0,0 +1,91 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Structural fingerprints for change detection
+
+fingerprint() hashes a json like value with the types of its scalars
+(hash(1) == hash(1.0) == hash(True): a value moving between int, float and
+bool is a change). Flat records (dicts/lists of scalars, most of the collected
+data) are hashed with C level calls. Dict fingerprints depend on the key
+order, collectors build their results always in the same order (a different
+order is only a false change, never a missed one).
+Limitation: hash(-1) == hash(-2) (CPython), a change between exactly -1 and
+-2 is missed. Collected values are not negative.
+
+ChangeTracker keeps, per datastore key, only the fingerprints of every part
+(top level key of the collected value) and of every entry of keyed lists
+(DELTA_LIST_KEYS: disks by mountpoint, interfaces by name...), no data copies.
+"""
+
+# Standard
+from typing import Any, Dict, Optional
+# Local
+import globals
+
+
+def fingerprint(value: Any) -> int:
+    """ Structural hash of a value """
+    if isinstance(value, dict):
+        try:
+            return hash((tuple(value.items()), tuple(map(type, value.values()))))
+        except TypeError:
+            return hash(tuple((key, fingerprint(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        try:
+            return hash((tuple(value), tuple(map(type, value))))
+        except TypeError:
+            return hash(tuple(map(fingerprint, value)))
+
+    return hash((value, type(value)))
+
+
+class ChangeTracker:
+    """
+        update() a datastore key with the new collected value, returns the changed parts
+    """
+    def __init__(self, list_keys: Optional[Dict[str, str]] = None):
+        self.list_keys = list_keys if list_keys is not None else globals.DELTA_LIST_KEYS
+        # key -> part -> fingerprint or {entry identity: fingerprint}
+        self.fingerprints: Dict[str, Dict[str, Any]] = {}
+
+    def _part(self, part: str, value: Any):
+        entry_key = self.list_keys.get(part)
+        if entry_key is not None and isinstance(value, list):
+            return {
+                entry.get(entry_key) if isinstance(entry, dict) else None: fingerprint(entry)
+                for entry in value
+            }
+
+        return fingerprint(value)
+
+    def update(self, key: str, value: Any) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: {} unchanged, else {changed part: None (whole part) or
+                  [changed, new or removed entry identities] for keyed lists}
+        """
+        if not isinstance(value, dict):
+            value = {None: value}
+        old = self.fingerprints.get(key, {})
+        new = {part: self._part(part, item) for part, item in value.items()}
+        self.fingerprints[key] = new
+        changes = {}
+        for part, current in new.items():
+            previous = old.get(part)
+            if previous == current:
+                continue
+            if isinstance(current, dict) and isinstance(previous, dict):
+                changes[part] = [
+                    ident for ident, entry in current.items() if previous.get(ident) != entry
+                ] + [ident for ident in previous if ident not in current]
+            else:
+                changes[part] = None
+        for part in old:
+            if part not in new:
+                changes[part] = None
+
+        return changes
+
+    def forget(self, key: str):
+        """ Next update of key is a change """
+        self.fingerprints.pop(key, None)
@@ -7,9 +7,6 @@ Global Vars
 
 AGENT_VERSION = "0.131"
 
-# Track timers
-timers = {}
-
 # Threshold
 ALERT_THRESHOLD = 90
 WARN_THRESHOLD = 80
@@ -19,3 +16,90 @@ TIMER_STATS_INTERVAL = 300
 
 # Events
 EVENT_EXPIRATION = 86400
+# Rules: default hysteresis (threshold units, percent)
+RULE_HYSTERESIS = 5
+# Events aggregation window and random extra delay (seconds)
+EVENT_AGGREGATION_WINDOW = 5
+EVENT_AGGREGATION_JITTER = 5
+# Events rate limit per class: burst, one more token every period (seconds)
+EVENT_RATE_BURST = 5
+EVENT_RATE_PERIOD = 60
+
+# Datastore: snapshot write interval and max age to reload it (seconds)
+DATASTORE_FLUSH_INTERVAL = 60
+DATASTORE_MAX_AGE = 86400
+
+# Delta mode: payloads between full snapshots
+DELTA_FULL_EVERY = 30
+# Delta mode: lists diffed per entry {list: entry key}
+DELTA_LIST_KEYS = {
+    "disksinfo": "mountpoint",
+    "diskstats": "device",
+    "netdev": "interface",
+    "cores": "core",
+}
+
+# Wire: gzip bodies bigger than (bytes) when the server accepts it
+WIRE_GZIP_THRESHOLD = 1024
+WIRE_GZIP_LEVEL = 6
+
+# /proc and /sys mount points (host trees mounted elsewhere, benchmark fixtures)
+PROC_ROOT = "/proc"
+SYS_ROOT = "/sys"
+
+# Host metadata refresh (seconds)
+META_REFRESH_INTERVAL = 600
+
+# Scheduler: wait without jobs (seconds) and max back to back runs (catchup policy)
+SCHEDULER_IDLE_WAIT = 1
+SCHEDULER_MAX_CATCHUP = 3
+
+# Collectors: defaults (seconds), worker pool size
+COLLECTOR_TICK = 1
+COLLECTOR_DEFAULT_INTERVAL = 5
+COLLECTOR_DEFAULT_TIMEOUT = 10
+COLLECTOR_WORKERS = 4
+# Agent CPU budget (process, all threads): fraction of one core over the window (seconds)
+COLLECTOR_CPU_BUDGET = 0.02
+COLLECTOR_BUDGET_WINDOW = 60
+COLLECTOR_BUDGET_CHECK = 10
+COLLECTOR_MAX_THROTTLE = 8
+# Collectors: max wait for a run inside the scheduler tick (seconds)
+COLLECTOR_WAIT = 0.5
+
+# Local sampling of cheap metrics for the interval stats (seconds)
+STATS_SAMPLE_INTERVAL = 1
+
+# Listen ports check interval (seconds)
+PORTS_CHECK_INTERVAL = 60
+# Socket inode index: full rescan (seconds) and max indexed processes
+SOCKET_INDEX_FULL_RESCAN = 3600
+SOCKET_INDEX_MAX_PIDS = 32768
+# Listen ports watcher: destroy notifications check and signature poll (seconds)
+PORTS_WATCH_INTERVAL = 1
+PORTS_WATCH_POLL = 5
+
+# statvfs: workers, per mount timeout and quarantine backoff (seconds)
+STATVFS_WORKERS = 4
+STATVFS_TIMEOUT = 2
+STATVFS_QUARANTINE = 30
+STATVFS_MAX_QUARANTINE = 600
+
+# Network interfaces ignored by the netdev collector (fnmatch patterns)
+NETDEV_IGNORE = ("lo", "veth*")
+# Network interfaces: dropped packets percent event threshold
+NETDEV_DROP_THRESHOLD = 1
+
+# Top processes: max tracked processes and entries per list
+PROCESS_TABLE_SLOTS = 8192
+TOP_PROCESSES = 5
+
+# Local metrics history: directory and tiers ((step seconds, slots), finest first)
+HISTORY_DIR = "history"
+HISTORY_TIERS = ((1, 3600), (60, 10080))
+# Max minutes of a history request
+HISTORY_MAX_MINUTES = 10080
+
+# Agent self metrics: report with the ping every (seconds), histogram bucket bounds (seconds)
+AGENT_METRICS_INTERVAL = 300
+AGENT_METRICS_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
@@ -5,12 +5,20 @@
 # Standard
 import os
 import socket
+import struct
+import fcntl
 import subprocess
 import re
 #from collections import defaultdict
 
 # LOCAL
+import globals
 from log_linux import log, logpo
+import proc_net
+from proc_reader import proc_reader
+
+# Network filesystems, included in disks with config "disks_network_fs"
+NETWORK_FILESYSTEMS = frozenset({"nfs", "nfs4", "cifs", "smb3", "ceph", "glusterfs"})
 
 def bytes_to_mb(bytes_value):
     """
@@ -25,7 +33,7 @@ def bytes_to_mb(bytes_value):
     return round(bytes_value / (1024 ** 2))
 
 def get_load_avg():
-    load1, load5, load15 = os.getloadavg()
+    load1, load5, load15 = proc_reader.loadavg()
     current_cpu_usage = cpu_usage(load1)
 
     return {
@@ -44,11 +52,7 @@ def get_memory_info():
     Returns:
         dict: "meminfo" dict
     """
-    meminfo = {}
-    with open("/proc/meminfo", "r") as f:
-        for line in f:
-            key, value = line.split(":")
-            meminfo[key.strip()] = int(value.split()[0]) * 1024  # Convertir a bytes
+    meminfo = proc_reader.meminfo()  # Solo los campos usados, en bytes
 
     total = meminfo.get("MemTotal", 0)
     available = meminfo.get("MemAvailable", 0)
@@ -78,66 +82,150 @@ def get_hostname():
     """ Get Hostname """
     return socket.gethostname()
 
-def get_ip_address(hostname):
+def get_default_route_interface():
+    """
+    Interface of the default route with the lowest metric from /proc/net/route
+
+    Returns:
+        str or None: interface name
+    """
+    best = None
+    try:
+        with open(os.path.join(globals.PROC_ROOT, "net", "route"), "r") as f:
+            next(f)
+            for line in f:
+                parts = line.split()
+                # Iface Destination Gateway Flags RefCnt Use Metric Mask ...
+                if len(parts) < 8 or parts[1] != "00000000" or parts[7] != "00000000":
+                    continue
+                metric = int(parts[6])
+                if best is None or metric < best[1]:
+                    best = (parts[0], metric)
+    except (OSError, StopIteration, ValueError):
+        return None
+
+    return best[0] if best else None
+
+def get_interface_ip_address(interface):
+    """
+    IPv4 address of a interface (SIOCGIFADDR)
+
+    Returns:
+        str or None: address
+    """
+    siocgifaddr = 0x8915
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            ifreq = struct.pack("256s", interface[:15].encode())
+            res = fcntl.ioctl(s.fileno(), siocgifaddr, ifreq)
+            return socket.inet_ntoa(res[20:24])
+    except OSError:
+        return None
+
+def get_ip_address():
+    """
+    GET IP Address of the default route interface. Local kernel info only, no DNS.
+    Fallback: source address the kernel choose for a route lookup (UDP connect, no
+    packet is sent).
+
+    Returns:
+        str: address, 127.0.0.1 if no route
     """
-        GET IP Address
-        TODO: get interface/default route address
+    interface = get_default_route_interface()
+    if interface:
+        address = get_interface_ip_address(interface)
+        if address:
+            return address
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            # TEST-NET-1, never routed
+            s.connect(("192.0.2.1", 9))
+            return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+
+def read_mounts():
     """
-    return socket.gethostbyname(hostname)
+    Parse /proc/mounts
 
-def get_disks_info():
+    Returns:
+        list: (device, mountpoint, fstype)
+    """
+    mounts = []
+    with open(os.path.join(globals.PROC_ROOT, "mounts"), "r") as f:
+        for line in f:
+            parts = line.split()
+            mounts.append((parts[0], parts[1], parts[2]))
+
+    return mounts
+
+def is_disk_mount(mount):
+    """ Filter: mounts from /dev devices """
+    device = mount[0]
+    return device.startswith("/dev/") and device != '/dev/fuse'
+
+def is_disk_or_network_mount(mount):
+    """ Filter: mounts from /dev devices and network filesystems """
+    return is_disk_mount(mount) or mount[2] in NETWORK_FILESYSTEMS
+
+def get_disks_info(mount_table=None, statvfs_pool=None):
     """
     Obtain disks info from /proc/mount (/dev)
 
+    Args:
+        mount_table (MountTable): Cached mount table filtered with is_disk_mount,
+                                  /proc/mounts is read if None
+        statvfs_pool (StatvfsPool): Hang proof statvfs. Entries with the last
+                                    known value of a hung mount get "stale": True
+
     Returns:
         dict: Disk partions info Key: disks
     """
     disks_info = []
 
-    real_filesystems = {
-        "ext4", "ext3", "ext2", "xfs", "zfs", "btrfs", "reiserfs",
-        "vfat", "fat32", "ntfs", "hfsplus", "exfat", "iso9660",
-        "udf", "f2fs", "nfs"
-    }
+    if mount_table is not None:
+        mounts = mount_table.get_mounts()
+    else:
+        mounts = [mount for mount in read_mounts() if is_disk_mount(mount)]
 
-    # Read
-    with open("/proc/mounts", "r") as mounts:
-        for line in mounts:
-            parts = line.split()
-            device, mountpoint, fstype = parts[0], parts[1], parts[2]
-
-            # Filter
-            if not device.startswith("/dev/") or device == '/dev/fuse':
-                continue
-
-            # Info os.statvfs
+    if statvfs_pool is not None:
+        stats = statvfs_pool.statvfs_many(mountpoint for _, mountpoint, _ in mounts)
+    else:
+        stats = {}
+        for _, mountpoint, _ in mounts:
             try:
-                stat = os.statvfs(mountpoint)
-                total = bytes_to_mb(stat.f_blocks * stat.f_frsize)
-                free = bytes_to_mb(stat.f_bfree * stat.f_frsize)
-                used = total - free
-                percent = (used / total) * 100 if total > 0 else 0
-                disks_info.append({
-                    "device": device,           # Nombre del dispositivo
-                    "mountpoint": mountpoint,   # Punto de montaje
-                    "fstype": fstype,           # Tipo de sistema de archivos
-                    "total": total,             # Tamaño total en bytes
-                    "used": used,               # Espacio usado en bytes
-                    "free": free,               # Espacio libre en bytes
-                    "percent": round(percent, 2)# Porcentaje usado
-                })
+                stats[mountpoint] = (os.statvfs(mountpoint), False)
             except OSError:
                 continue
 
+    for device, mountpoint, fstype in mounts:
+        if mountpoint not in stats:
+            continue
+        stat, stale = stats[mountpoint]
+        total = bytes_to_mb(stat.f_blocks * stat.f_frsize)
+        free = bytes_to_mb(stat.f_bfree * stat.f_frsize)
+        used = total - free
+        percent = (used / total) * 100 if total > 0 else 0
+        disk_info = {
+            "device": device,           # Nombre del dispositivo
+            "mountpoint": mountpoint,   # Punto de montaje
+            "fstype": fstype,           # Tipo de sistema de archivos
+            "total": total,             # Tamaño total en bytes
+            "used": used,               # Espacio usado en bytes
+            "free": free,               # Espacio libre en bytes
+            "percent": round(percent, 2)# Porcentaje usado
+        }
+        if stale:
+            disk_info["stale"] = True   # Ultimo valor conocido, no responde
+        disks_info.append(disk_info)
+
     return {"disksinfo": disks_info}
 
 def get_cpus():
     return os.cpu_count()
 
 def get_uptime():
-    with open('/proc/uptime', 'r') as f:
-        uptime_seconds = float(f.readline().split()[0])
-    return uptime_seconds
+    return proc_reader.uptime()
 
 def cpu_usage(cpu_load):
     total_cpus = get_cpus()
@@ -148,46 +236,22 @@ def cpu_usage(cpu_load):
 
     return round(cpu_usage_percentage, 2)
 
-def read_cpu_stats():
-    """ CPU Stats from /proc/stat."""
-    with open("/proc/stat", "r") as f:
-        for line in f:
-            if line.startswith("cpu "):
-                parts = line.split()
-                user, nice, system, idle, iowait = map(int, parts[1:6])
-                return user, nice, system, idle, iowait
-    return None
-
-def get_iowait(last_cpu_times, current_cpu_times):
+def get_listen_ports_info(socket_index=None):
     """
-    Io wait/delay calculation
-    :return: Percent IO Wait within call median
+    Listening ports, flattened list of port details.
+    Native /proc/net scanner (NETLINK sock_diag fallback), `ss` if both fail.
 
+    Args:
+        socket_index (SocketInodeIndex): Optional incremental inode owners index
     """
+    try:
+        return proc_net.get_listen_ports(socket_index=socket_index)
+    except OSError as e:
+        log(f"Native listen ports scan failed, using ss: {e}", "warning")
 
-    # Calcular diferencias acumulativas
-    user_diff = current_cpu_times.user - last_cpu_times.user
-    nice_diff = current_cpu_times.nice - last_cpu_times.nice
-    system_diff = current_cpu_times.system - last_cpu_times.system
-    idle_diff = current_cpu_times.idle - last_cpu_times.idle
-    iowait_diff = (
-        (current_cpu_times.iowait - last_cpu_times.iowait)
-        if hasattr(current_cpu_times, 'iowait') else 0
-    )
-
-    # Suma total de diferencias
-    total_diff = user_diff + nice_diff + system_diff + idle_diff + iowait_diff
-
-    # Actualizar el estado anterior
-    last_cpu_times = current_cpu_times
-
-    # Calcular el porcentaje de IO Wait
-    if total_diff > 0:
-        return (iowait_diff / total_diff) * 100
-
-    return 0
+    return get_listen_ports_info_ss()
 
-def get_listen_ports_info():
+def get_listen_ports_info_ss():
     """
     Fetch active connections using `ss` and return a flattened list of port details.
     """
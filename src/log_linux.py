@@ -1,10 +1,104 @@
 """
 @copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Syslog logging
+
+The level is checked before any formatting: pass the data as arguments
+(log("Payload: %s", "debug", payload)) and it is only converted to str when
+the message is emitted. Emitted messages go through a bounded queue to a
+writer thread (syslog opened once), a full queue drops and counts messages
+instead of blocking the agent. Pending messages are written at exit.
+SimpleQueue put is reentrant: signal handlers can log.
 """
 
+import atexit
+import queue
 import syslog
+import threading
 
 MAX_LOG_LEVEL = "debug"
+LOG_QUEUE_SIZE = 1024
+
+SYSLOG_LEVEL = {
+    "emerg": syslog.LOG_EMERG,
+    "alert": syslog.LOG_ALERT,
+    "crit": syslog.LOG_CRIT,
+    "err": syslog.LOG_ERR,
+    "warning": syslog.LOG_WARNING,
+    "notice": syslog.LOG_NOTICE,
+    "info": syslog.LOG_INFO,
+    "debug": syslog.LOG_DEBUG,
+}
+
+
+class SyslogWriter:
+    """ Writer thread, started on the first message """
+    def __init__(self, size: int = LOG_QUEUE_SIZE):
+        self.size = size
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+
+    def put(self, level: int, message: str):
+        """ Queue a message, dropped if the queue is full """
+        if self.thread is None:
+            self._start()
+        if self.queue.qsize() >= self.size:
+            self.dropped += 1
+            return
+        self.queue.put((level, message))
+
+    def _start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            syslog.openlog(logoption=syslog.LOG_PID, facility=syslog.LOG_USER)
+            self.thread = threading.Thread(target=self._run, name="syslog", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        reported = 0
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            syslog.syslog(*record)
+            self.written += 1
+            if self.dropped != reported and self.queue.empty():
+                syslog.syslog(syslog.LOG_WARNING,
+                              f"Log queue full, {self.dropped - reported} messages dropped")
+                reported = self.dropped
+
+    def stop(self, timeout: float = 2):
+        """ Write the pending messages and stop the thread """
+        thread = self.thread
+        if thread is None:
+            return
+        self.queue.put(None)
+        thread.join(timeout)
+        self.thread = None
+        syslog.closelog()
+
+
+writer = SyslogWriter()
+atexit.register(writer.stop)
+_max_level = SYSLOG_LEVEL[MAX_LOG_LEVEL]
+
+
+def set_log_level(level: str) -> None:
+    """ Max level logged (MAX_LOG_LEVEL) """
+    global MAX_LOG_LEVEL, _max_level
+
+    if level not in SYSLOG_LEVEL:
+        raise ValueError(
+            f"Invalid MAX_LOG_LEVEL: {level}. "
+            f"Valid options are {list(SYSLOG_LEVEL.keys())}"
+        )
+    MAX_LOG_LEVEL = level
+    _max_level = SYSLOG_LEVEL[level]
+
 
 def logpo(msg: str, data, priority: str = "info") -> None:
     """
@@ -12,55 +106,44 @@ def logpo(msg: str, data, priority: str = "info") -> None:
 
     Args:
         msg: A str
-        data: The data to log. Can be any Python object.
+        data: The data to log. Can be any Python object, converted only if logged.
         priority (str): The priority level (info, warning, error, critical).
                         Defaults to 'info'.
 
     Raises:
         ValueError: If the priority level is invalid in the underlying `log` function.
     """
-    try:
-        message = msg + str(data)  # Convert the data to a string representation
-        log(message, priority)  # Call the original log function
-    except ValueError as e:
-        raise ValueError(f"Error in logging: {e}")
+    level = SYSLOG_LEVEL.get(priority)
+    if level is None:
+        raise ValueError(f"Error in logging: Invalid priority level: {priority}")
+    if level <= _max_level:
+        writer.put(level, msg + str(data))
 
-def log(message: str, priority: str = "info") -> None:
+
+def log(message: str, priority: str = "info", *args) -> None:
     """
     Sends a message to the system log (syslog) with a specified priority.
 
     Args:
-        message (str): The message to log.
+        message (str): The message to log, %-format string if args.
         priority (str): The priority level (info, warning, error, critical).
                         Defaults to 'info'.
+        args: message arguments, formatted only if logged.
 
     Raises:
         ValueError: If the priority level is invalid.
     """
-
-    syslog_level = {
-        "emerg": syslog.LOG_EMERG,
-        "alert": syslog.LOG_ALERT,
-        "crit": syslog.LOG_CRIT,
-        "err": syslog.LOG_ERR,
-        "warning": syslog.LOG_WARNING,
-        "notice": syslog.LOG_NOTICE,
-        "info": syslog.LOG_INFO,
-        "debug": syslog.LOG_DEBUG,
-    }
-
-    if priority not in syslog_level:
+    level = SYSLOG_LEVEL.get(priority)
+    if level is None:
         raise ValueError(
             f"Invalid priority level: {priority}. "
-            f"Valid options are {list(syslog_level.keys())}"
-        )
-    if MAX_LOG_LEVEL not in syslog_level:
-        raise ValueError(
-            f"Invalid MIN_LOG_LEVEL: {MAX_LOG_LEVEL}. "
-            f"Valid options are {list(syslog_level.keys())}"
+            f"Valid options are {list(SYSLOG_LEVEL.keys())}"
         )
-
-    if syslog_level[priority] <= syslog_level[MAX_LOG_LEVEL]:
-        syslog.openlog(logoption=syslog.LOG_PID, facility=syslog.LOG_USER)
-        syslog.syslog(syslog_level[priority], message)
-        syslog.closelog()
+    if level > _max_level:
+        return
+    if args:
+        try:
+            message = message % args
+        except (TypeError, ValueError):
+            message = f"{message} {args}"
+    writer.put(level, message)
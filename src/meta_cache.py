@@ -0,0 +1,61 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Host metadata cache
+"""
+
+# Standard
+import time
+import uuid
+# Local
+import globals
+import info_linux
+import time_utils
+from log_linux import log
+
+
+class MetaCache:
+    """
+        Keep the static host metadata (timezone, hostname, nodename, ip, version).
+        Refreshed every META_REFRESH_INTERVAL or when the nodename changes
+        (uname is a cheap syscall, checked on every call).
+    """
+    def __init__(self, refresh_interval: int = None):
+        self.refresh_interval = refresh_interval or globals.META_REFRESH_INTERVAL
+        self.static = None
+        self.last_refresh = 0.0
+
+    def refresh(self):
+        """ Collect the static metadata """
+        hostname = info_linux.get_hostname()
+        static = {
+            "timezone": str(time_utils.get_local_timezone()),
+            "hostname": hostname,
+            "nodename": info_linux.get_nodename(),
+            "ip_address": info_linux.get_ip_address(),
+            "agent_version": str(globals.AGENT_VERSION),
+        }
+        if self.static is not None and static != self.static:
+            log(f"Host metadata changed: {static}", "info")
+        self.static = static
+        self.last_refresh = time.monotonic()
+
+    def get_meta(self) -> dict:
+        """
+        Builds metadata
+
+        Returns:
+            dict: Dict with metadata
+        """
+        if (
+            self.static is None
+            or time.monotonic() - self.last_refresh > self.refresh_interval
+            or info_linux.get_nodename() != self.static["nodename"]
+        ):
+            self.refresh()
+
+        meta = {"timestamp": time_utils.get_datatime()}     # Timestamp  UTC
+        meta.update(self.static)
+        meta["uuid"] = str(uuid.uuid4())                    # ID uniq
+
+        return meta
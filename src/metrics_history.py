@@ -0,0 +1,182 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Local metrics history: memory mapped fixed width ring files
+
+One file per metric and tier (HISTORY_TIERS: (step seconds, slots), e.g. 1s
+for an hour, 1min for a week). Slot of a time: (time // step) % slots, O(1)
+write and lookup. Every slot keeps its bucket number (time // step) so
+overwritten or never written slots are detected.
+
+File: header (magic, step, slots) + slots records (bucket, sum, count, min, max)
+A file with other geometry (tiers changed) is recreated. The metrics with ring
+files in the directory are opened at start: the history of the previous runs
+is queryable before their first new sample.
+"""
+
+# Standard
+import mmap
+import os
+import re
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+# Local
+import globals
+from log_linux import log
+
+RING_FILE = re.compile(r"^(.+)\.(\d+)s\.ring$")
+MAGIC = b"MNTH0001"
+HEADER = struct.Struct("<8sII")
+HEADER_SIZE = 64
+RECORD = struct.Struct("<qdddd")
+
+
+class HistoryTier:
+    """ Ring of step seconds buckets in a memory mapped file """
+    def __init__(self, filename: str, step: int, slots: int):
+        self.filename = filename
+        self.step = step
+        self.slots = slots
+        size = HEADER_SIZE + RECORD.size * slots
+        fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o640)
+        try:
+            header = os.pread(fd, HEADER.size, 0)
+            valid = (os.fstat(fd).st_size == size and len(header) == HEADER.size
+                     and HEADER.unpack(header) == (MAGIC, step, slots))
+            if not valid:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            # The mapping keeps the file
+            os.close(fd)
+        if not valid:
+            # Zero filled: bucket 0 count 0, never a valid slot
+            HEADER.pack_into(self.map, 0, MAGIC, step, slots)
+
+    def _offset(self, bucket: int) -> int:
+        return HEADER_SIZE + (bucket % self.slots) * RECORD.size
+
+    def add(self, value: float, now: float):
+        """ Accumulate a sample in the bucket of now """
+        bucket = int(now // self.step)
+        offset = self._offset(bucket)
+        stored, total, count, low, high = RECORD.unpack_from(self.map, offset)
+        if stored != bucket:
+            total, count, low, high = 0.0, 0.0, value, value
+        RECORD.pack_into(self.map, offset, bucket, total + value, count + 1,
+                         min(low, value), max(high, value))
+
+    def get(self, bucket: int) -> Optional[Tuple[float, float, float]]:
+        """ (mean, min, max) of a bucket, None if not in the ring """
+        stored, total, count, low, high = RECORD.unpack_from(self.map, self._offset(bucket))
+        if stored != bucket or not count:
+            return None
+
+        return total / count, low, high
+
+    def query(self, start: float, end: float) -> List[list]:
+        """ [[time, mean, min, max]] of the buckets between start and end """
+        first = max(int(start // self.step), int(end // self.step) - self.slots + 1)
+        points = []
+        for bucket in range(first, int(end // self.step) + 1):
+            values = self.get(bucket)
+            if values is not None:
+                points.append([bucket * self.step] + [round(value, 2) for value in values])
+
+        return points
+
+    def span(self) -> int:
+        """ Seconds kept """
+        return self.step * self.slots
+
+    def close(self):
+        """ Unmap, written pages are already in the file """
+        self.map.close()
+
+
+class MetricsHistory:
+    """
+        Every added sample goes to all the tiers of the metric (downsampling
+        is the tier bucket aggregate). query() uses the finest tier covering
+        the requested minutes.
+    """
+    def __init__(self, directory: Optional[str] = None,
+                 tiers: Optional[Tuple[Tuple[int, int], ...]] = None):
+        self.directory = directory or globals.HISTORY_DIR
+        self.tiers = tuple(sorted(tiers or globals.HISTORY_TIERS))
+        self.metrics: Dict[str, List[HistoryTier]] = {}
+        os.makedirs(self.directory, exist_ok=True)
+        self._discover()
+
+    def _discover(self):
+        """ Open the metrics of the ring files already in the directory """
+        steps = {step for step, _slots in self.tiers}
+        for filename in sorted(os.listdir(self.directory)):
+            match = RING_FILE.match(filename)
+            if match is None or int(match.group(2)) not in steps:
+                continue
+            name = match.group(1)
+            if name in self.metrics:
+                continue
+            try:
+                self._metric(name)
+            except (OSError, ValueError) as e:
+                log(f"History: can't open {name}: {e}", "err")
+
+    def _metric(self, name: str) -> List[HistoryTier]:
+        tiers = self.metrics.get(name)
+        if tiers is None:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+            tiers = self.metrics[name] = [
+                HistoryTier(os.path.join(self.directory, f"{safe_name}.{step}s.ring"), step, slots)
+                for step, slots in self.tiers
+            ]
+
+        return tiers
+
+    def add(self, name: str, value: float, now: Optional[float] = None):
+        """ Add a sample (now: epoch seconds) """
+        if now is None:
+            now = time.time()
+        try:
+            tiers = self._metric(name)
+        except (OSError, ValueError) as e:
+            log(f"History: can't open {name}: {e}", "err")
+            self.metrics[name] = []
+            return
+        for tier in tiers:
+            tier.add(value, now)
+
+    def query(self, name: str, minutes: float, now: Optional[float] = None) -> List[list]:
+        """
+        Last minutes of a metric
+
+        Returns:
+            list: [[time, mean, min, max]], oldest first
+        """
+        if now is None:
+            now = time.time()
+        tiers = self.metrics.get(name)
+        if not tiers:
+            return []
+        seconds = minutes * 60
+        tier = next((tier for tier in tiers if tier.span() >= seconds), tiers[-1])
+
+        return tier.query(now - seconds, now)
+
+    def query_all(self, minutes: float, names: Optional[List[str]] = None,
+                  now: Optional[float] = None) -> Dict[str, List[list]]:
+        """ {metric: query()} of the given (default all) metrics """
+        if names is None:
+            names = list(self.metrics)
+
+        return {name: self.query(name, minutes, now) for name in names if name in self.metrics}
+
+    def close(self):
+        """ Unmap all the files """
+        for tiers in self.metrics.values():
+            for tier in tiers:
+                tier.close()
+        self.metrics = {}
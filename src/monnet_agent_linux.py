@@ -9,13 +9,17 @@ Payload Structure Documentation
     'token': str,             # Authentication token. Example: "73a7a18ce78742aa8aadacbe6a918dd8"
     'interval': int,          # Interval in seconds
     'version': str,           # Version software. Example:
+    'encodings': list,        # Supported wire encodings (see wire_encoding.py)
     'data': {                 # Contains other info
         'mydata': {
             'data1': 1,
             'data2': 1,
             'data3': 1
         }
-    },
+    },                        # On ping with config "delta_mode" data is a
+                              # DeltaEncoder payload (see delta_encoder.py)
+                              # Every AGENT_METRICS_INTERVAL the ping data carries
+                              # 'agent_metrics' (see agent_metrics.py)
     'meta': {                 # Metadata about the payload source and environment.
         'timestamp': str,     # ISO 8601 timestamp of when the payload was generated.
         'timezone': str,      # Time zone identifier.
@@ -24,6 +28,7 @@ Payload Structure Documentation
         'ip_address': str,    # IP address of the system.
         'agent_version': str, # Version of the agent that generated the payload.
         'uuid': str           # Unique identifier (UUID) of the system or agent.
+        'meta_id': str        # Static meta id. Once acked static fields are omitted
     }
 
 Response Structure Documentation
@@ -35,31 +40,53 @@ Response Structure Documentation
     'response_msg': bool,    # Indicates if the response message is successful. Example: True
     'refresh': int,          # Refresh interval in seconds. Example: 5
     'data': list             # List of data, typically empty in this case. Example: []
+    'resync': bool           # Optional. Delta mode: seq gap detected, send full snapshot
+    'history': dict          # Optional. {"minutes": int, "metrics": list} local history
+                             # wanted, sent with cmd "history" (see metrics_history.py)
+    'encoding': str          # Optional. Wire encoding to use: json / msgpack
+    'gzip': bool             # Optional. Gzip accepted for big bodies
+    'meta_ack': str          # Optional. Static meta stored, meta_id
+    'meta_resend': bool      # Optional. meta_id unknown, send the full meta
 }
 """
 
 # Standard
 import ssl
-import sys
 import time
 import json
 import signal
-import uuid
 import time
 from datetime import datetime
 import http.client
-# TrdParty
-import psutil
 # Local
 import globals
 from constants import LogLevel
 from constants import EventType
-from log_linux import log, logpo
+from log_linux import log, logpo, set_log_level
 import info_linux
-import time_utils
 from datastore import Datastore
 from event_processor import EventProcessor
+from event_aggregator import EventAggregator
+from delta_encoder import DeltaEncoder
+from agent_metrics import agent_metrics
+from wire_encoding import WireEncoder
+from meta_cache import MetaCache
 from agent_config import load_config
+from scheduler import Scheduler
+from stats_buffer import MetricSampler
+from metrics_history import MetricsHistory
+from port_watcher import PortWatcher
+from collectors import (
+    CollectorRegistry,
+    LoadAvgCollector,
+    MemoryCollector,
+    DisksCollector,
+    DiskStatsCollector,
+    NetDevCollector,
+    CpuCollector,
+    TopProcessesCollector,
+    ListenPortsCollector,
+)
 import tasks
 
 
@@ -68,32 +95,28 @@ CONFIG_FILE_PATH = "/etc/monnet/agent-config"
 
 # Global Var
 
-running = True
+# Signal that stopped the agent
+stop_signal = None
+# SIGUSR1 received, metrics dump pending
+dump_requested = False
 config = None
+scheduler = None
+datastore = None
+
+# Collectors whose data goes in the ping
+PING_COLLECTORS = ("load_avg", "memory", "disks", "diskstats", "netdev", "cpu")
+wire_encoder = WireEncoder()
+meta_cache = MetaCache()
+event_aggregator = EventAggregator()
+last_metrics_report = time.monotonic()
 
 def get_meta():
     """
-    Builds metadata
+    Builds metadata (cached static part, see MetaCache)
     Returns:
         dict: Dict with metadata
     """
-
-    timestamp = time_utils.get_datatime()
-    local_timezone = time_utils.get_local_timezone()
-    hostname = info_linux.get_hostname()
-    nodename = info_linux.get_nodename()
-    ip_address = info_linux.get_ip_address(hostname)
-    _uuid = str(uuid.uuid4())
-
-    return {
-        "timestamp": timestamp,                 # Timestamp  UTC
-        "timezone": str(local_timezone),        # Timezone
-        "hostname": hostname,
-        "nodename": nodename,
-        "ip_address": ip_address,
-        "agent_version": str(globals.AGENT_VERSION),
-        "uuid": _uuid                           # ID uniq
-    }
+    return meta_cache.get_meta()
 
 def send_notification(name, data):
     """
@@ -109,7 +132,7 @@ def send_notification(name, data):
     ignore_cert = config["ignore_cert"]
     server_host = config["server_host"]
     server_endpoint = config["server_endpoint"]
-    meta = get_meta()
+    meta = wire_encoder.compact_meta(get_meta())
     if name == 'starting':
         data["msg"] = data["msg"].strftime("%H:%M:%S")
     data["name"] = name
@@ -119,20 +142,27 @@ def send_notification(name, data):
         "cmd": "notification",
         "token": token,
         "version": globals.AGENT_VERSION,
+        "encodings": wire_encoder.capabilities(),
         "data":  data or {},
         "meta": meta
     }
 
+    start_time = time.monotonic()
     try:
         if ignore_cert:
             context = ssl._create_unverified_context()
         else:
             context = None
         connection = http.client.HTTPSConnection(server_host, context=context)
-        headers = {"Content-Type": "application/json"}
-        connection.request("POST", server_endpoint, body=json.dumps(payload), headers=headers)
-        log(f"Notification sent: {payload}", "debug")
+        body, headers = wire_encoder.encode(payload)
+        connection.request("POST", server_endpoint, body=body, headers=headers)
+        agent_metrics.count("notifications")
+        agent_metrics.count("bytes_sent", len(body))
+        log("Notification sent: %s", "debug", payload)
     except Exception as e:
+        agent_metrics.count("http_failures")
+        # Server may have restarted without our meta
+        wire_encoder.forget_meta()
         log(f"Error sending notification: {e}", "err")
     finally:
         """
@@ -143,6 +173,7 @@ def send_notification(name, data):
         if "name" in data:
             data.pop("name")
         connection.close()
+        agent_metrics.observe("http", time.monotonic() - start_time)
 
 def send_request(cmd="ping", data=None):
     """
@@ -164,17 +195,19 @@ def send_request(cmd="ping", data=None):
     ignore_cert = config["ignore_cert"]
     server_host = config["server_host"]
     server_endpoint = config["server_endpoint"]
-    meta = get_meta()
+    meta = wire_encoder.compact_meta(get_meta())
     payload = {
         "id": idx,
         "cmd": cmd,
         "token": token,
         "interval": interval,
         "version": globals.AGENT_VERSION,
+        "encodings": wire_encoder.capabilities(),
         "data": data or {},
         "meta": meta
     }
 
+    start_time = time.monotonic()
     try:
         # Accept all certs
         if ignore_cert:
@@ -183,13 +216,15 @@ def send_request(cmd="ping", data=None):
             context = None
 
         connection = http.client.HTTPSConnection(server_host, context=context)
-        headers = {"Content-Type": "application/json"}
-        log(f"Payload: {payload}", "debug")
-        connection.request("POST", server_endpoint, body=json.dumps(payload), headers=headers)
+        body, headers = wire_encoder.encode(payload)
+        log("Payload: %s", "debug", payload)
+        connection.request("POST", server_endpoint, body=body, headers=headers)
+        agent_metrics.count("requests")
+        agent_metrics.count("bytes_sent", len(body))
         # Response
         response = connection.getresponse()
         raw_data = response.read().decode()
-        log(f"Raw response: {raw_data}", "debug")
+        log("Raw response: %s", "debug", raw_data)
 
         if response.status == 200:
             if raw_data:
@@ -204,6 +239,11 @@ def send_request(cmd="ping", data=None):
     finally:
         # Close
         connection.close()
+        agent_metrics.observe("http", time.monotonic() - start_time)
+
+    agent_metrics.count("http_failures")
+    # Connection reset or rejected: the server may not know our meta_id
+    wire_encoder.forget_meta()
 
     return None
 
@@ -221,22 +261,25 @@ def validate_response(response, token):
 
 def handle_signal(signum, frame):
     """
-    Signal Handler
+    Signal Handler: only record the signal and stop the scheduler. The running
+    job finishes, main() sends the pending events, saves and notifies.
 
     Returns:
     None
     """
-    global running
-    global config
+    global stop_signal
 
-    signal_name = None
-    msg = None
+    stop_signal = signum
+    if scheduler:
+        scheduler.stop()
 
-    for name, timer in globals.timers.items():
-        log(f"Cancelando timer: {name}")
-        timer.cancel()
-    globals.timers.clear()
+def send_shutdown_notification(signum):
+    """
+    Send app_shutdown (or system_shutdown) for the received signal
 
+    Returns:
+    None
+    """
     if signum == signal.SIGTERM:
         signal_name = 'SIGTERM'
     elif signum == signal.SIGHUP:
@@ -259,8 +302,6 @@ def handle_signal(signum, frame):
 
     data = {"msg": msg, "log_level": log_level, "event_type": event_type}
     send_notification(notification_type, data)
-    running = False
-    sys.exit(0)
 
 def validate_config():
     """
@@ -288,15 +329,205 @@ def validate_config():
         log("Configuration is valid", "debug")
     return True
 
-def main():
-    global running
+def collect(registry, datastore, sampler, history=None):
+    """
+    Run the due collectors and sample their results for the interval stats
+    and the local history. Scheduler job, every COLLECTOR_TICK
+
+    Returns:
+    None
+    """
+    results = registry.run_due()
+    samples = {}
+    if "load_avg" in results:
+        samples["loadavg"] = results["load_avg"]["loadavg"]["1min"]
+    if "memory" in results:
+        samples["memory"] = results["memory"]["meminfo"]["percent"]
+    if results.get("cpu"):
+        cpu_total = results["cpu"]["total"]
+        samples["cpu_usage"] = cpu_total["usage"]
+        samples["iowait"] = cpu_total["iowait"]
+        samples["steal"] = cpu_total["steal"]
+    now = time.time()
+    for name, value in samples.items():
+        sampler.add(name, value)
+        if history:
+            history.add(name, value, now)
+    if "listen_ports" in results:
+        startup = registry.get("listen_ports").runs == 1
+        tasks.check_listen_ports(
+            datastore, send_notification, add_events, results["listen_ports"], startup
+        )
+
+def watch_ports(registry, port_watcher):
+    """
+    Event driven ports check: on listening sockets change mark the listen_ports
+    collector due, the next collect tick runs it in the registry workers (its
+    timeout, CPU accounting, the only user of its socket index) and sends the
+    changes. Scheduler job, every PORTS_WATCH_INTERVAL
+
+    Returns:
+    None
+    """
+    if not port_watcher.check():
+        return
+    log("Listening sockets changed", "debug")
+    registry.trigger("listen_ports")
+
+def add_events(events):
+    """
+    Queue events in the aggregator (sent by send_events)
+
+    Returns:
+    None
+    """
+    agent_metrics.count("events", len(events))
+    event_aggregator.add(events)
+
+def send_events(force=False):
+    """
+    Send the aggregated events that are due (see EventAggregator).
+    Scheduler job, every second
+
+    Returns:
+    None
+    """
+    for event in event_aggregator.flush(force=force):
+        agent_metrics.count("events_sent")
+        logpo("Sending event:", event, "debug")
+        send_notification(event["name"], event["data"])
+
+def metrics_report(registry, reset=True):
+    """
+    Agent self metrics compact report (see agent_metrics.py)
+
+    Returns:
+        dict: report
+    """
+    agent_metrics.counters["events_suppressed"] = event_aggregator.total_suppressed
+    return agent_metrics.report(registry.stats(), reset=reset)
+
+def request_dump(signum, frame):
+    """
+    SIGUSR1 handler: only flag the dump, the dump_metrics job does it (the
+    reports take non reentrant locks and log)
+
+    Returns:
+    None
+    """
+    global dump_requested
+
+    dump_requested = True
+
+def dump_metrics(registry):
+    """
+    Log the agent metrics and the jobs stats when SIGUSR1 was received.
+    Scheduler job, every second
+
+    Returns:
+    None
+    """
+    global dump_requested
+
+    if not dump_requested:
+        return
+    dump_requested = False
+    logpo("Agent metrics: ", metrics_report(registry, reset=False), "notice")
+    if scheduler:
+        logpo("Job stats: ", scheduler.stats(), "notice")
+
+def send_history(history, request):
+    """
+    Send the last minutes of the local history asked by the server
+
+    Args:
+        request (dict): {"minutes": int, "metrics": list (optional, default all)}
+
+    Returns:
+    None
+    """
+    try:
+        minutes = min(float(request.get("minutes", 60)), globals.HISTORY_MAX_MINUTES)
+    except (TypeError, ValueError):
+        log(f"Invalid history request: {request}", "warning")
+        return
+    data = {"minutes": minutes, "history": history.query_all(minutes, request.get("metrics"))}
+    send_request(cmd="history", data=data)
+
+def ping(registry, datastore, event_processor, delta_encoder, history=None):
+    """
+    Send changes of the last collected data to server (ping), send events and
+    apply the response. Scheduler job, every config["interval"]
+
+    Returns:
+    None
+    """
     global config
+    global last_metrics_report
 
-    datastore = Datastore()
-    event_processor = EventProcessor()
+    start_time = time.monotonic()
+    token = config["token"]
+    extra_data = {}
+    current_state = {}
+
+    # Check and update collected data
+    for name in PING_COLLECTORS:
+        collector = registry.get(name)
+        current = collector.last_result
+        if current is None:
+            continue
+        current_payload = collector.payload(current)
+        current_state.update(current_payload)
+        if current != datastore.get_data(collector.key):
+            datastore.update_data(collector.key, current)
+            extra_data.update(current_payload)
+
+    if delta_encoder:
+        extra_data = delta_encoder.encode(current_state)
+    if start_time - last_metrics_report >= globals.AGENT_METRICS_INTERVAL:
+        last_metrics_report = start_time
+        extra_data["agent_metrics"] = metrics_report(registry)
+
+    log("Sending ping to server. " + str(globals.AGENT_VERSION), "debug")
+    response = send_request(cmd="ping", data=extra_data)
+    if delta_encoder and (response is None or response.get("resync")):
+        # Delta lost or server detect a seq gap
+        delta_encoder.resync()
+
+    add_events(event_processor.process_changes(datastore, registry.latest("top_processes")))
+    send_events()
+
+    if response:
+        log("Response receive... validating", "debug")
+        valid_response = validate_response(response, token)
+        if valid_response:
+            wire_encoder.negotiate(valid_response)
+            data = valid_response.get("data", {})
+            new_interval = valid_response.get("refresh")
+            if new_interval and config['interval'] != int(new_interval):
+                config["interval"] = int(new_interval)
+                scheduler.set_interval("ping", config["interval"])
+                log(f"Interval update to {config['interval']} seconds", "info")
+            history_request = valid_response.get("history")
+            if history and isinstance(history_request, dict):
+                send_history(history, history_request)
+            if isinstance(data, dict) and "something" in data:
+                # example
+                try:
+                    pass
+                except ValueError:
+                    log("invalid", "warning")
+        else:
+            log("Invalid response receive", "warning")
 
-    # Used for iowait
-    last_cpu_times = psutil.cpu_times()
+    duration = time.monotonic() - start_time
+    agent_metrics.observe("loop", duration)
+    log("Tiempo bucle %.2f, next in %s (segundos).", "debug", duration, config['interval'])
+
+def main():
+    global config
+    global scheduler
+    global datastore
 
     log("Init monnet linux agent", "info")
     # Cargar la configuracion desde el archivo
@@ -307,16 +538,55 @@ def main():
 
     try:
         validate_config()
+        if config.get("log_level"):
+            set_log_level(config["log_level"])
     except ValueError as e:
         log(str(e), "err")
         return
 
-    token = config["token"]
     config["interval"] = config["default_interval"]
+    # Host /proc and /sys mounted elsewhere (containers)
+    globals.PROC_ROOT = config.get("proc_root", globals.PROC_ROOT)
+    globals.SYS_ROOT = config.get("sys_root", globals.SYS_ROOT)
+    datastore = Datastore(config.get("datastore_file", "datastore.json"))
+    datastore.load_data()
+    event_processor = EventProcessor(config.get("rules"))
+    datastore.attach(
+        "processed_events",
+        lambda: dict(event_processor.processed_events),
+        event_processor.processed_events.update
+    )
+
+    delta_encoder = None
+    if config.get("delta_mode"):
+        delta_encoder = DeltaEncoder(config.get("delta_full_every"))
+        log("Delta mode enabled", "info")
+        datastore.attach("delta_encoder", delta_encoder.dump, delta_encoder.restore)
+
+    registry = CollectorRegistry(config.get("collector_cpu_budget"))
+    registry.register(LoadAvgCollector())
+    registry.register(MemoryCollector())
+    registry.register(DisksCollector(network_fs=config.get("disks_network_fs", False)))
+    registry.register(DiskStatsCollector())
+    registry.register(NetDevCollector(ignore=config.get("netdev_ignore")))
+    registry.register(CpuCollector(cores=config.get("cpu_cores", True)))
+    registry.register(TopProcessesCollector())
+    registry.register(ListenPortsCollector())
+    registry.configure(config.get("collectors"))
+
+    sampler = MetricSampler()
+    history = None
+    if config.get("history", True):
+        try:
+            history = MetricsHistory(config.get("history_dir"))
+        except OSError as e:
+            log(f"Local history disabled: {e}", "err")
+    scheduler = Scheduler()
 
     # Signal Handle
     signal.signal(signal.SIGINT, handle_signal)
     signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGUSR1, request_dump)
 
     starting_data = {
         'msg': datetime.now().time(),
@@ -327,79 +597,42 @@ def main():
     }
     send_notification('starting', starting_data)
 
-    # Timer functions
-    tasks.check_listen_ports(datastore, send_notification, startup=1)
-    tasks.send_stats(datastore, send_notification)
-
-    while running:
-        extra_data = {}
-        current_load_avg = info_linux.get_load_avg()
-        current_memory_info = info_linux.get_memory_info()
-        current_disk_info = info_linux.get_disks_info()
-#        current_ports_info = info_linux.get_ports_grouped()
-
-        current_time = time.time()
-
-        # Check and update load average
-        if current_load_avg != datastore.get_data("last_load_avg"):
-            datastore.update_data("last_load_avg", current_load_avg)
-            extra_data.update(current_load_avg)
-
-        # Check and update memory info
-        if current_memory_info != datastore.get_data("last_memory_info"):
-            datastore.update_data("last_memory_info", current_memory_info)
-            extra_data.update(current_memory_info)
-
-        # Check and update disk info
-        if current_disk_info != datastore.get_data("last_disk_info"):
-            datastore.update_data("last_disk_info", current_disk_info)
-            extra_data.update(current_disk_info)
-
-        # Get IOwait
-        current_cpu_times = psutil.cpu_times()
-        current_iowait = info_linux.get_iowait(last_cpu_times, current_cpu_times)
-        current_iowait = round(current_iowait, 2)
-        if current_iowait != datastore.get_data("last_iowait"):
-            datastore.update_data("last_iowait", current_iowait)
-            extra_data.update({'iowait': current_iowait})
-        last_cpu_times = current_cpu_times
-
-        # Send load 5min stats
-        #if (current_time - last_stats_sent) > stats_interval:
-        #    extra_data["loadavg_stats"] = current_load_avg['loadavg']['5min']
-        #    extra_data["iowait_stats"] = current_iowait
-        #   last_stats_sent = current_time
-
-        log("Sending ping to server. " + str(globals.AGENT_VERSION), "debug")
-        response = send_request(cmd="ping", data=extra_data)
-
-        events = event_processor.process_changes(datastore)
-        for event in events:
-            logpo("Sending event:", event, "debug")
-            send_notification(event["name"], event["data"])
-
-        if response:
-            log("Response receive... validating", "debug")
-            valid_response = validate_response(response, token)
-            if valid_response:
-                data = valid_response.get("data", {})
-                new_interval = valid_response.get("refresh")
-                if new_interval and config['interval'] != int(new_interval):
-                    config["interval"] = new_interval
-                    log(f"Interval update to {config['interval']} seconds", "info")
-                if isinstance(data, dict) and "something" in data:
-                    # example
-                    try:
-                        pass
-                    except ValueError:
-                        log("invalid", "warning")
-            else:
-                log("Invalid response receive", "warning")
-
-        end_time = time.time()
-        duration = end_time - current_time
-        log(f"Tiempo bucle {duration:.2f} + Sleeping {config['interval']} (segundos).", "debug")
-        time.sleep(config["interval"])
+    # Jobs
+    scheduler.add_job(
+        "collect", collect, globals.COLLECTOR_TICK, args=(registry, datastore, sampler, history)
+    )
+    scheduler.add_job(
+        "ping", ping, config["interval"],
+        args=(registry, datastore, event_processor, delta_encoder, history)
+    )
+    scheduler.add_job("send_events", send_events, 1)
+    scheduler.add_job("dump_metrics", dump_metrics, 1, args=(registry,))
+    scheduler.add_job(
+        "save_datastore", datastore.save_data, globals.DATASTORE_FLUSH_INTERVAL,
+        delay=globals.DATASTORE_FLUSH_INTERVAL
+    )
+    if config.get("ports_watch", True):
+        port_watcher = PortWatcher()
+        scheduler.add_job(
+            "watch_ports", watch_ports, globals.PORTS_WATCH_INTERVAL,
+            args=(registry, port_watcher)
+        )
+    scheduler.add_job(
+        "send_stats", tasks.send_stats, globals.TIMER_STATS_INTERVAL,
+        delay=globals.TIMER_STATS_INTERVAL, args=(datastore, send_notification, sampler)
+    )
+
+    scheduler.run()
+    registry.shutdown()
+    # Pending aggregated events
+    send_events(force=True)
+    datastore.save_data()
+    if history:
+        history.close()
+    if stop_signal is not None:
+        send_shutdown_notification(stop_signal)
+    logpo("Scheduler stopped. Job stats: ", scheduler.stats(), "debug")
+    logpo("Collector stats: ", registry.stats(), "debug")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,134 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Cached mount table
+
+/proc/self/mountinfo is kept open and registered in poll(): the kernel reports
+POLLPRI|POLLERR when the mount namespace changes, only then the table is
+parsed again.
+"""
+
+# Standard
+import os
+import re
+import select
+from typing import Callable, List, Optional, Tuple
+# Local
+import globals
+from log_linux import log
+
+Mount = Tuple[str, str, str]
+
+# Octal escapes in mount fields (\040 space, \011 tab, \012 newline, \134 backslash)
+_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+def unescape(field: str) -> str:
+    """ Mount field octal escapes to chars """
+    if "\\" not in field:
+        return field
+
+    return _ESCAPE.sub(lambda match: chr(int(match.group(1), 8)), field)
+
+
+def parse_mountinfo(content: str) -> List[Mount]:
+    """
+    Parse /proc/<pid>/mountinfo
+
+    36 35 98:0 /mnt1 /mnt/parent rw,noatime master:1 - ext3 /dev/root rw,errors=continue
+
+    Returns:
+        list: (device, mountpoint, fstype)
+    """
+    mounts = []
+    for line in content.splitlines():
+        pre, sep, post = line.partition(" - ")
+        if not sep:
+            continue
+        pre_fields = pre.split()
+        post_fields = post.split()
+        if len(pre_fields) < 5 or len(post_fields) < 2:
+            continue
+        mounts.append((unescape(post_fields[1]), unescape(pre_fields[4]), post_fields[0]))
+
+    return mounts
+
+
+class MountTable:
+    """
+        Parsed mount table, re-read only when the kernel signals a change
+        (fallback: re-read every call if poll() is not available).
+        mount_filter: keep only the mounts it accepts, applied once per reload
+    """
+    def __init__(self, path: Optional[str] = None,
+                 mount_filter: Optional[Callable[[Mount], bool]] = None):
+        if path is None:
+            path = os.path.join(globals.PROC_ROOT, "self", "mountinfo")
+        self.path = path
+        self.mount_filter = mount_filter
+        self.mounts: Optional[List[Mount]] = None
+        self.dirty = False
+        self.reloads = 0
+        self.fd = None
+        self.poller = None
+        try:
+            self.fd = os.open(path, os.O_RDONLY)
+            self.poller = select.poll()
+            self.poller.register(self.fd, select.POLLPRI | select.POLLERR)
+        except OSError as e:
+            log(f"Mount table change notification unavailable: {e}", "info")
+            self.close()
+
+    def close(self):
+        """ Close the mountinfo descriptor """
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.poller = None
+
+    def changed(self) -> bool:
+        """ True if the mount table changed since the last load (or never loaded) """
+        if self.mounts is None or self.poller is None:
+            return True
+        # The kernel reports each change once, keep it until reload()
+        if not self.dirty and self.poller.poll(0):
+            self.dirty = True
+
+        return self.dirty
+
+    def get_mounts(self) -> List[Mount]:
+        """
+        Mount table
+
+        Returns:
+            list: (device, mountpoint, fstype)
+        """
+        if self.changed():
+            self.reload()
+
+        return self.mounts
+
+    def reload(self):
+        """ Parse the mount table """
+        # Changes from here on are seen by the next poll
+        if self.poller is not None:
+            self.poller.poll(0)
+        if self.fd is not None:
+            chunks = []
+            offset = 0
+            while True:
+                chunk = os.pread(self.fd, 65536, offset)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                offset += len(chunk)
+            content = b"".join(chunks).decode(errors="replace")
+        else:
+            with open(self.path, "r") as f:
+                content = f.read()
+        mounts = parse_mountinfo(content)
+        if self.mount_filter is not None:
+            mounts = [mount for mount in mounts if self.mount_filter(mount)]
+        self.mounts = mounts
+        self.dirty = False
+        self.reloads += 1
@@ -0,0 +1,138 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Network interfaces traffic from /proc/net/dev
+
+    face |bytes packets errs drop fifo frame compressed multicast|bytes packets errs drop ...
+    eth0: 123   4       0    0    0    0     0          0         456   7       0    0
+"""
+
+# Standard
+import fnmatch
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+# Local
+import globals
+from diskstats import counter_deltas
+from proc_reader import proc_reader as default_proc_reader
+
+# Receive / transmit columns used: bytes, packets, errs, drop
+NETDEV_COLUMNS = (0, 1, 2, 3, 8, 9, 10, 11)
+
+
+class NetDev:
+    """
+        Per interface rx/tx bytes and packets per second, errors and drops per
+        second and link utilization (if the link speed is known) between samples.
+        Interfaces matching the ignore patterns (fnmatch) are skipped before
+        any number is parsed.
+    """
+    def __init__(self, ignore: Optional[Iterable[str]] = None, sys_root: Optional[str] = None,
+                 proc_reader=None):
+        patterns = ignore if ignore is not None else globals.NETDEV_IGNORE
+        self.ignore = re.compile("|".join(fnmatch.translate(p) for p in patterns) or "(?!)")
+        self.sys_root = sys_root or globals.SYS_ROOT
+        self.proc_reader = proc_reader or default_proc_reader
+        # interface -> accepted
+        self.interfaces: Dict[bytes, bool] = {}
+        # interface -> link speed Mb/s (None unknown)
+        self.speeds: Dict[str, Optional[int]] = {}
+        self.last: Optional[Dict[str, Tuple[int, ...]]] = None
+        self.last_time = 0.0
+
+    def _accepted(self, name: bytes) -> bool:
+        accepted = self.interfaces.get(name)
+        if accepted is None:
+            accepted = self.ignore.match(name.decode()) is None
+            self.interfaces[name] = accepted
+
+        return accepted
+
+    def _parse(self, buffer, length: int) -> Tuple[Dict[str, Tuple[int, ...]], Set[bytes]]:
+        counters = {}
+        names = set()
+        # Skip the two header lines
+        start = buffer.find(b"\n", buffer.find(b"\n", 0, length) + 1, length) + 1
+        for line in bytes(buffer[start:length]).splitlines():
+            name, _, values = line.partition(b":")
+            name = name.strip()
+            names.add(name)
+            if not self._accepted(name):
+                continue
+            fields = values.split()
+            if len(fields) < 16:
+                continue
+            counters[name.decode()] = tuple(int(fields[i]) for i in NETDEV_COLUMNS)
+
+        return counters, names
+
+    def link_speed(self, interface: str) -> Optional[int]:
+        """ Link speed Mb/s from sysfs, None if unknown (virtual, down) """
+        if interface not in self.speeds:
+            speed = None
+            try:
+                path = os.path.join(self.sys_root, "class", "net", interface, "speed")
+                with open(path, "r") as f:
+                    speed = int(f.read())
+            except (OSError, ValueError):
+                pass
+            self.speeds[interface] = speed if speed and speed > 0 else None
+
+        return self.speeds[interface]
+
+    def sample(self, now: Optional[float] = None) -> Optional[List[dict]]:
+        """
+        Rates since the previous sample
+
+        Returns:
+            list: [{"interface", "rx_bytes", "tx_bytes", "rx_packets", "tx_packets",
+                    "rx_errors", "tx_errors", "rx_drops", "tx_drops" (per second),
+                    "drop_percent", "util" (percent, only known link speed)}]
+                  None on the first sample
+        """
+        if now is None:
+            now = time.monotonic()
+        current, names = self.proc_reader.file("net/dev").read(self._parse)
+        if len(self.interfaces) > len(names):
+            # Forget removed interfaces (container veths come and go)
+            self.interfaces = {
+                name: accepted for name, accepted in self.interfaces.items() if name in names
+            }
+            self.speeds = {name: speed for name, speed in self.speeds.items() if name in current}
+        last, elapsed = self.last, now - self.last_time
+        self.last, self.last_time = current, now
+        if last is None or elapsed <= 0:
+            return None
+
+        stats = []
+        for interface, counters in current.items():
+            previous = last.get(interface)
+            if previous is None:
+                continue
+            delta = counter_deltas(counters, previous)
+            if delta is None:
+                # Reset (interface re-created): new baseline
+                continue
+            packets = delta[1] + delta[5]
+            drops = delta[3] + delta[7]
+            entry = {
+                "interface": interface,
+                "rx_bytes": round(delta[0] / elapsed),
+                "tx_bytes": round(delta[4] / elapsed),
+                "rx_packets": round(delta[1] / elapsed, 2),
+                "tx_packets": round(delta[5] / elapsed, 2),
+                "rx_errors": round(delta[2] / elapsed, 2),
+                "tx_errors": round(delta[6] / elapsed, 2),
+                "rx_drops": round(delta[3] / elapsed, 2),
+                "tx_drops": round(delta[7] / elapsed, 2),
+                "drop_percent": round(drops / (packets + drops) * 100, 2) if drops else 0,
+            }
+            speed = self.link_speed(interface)
+            if speed:
+                bits = max(delta[0], delta[4]) * 8 / elapsed
+                entry["util"] = round(min(bits / (speed * 1000000) * 100, 100), 2)
+            stats.append(entry)
+
+        return stats
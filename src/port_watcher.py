@@ -0,0 +1,206 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Event driven listening ports change detection
+
+Kernel sock_diag only multicasts socket destroy notifications
+(SKNLGRP_INET*_DESTROY, kernel >= 4.10, CAP_NET_ADMIN), there is no create
+notification, and no listener only group: every TCP/UDP socket close of the
+host is multicast. A classic BPF filter on the netlink socket drops in kernel
+the ones with a remote port (connections), only listening/unconnected
+sockets are queued to the agent. The watcher:
+    - drains the destroy notifications every call (cheap when idle), a
+      destroyed listening socket triggers an immediate check
+    - polls a signature of the listening sockets every PORTS_WATCH_POLL.
+      sock_diag dump filtered by state in kernel (tiny even with thousands of
+      connections), /proc/net parsing as fallback.
+"""
+
+# Standard
+import ctypes
+import errno
+import socket
+import struct
+import time
+from typing import Dict, List, Optional
+# Local
+import globals
+import proc_net
+from constants import LogLevel
+from constants import EventType
+from log_linux import log
+
+# sock_diag multicast groups
+SKNLGRP_INET_TCP_DESTROY = 1
+SKNLGRP_INET_UDP_DESTROY = 2
+SKNLGRP_INET6_TCP_DESTROY = 3
+SKNLGRP_INET6_UDP_DESTROY = 4
+
+SO_ATTACH_FILTER = 26
+# struct sock_filter {u16 code; u8 jt; u8 jf; u32 k}
+SOCK_FILTER = struct.Struct("HBBI")
+# nlmsghdr (16) + idiag_family, state, timer, retrans (4) + idiag_sport (2)
+IDIAG_DPORT_OFFSET = 22
+# Accept destroyed sockets without remote port, drop the rest
+LISTEN_DESTROY_FILTER = (
+    (0x28, 0, 0, IDIAG_DPORT_OFFSET),   # ldh [idiag_dport]
+    (0x15, 0, 1, 0),                    # jeq #0, accept, drop
+    (0x06, 0, 0, 0xffffffff),           # ret accept
+    (0x06, 0, 0, 0),                    # ret drop
+)
+
+
+def port_key(record: dict) -> tuple:
+    """ Port identity, the owner service is not part of it """
+    return (record["protocol"], record["ip_version"], record["interface"], record["port"])
+
+
+def port_change_events(last_ports: List[dict], current_ports: List[dict]) -> List[Dict]:
+    """
+    PORT_NEW / PORT_DOWN events between two listen ports records lists
+
+    Returns:
+        list: [{"name": str, "data": dict}]
+    """
+    last: Dict[tuple, dict] = {port_key(record): record for record in last_ports or []}
+    current: Dict[tuple, dict] = {port_key(record): record for record in current_ports or []}
+    events = []
+    for key, record in current.items():
+        if key not in last:
+            events.append({
+                "name": "port_new",
+                "data": {
+                    "port_info": record,
+                    "event_value": record["port"],
+                    "log_level": LogLevel.NOTICE,
+                    "event_type": EventType.PORT_NEW
+                }
+            })
+    for key, record in last.items():
+        if key not in current:
+            events.append({
+                "name": "port_down",
+                "data": {
+                    "port_info": record,
+                    "event_value": record["port"],
+                    "log_level": LogLevel.WARNING,
+                    "event_type": EventType.PORT_DOWN
+                }
+            })
+
+    return events
+
+
+def attach_filter(sock: socket.socket, program: tuple):
+    """ Attach a classic BPF program (SO_ATTACH_FILTER, the kernel copies it) """
+    code = ctypes.create_string_buffer(b"".join(SOCK_FILTER.pack(*insn) for insn in program))
+    # struct sock_fprog {unsigned short len; struct sock_filter *filter}
+    fprog = struct.pack("HP", len(program), ctypes.addressof(code))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+class PortWatcher:
+    """
+        Detect listening sockets changes. check() is cheap enough to be called
+        every second.
+    """
+    def __init__(self, poll_interval: Optional[float] = None):
+        self.poll_interval = poll_interval or globals.PORTS_WATCH_POLL
+        self.signature = None
+        self.last_poll = 0.0
+        self.use_netlink_dump = True
+        self.netlink = self._subscribe()
+
+    def _subscribe(self):
+        groups = 0
+        for group in (
+            SKNLGRP_INET_TCP_DESTROY, SKNLGRP_INET_UDP_DESTROY,
+            SKNLGRP_INET6_TCP_DESTROY, SKNLGRP_INET6_UDP_DESTROY
+        ):
+            groups |= 1 << (group - 1)
+        try:
+            sock = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK,
+                proc_net.NETLINK_SOCK_DIAG
+            )
+            sock.bind((0, groups))
+        except OSError as e:
+            log(f"sock_diag destroy notifications unavailable, polling only: {e}", "info")
+            return None
+        try:
+            attach_filter(sock, LISTEN_DESTROY_FILTER)
+        except OSError as e:
+            # Filtered in _listen_destroyed() only
+            log(f"sock_diag destroy filter unavailable: {e}", "info")
+
+        return sock
+
+    def close(self):
+        """ Close the netlink subscription """
+        if self.netlink is not None:
+            self.netlink.close()
+            self.netlink = None
+
+    def _listen_destroyed(self) -> bool:
+        """ Drain destroy notifications, True if a listening/unconnected socket died """
+        if self.netlink is None:
+            return False
+        destroyed = False
+        while True:
+            try:
+                data = self.netlink.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    # Receive queue overflowed, notifications lost: check now
+                    destroyed = True
+                    continue
+                log(f"sock_diag notifications error, polling only: {e}", "warning")
+                self.close()
+                break
+            offset = 0
+            while offset + proc_net.NLMSGHDR.size <= len(data):
+                length = proc_net.NLMSGHDR.unpack_from(data, offset)[0]
+                if length < proc_net.NLMSGHDR.size:
+                    break
+                message = data[offset + proc_net.NLMSGHDR.size:offset + length]
+                if len(message) >= proc_net.INET_DIAG_MSG.size:
+                    fields = proc_net.INET_DIAG_MSG.unpack_from(message)
+                    # Listening/unconnected socket: no remote port. The state is
+                    # already CLOSE when a listener is destroyed.
+                    if fields[5] == b"\0\0":
+                        destroyed = True
+                offset += (length + 3) & ~3
+
+        return destroyed
+
+    def _current_signature(self) -> int:
+        sockets = None
+        if self.use_netlink_dump:
+            try:
+                sockets = proc_net.netlink_listen_sockets()
+            except OSError as e:
+                log(f"sock_diag dump unavailable, using /proc/net: {e}", "info")
+                self.use_netlink_dump = False
+        if sockets is None:
+            sockets = proc_net.read_listen_sockets()
+
+        return hash(frozenset(sock[:4] for sock in sockets))
+
+    def check(self, now: Optional[float] = None) -> bool:
+        """
+        Returns:
+            bool: True if the listening sockets changed since the last check
+        """
+        if now is None:
+            now = time.monotonic()
+        destroyed = self._listen_destroyed()
+        if not destroyed and now - self.last_poll < self.poll_interval:
+            return False
+        self.last_poll = now
+        signature = self._current_signature()
+        changed = self.signature is not None and signature != self.signature
+        self.signature = signature
+
+        return changed
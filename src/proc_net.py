@@ -0,0 +1,261 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Native listening sockets scanner: /proc/net/{tcp,tcp6,udp,udp6}
+Fallback: NETLINK sock_diag (inet_diag) dump
+
+Socket tuples: (protocol, ip_version, address, port, inode)
+    address: "0.0.0.0", "[::]", "127.0.0.1", "[::1]" ... (same format as `ss`)
+"""
+
+# Standard
+import os
+import socket
+import struct
+from typing import Dict, List, Optional, Tuple
+# Local
+import globals
+
+# (file, protocol, ip_version, listen state)
+# TCP_LISTEN = 0x0A, unconnected UDP = TCP_CLOSE 0x07 (ss UNCONN)
+PROC_NET_FILES = (
+    ("tcp", "tcp", "ipv4", "0A"),
+    ("tcp6", "tcp", "ipv6", "0A"),
+    ("udp", "udp", "ipv4", "07"),
+    ("udp6", "udp", "ipv6", "07"),
+)
+
+# NETLINK sock_diag
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 0x2
+NLMSG_DONE = 0x3
+TCP_LISTEN = 10
+TCP_CLOSE = 7
+NLMSGHDR = struct.Struct("=IHHII")
+# family, protocol, ext, pad, states, inet_diag_sockid (sport, dport, src, dst, if, cookie)
+INET_DIAG_REQ_V2 = struct.Struct("=BBBBI48s")
+# family, state, timer, retrans, sport, dport, src, dst, if, cookie, expires, rqueue, wqueue, uid, inode
+INET_DIAG_MSG = struct.Struct("=BBBB2s2s16s16sI8sIIIII")
+
+SocketTuple = Tuple[str, str, str, int, int]
+
+
+def format_address(raw: bytes, ip_version: str) -> str:
+    """
+    Packed address to the `ss` text format
+
+    Args:
+        raw (bytes): 4 or 16 bytes, network order
+        ip_version (str): ipv4 / ipv6
+
+    Returns:
+        str: address, ipv6 in brackets
+    """
+    if ip_version == "ipv4":
+        return socket.inet_ntop(socket.AF_INET, raw[:4])
+
+    return "[" + socket.inet_ntop(socket.AF_INET6, raw[:16]) + "]"
+
+
+def decode_proc_address(hex_address: str) -> bytes:
+    """
+    /proc/net address (hex, 32 bit words in host order) to network order bytes
+    """
+    raw = bytes.fromhex(hex_address)
+    if len(raw) == 4:
+        return struct.pack("!I", struct.unpack("=I", raw)[0])
+
+    return b"".join(
+        struct.pack("!I", struct.unpack("=I", raw[i:i + 4])[0]) for i in range(0, 16, 4)
+    )
+
+
+def parse_proc_net(path: str, protocol: str, ip_version: str, state: str) -> List[SocketTuple]:
+    """
+    Listening sockets of a /proc/net file
+
+    Returns:
+        list: socket tuples
+    """
+    sockets = []
+    state = state.encode()
+    # Few distinct addresses, decode each once
+    addresses = {}
+    with open(path, "rb") as f:
+        next(f, None)
+        for line in f:
+            # sl local_address rem_address st tx:rx tr:when retrnsmt uid timeout inode
+            fields = line.split(None, 10)
+            if len(fields) < 10 or fields[3] != state:
+                continue
+            hex_address, _, hex_port = fields[1].partition(b":")
+            address = addresses.get(hex_address)
+            if address is None:
+                address = format_address(decode_proc_address(hex_address.decode()), ip_version)
+                addresses[hex_address] = address
+            sockets.append((protocol, ip_version, address, int(hex_port, 16), int(fields[9])))
+
+    return sockets
+
+
+def read_listen_sockets(proc_root: Optional[str] = None) -> List[SocketTuple]:
+    """
+    Listening TCP and unconnected UDP sockets from /proc/net
+
+    Raises:
+        OSError: /proc/net not readable
+    """
+    proc_root = proc_root or globals.PROC_ROOT
+    sockets = []
+    for filename, protocol, ip_version, state in PROC_NET_FILES:
+        path = os.path.join(proc_root, "net", filename)
+        try:
+            sockets.extend(parse_proc_net(path, protocol, ip_version, state))
+        except FileNotFoundError:
+            # No ipv6 support
+            if ip_version == "ipv4":
+                raise
+
+    return sockets
+
+
+def _netlink_dump(sock, family: int, protocol: int, states: int, seq: int) -> List[bytes]:
+    request = INET_DIAG_REQ_V2.pack(family, protocol, 0, 0, states, b"\0" * 48)
+    header = NLMSGHDR.pack(
+        NLMSGHDR.size + len(request), SOCK_DIAG_BY_FAMILY,
+        NLM_F_REQUEST | NLM_F_DUMP, seq, 0
+    )
+    sock.send(header + request)
+    messages = []
+    while True:
+        data = sock.recv(65536)
+        offset = 0
+        while offset + NLMSGHDR.size <= len(data):
+            length, msg_type, _flags, _seq, _pid = NLMSGHDR.unpack_from(data, offset)
+            if msg_type == NLMSG_DONE:
+                return messages
+            if msg_type == NLMSG_ERROR:
+                raise OSError("sock_diag dump error")
+            messages.append(data[offset + NLMSGHDR.size:offset + length])
+            # NLMSG_ALIGN
+            offset += (length + 3) & ~3
+        if not data:
+            return messages
+
+
+def netlink_listen_sockets() -> List[SocketTuple]:
+    """
+    Listening TCP and unconnected UDP sockets from a NETLINK sock_diag dump
+
+    Raises:
+        OSError: netlink not available
+    """
+    sockets = []
+    queries = (
+        (socket.AF_INET, socket.IPPROTO_TCP, 1 << TCP_LISTEN, "tcp", "ipv4"),
+        (socket.AF_INET6, socket.IPPROTO_TCP, 1 << TCP_LISTEN, "tcp", "ipv6"),
+        (socket.AF_INET, socket.IPPROTO_UDP, 1 << TCP_CLOSE, "udp", "ipv4"),
+        (socket.AF_INET6, socket.IPPROTO_UDP, 1 << TCP_CLOSE, "udp", "ipv6"),
+    )
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_SOCK_DIAG) as sock:
+        for seq, (family, ipproto, states, protocol, ip_version) in enumerate(queries, 1):
+            for message in _netlink_dump(sock, family, ipproto, states, seq):
+                if len(message) < INET_DIAG_MSG.size:
+                    continue
+                fields = INET_DIAG_MSG.unpack_from(message)
+                sport = struct.unpack("!H", fields[4])[0]
+                address = format_address(fields[6], ip_version)
+                sockets.append((protocol, ip_version, address, sport, fields[14]))
+
+    return sockets
+
+
+def socket_owners(proc_root: Optional[str] = None) -> Dict[int, List[str]]:
+    """
+    Map socket inode to the names of the processes holding it (full /proc scan)
+
+    Returns:
+        dict: {inode: [comm, ...]}
+    """
+    proc_root = proc_root or globals.PROC_ROOT
+    owners: Dict[int, List[str]] = {}
+    for pid in os.listdir(proc_root):
+        if not pid.isdigit():
+            continue
+        fd_dir = os.path.join(proc_root, pid, "fd")
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        comm = None
+        for fd in fds:
+            try:
+                target = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            if not target.startswith("socket:["):
+                continue
+            if comm is None:
+                try:
+                    with open(os.path.join(proc_root, pid, "comm"), "r") as f:
+                        comm = f.read().strip()
+                except OSError:
+                    break
+            names = owners.setdefault(int(target[8:-1]), [])
+            if comm not in names:
+                names.append(comm)
+
+    return owners
+
+
+def build_port_records(sockets: List[SocketTuple], owners: Dict[int, List[str]]) -> List[dict]:
+    """
+    Flattened port records, one per (interface, port, service, protocol, ip_version).
+    Sockets without owner process are skipped (as `ss -p` parsing does).
+
+    Returns:
+        list: [{'interface', 'port', 'service', 'protocol', 'ip_version'}]
+    """
+    seen = set()
+    for protocol, ip_version, address, port, inode in sockets:
+        for service in owners.get(inode, ()):
+            seen.add((address, port, service, protocol, ip_version))
+
+    return [
+        {
+            'interface': interface,
+            'port': port,
+            'service': service,
+            'protocol': protocol,
+            'ip_version': ip_version
+        }
+        for interface, port, service, protocol, ip_version in sorted(
+            seen, key=lambda entry: (entry[3], entry[4], entry[1], entry[0], entry[2])
+        )
+    ]
+
+
+def get_listen_ports(proc_root: Optional[str] = None, socket_index=None) -> List[dict]:
+    """
+    Listening ports records. /proc/net first, NETLINK sock_diag fallback
+
+    Args:
+        socket_index (SocketInodeIndex): Incremental owners index, full /proc scan if None
+
+    Raises:
+        OSError: neither source available
+    """
+    try:
+        sockets = read_listen_sockets(proc_root)
+    except OSError:
+        sockets = netlink_listen_sockets()
+
+    if socket_index is not None:
+        owners = socket_index.owners(inode for _, _, _, _, inode in sockets)
+    else:
+        owners = socket_owners(proc_root)
+
+    return build_port_records(sockets, owners)
@@ -0,0 +1,166 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Low overhead /proc reader
+
+The files are opened once and re-read with preadv() at offset 0 (procfs
+regenerates the content) into a preallocated buffer. Parsers look up only the
+fields they need in the raw bytes, no per line split / dict of everything.
+"""
+
+# Standard
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+# Local
+import globals
+
+PROC_READ_SIZE = 4096
+
+
+class ProcFile:
+    """
+        Persistent descriptor and buffer of a /proc file. The buffer grows
+        if the file does not fit. Thread safe: callers parse inside read().
+    """
+    def __init__(self, path: str, size: int = PROC_READ_SIZE):
+        self.path = path
+        self.buffer = bytearray(size)
+        self.lock = threading.Lock()
+        self.fd: Optional[int] = None
+
+    def _open(self):
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+
+    def close(self):
+        """ Close the descriptor (reopened on the next read) """
+        with self.lock:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+    def read(self, parser):
+        """
+        Fill the buffer and call parser(buffer, length) holding the lock
+
+        Returns:
+            parser result
+        """
+        with self.lock:
+            self._open()
+            while True:
+                try:
+                    length = os.preadv(self.fd, [self.buffer], 0)
+                except OSError:
+                    # Stale descriptor, retry once with a new one
+                    os.close(self.fd)
+                    self.fd = None
+                    self._open()
+                    length = os.preadv(self.fd, [self.buffer], 0)
+                if length < len(self.buffer):
+                    break
+                # Maybe truncated
+                self.buffer = bytearray(len(self.buffer) * 2)
+
+            return parser(self.buffer, length)
+
+
+def field_values(buffer: bytearray, length: int, names: Iterable[bytes]) -> Dict[bytes, int]:
+    """
+    First integer after each "name" line prefix (meminfo, vmstat...)
+
+    Returns:
+        dict: {name: int} missing names are omitted
+    """
+    values = {}
+    for name in names:
+        if buffer.startswith(name):
+            pos = 0
+        else:
+            pos = buffer.find(b"\n" + name, 0, length)
+            if pos < 0:
+                continue
+            pos += 1
+        end = buffer.find(b"\n", pos, length)
+        if end < 0:
+            end = length
+        fields = buffer[pos + len(name):end].split()
+        if fields:
+            values[name] = int(fields[0])
+
+    return values
+
+
+class ProcReader:
+    """ Shared /proc files, one ProcFile per path """
+    MEMINFO_FIELDS = (b"MemTotal:", b"MemFree:", b"MemAvailable:", b"Buffers:", b"Cached:")
+
+    def __init__(self, proc_root: Optional[str] = None):
+        # None: globals.PROC_ROOT when a file is opened
+        self.proc_root = proc_root
+        self.files: Dict[str, ProcFile] = {}
+        self.lock = threading.Lock()
+
+    def file(self, name: str) -> ProcFile:
+        """ ProcFile of proc_root/name """
+        proc_file = self.files.get(name)
+        if proc_file is None:
+            with self.lock:
+                proc_file = self.files.get(name)
+                if proc_file is None:
+                    proc_file = ProcFile(
+                        os.path.join(self.proc_root or globals.PROC_ROOT, name)
+                    )
+                    self.files[name] = proc_file
+
+        return proc_file
+
+    def close(self):
+        """ Close all descriptors """
+        for proc_file in list(self.files.values()):
+            proc_file.close()
+
+    def meminfo(self, fields: Iterable[bytes] = MEMINFO_FIELDS) -> Dict[str, int]:
+        """
+        Selected /proc/meminfo fields in bytes
+
+        Returns:
+            dict: {"MemTotal": bytes, ...}
+        """
+        values = self.file("meminfo").read(
+            lambda buffer, length: field_values(buffer, length, fields)
+        )
+
+        return {name[:-1].decode(): value * 1024 for name, value in values.items()}
+
+    def cpu_times(self) -> Optional[Tuple[int, ...]]:
+        """
+        Aggregated "cpu " line of /proc/stat
+
+        Returns:
+            tuple: user, nice, system, idle, iowait, irq, softirq, steal (ticks)
+        """
+        def parse(buffer, length):
+            if not buffer.startswith(b"cpu "):
+                return None
+            end = buffer.find(b"\n", 0, length)
+            return tuple(map(int, buffer[4:end].split()[:8]))
+
+        return self.file("stat").read(parse)
+
+    def loadavg(self) -> Tuple[float, float, float]:
+        """ /proc/loadavg 1, 5 and 15 minutes """
+        return self.file("loadavg").read(
+            lambda buffer, length: tuple(float(value) for value in buffer[:length].split()[:3])
+        )
+
+    def uptime(self) -> float:
+        """ /proc/uptime seconds """
+        return self.file("uptime").read(
+            lambda buffer, length: float(buffer[:buffer.find(b" ", 0, length)])
+        )
+
+
+# Agent wide reader
+proc_reader = ProcReader()
@@ -0,0 +1,166 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Bounded per process CPU / RSS table from /proc/<pid>/stat
+
+/proc/<pid>/stat: pid (comm) state ppid ... utime(14) stime(15) ... starttime(22) vsize(23) rss(24)
+comm may contain spaces and parenthesis, fields are counted after the last ')'.
+"""
+
+# Standard
+import heapq
+import os
+import time
+from array import array
+from typing import Dict, List, Optional
+# Local
+import globals
+from log_linux import log
+
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+# Field index after ") ": state is 0, utime 11, stime 12, starttime 19, rss 21
+UTIME = 11
+STIME = 12
+STARTTIME = 19
+RSS = 21
+
+
+def parse_pid_stat(data: bytes):
+    """
+    Returns:
+        tuple: (comm end offset, cpu ticks, starttime, rss pages) or None if malformed
+    """
+    end = data.rfind(b")")
+    if end < 0:
+        return None
+    fields = data[end + 2:].split()
+    if len(fields) <= RSS:
+        return None
+
+    return end, int(fields[UTIME]) + int(fields[STIME]), int(fields[STARTTIME]), int(fields[RSS])
+
+
+def pid_stat_comm(data: bytes, end: int) -> str:
+    """ comm of a /proc/<pid>/stat content """
+    return data[data.find(b"(") + 1:end].decode(errors="replace")
+
+
+class ProcessTable:
+    """
+        Fixed size slot table (max_slots processes) of CPU ticks and RSS.
+        Every scan reads /proc/<pid>/stat once per process, computes the ticks
+        delta in place, frees the slots of dead pids and detects pid reuse by
+        start time. Processes beyond max_slots are not tracked.
+    """
+    def __init__(self, proc_root: Optional[str] = None, max_slots: Optional[int] = None):
+        self.proc_root = proc_root or globals.PROC_ROOT
+        self.max_slots = max_slots or globals.PROCESS_TABLE_SLOTS
+        size = self.max_slots
+        self.pids = array("i", bytes(4 * size))
+        self.ticks = array("Q", bytes(8 * size))
+        self.starttime = array("Q", bytes(8 * size))
+        self.rss = array("Q", bytes(8 * size))
+        self.delta = array("Q", bytes(8 * size))
+        self.comms: List[str] = [""] * size
+        # pid -> slot
+        self.slots: Dict[int, int] = {}
+        self.free = list(range(size - 1, -1, -1))
+        self.last_scan: Optional[float] = None
+        self.elapsed = 0.0
+        self.full_logged = False
+
+    def scan(self, now: Optional[float] = None) -> bool:
+        """
+        Update the table
+
+        Returns:
+            bool: True if CPU deltas are available (not the first scan)
+        """
+        if now is None:
+            now = time.monotonic()
+        current = {int(name) for name in os.listdir(self.proc_root) if name.isdigit()}
+        for pid in self.slots.keys() - current:
+            self._release(pid)
+
+        slots = self.slots
+        ticks, starttime, rss, delta = self.ticks, self.starttime, self.rss, self.delta
+        stat_path = os.path.join(self.proc_root, "%d", "stat")
+        # Sorted: when the table is full the oldest pids keep their slots
+        for pid in sorted(current):
+            try:
+                fd = os.open(stat_path % pid, os.O_RDONLY)
+                try:
+                    data = os.read(fd, 1024)
+                finally:
+                    os.close(fd)
+            except OSError:
+                # Exited meanwhile
+                if pid in slots:
+                    self._release(pid)
+                continue
+            parsed = parse_pid_stat(data)
+            if parsed is None:
+                continue
+            comm_end, cpu_ticks, start, pages = parsed
+            slot = slots.get(pid)
+            if slot is not None and starttime[slot] != start:
+                # pid reused
+                self._release(pid)
+                slot = None
+            if slot is None:
+                if not self.free:
+                    if not self.full_logged:
+                        log(f"Process table full ({self.max_slots}), not tracking more", "info")
+                        self.full_logged = True
+                    continue
+                slot = self.free.pop()
+                slots[pid] = slot
+                self.pids[slot] = pid
+                starttime[slot] = start
+                self.comms[slot] = pid_stat_comm(data, comm_end)
+                # New process: no delta until its second scan
+                ticks[slot] = cpu_ticks
+            delta[slot] = cpu_ticks - ticks[slot] if cpu_ticks >= ticks[slot] else 0
+            ticks[slot] = cpu_ticks
+            rss[slot] = pages
+
+        self.elapsed = now - self.last_scan if self.last_scan is not None else 0.0
+        self.last_scan = now
+
+        return self.elapsed > 0
+
+    def _release(self, pid: int):
+        slot = self.slots.pop(pid)
+        self.delta[slot] = 0
+        self.rss[slot] = 0
+        self.comms[slot] = ""
+        self.free.append(slot)
+        if self.full_logged and len(self.free) > self.max_slots // 10:
+            self.full_logged = False
+
+    def _entry(self, slot: int) -> dict:
+        return {
+            "pid": self.pids[slot],
+            "name": self.comms[slot],
+            "cpu": round(self.delta[slot] / CLK_TCK / self.elapsed * 100, 2) if self.elapsed else 0,
+            "rss": round(self.rss[slot] * PAGE_SIZE / 1024 ** 2, 2),
+        }
+
+    def top(self, count: Optional[int] = None) -> dict:
+        """
+        Top processes since the previous scan
+
+        Returns:
+            dict: {"cpu": [entry], "memory": [entry]}
+                  entry: {"pid", "name", "cpu" (percent of one core), "rss" (MB)}
+        """
+        count = count or globals.TOP_PROCESSES
+        used = self.slots.values()
+        by_cpu = heapq.nlargest(count, used, key=self.delta.__getitem__)
+        by_rss = heapq.nlargest(count, used, key=self.rss.__getitem__)
+
+        return {
+            "cpu": [self._entry(slot) for slot in by_cpu if self.delta[slot]],
+            "memory": [self._entry(slot) for slot in by_rss if self.rss[slot]],
+        }
@@ -0,0 +1,310 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Compiled threshold rules
+
+Rule definition (dict):
+    name        Event name, also the event id prefix
+    source      Datastore key
+    path        Keys from the datastore value to the container of the value
+    field       Value key in the container
+    items       Container is a list of dicts, entry field used as identity
+    data_key    Event data key of the container (or the value with data "value")
+    data        "container" (default) or "value"
+    event_type  EventType
+    warn/alert  Thresholds (value > threshold), alert None: warning only
+    hysteresis  Active until the value goes below threshold - hysteresis
+    sustain     Seconds the condition must hold before the event
+    cooldown    Seconds before the same event is sent again (escalation to
+                alert is sent at once)
+    overrides   {item identity: {"warn": .., "alert": .., ...}}
+    attach      top_processes list attached to the event ("cpu" / "memory")
+
+Rules are indexed by source. A source is evaluated only when its datastore
+value changed (the datastore keeps the same object while unchanged) and for
+lists only the changed entries. Pending (sustain) and active (cooldown
+reminder) conditions are kept in a timers dict checked every call.
+"""
+
+# Standard
+from typing import Any, Dict, List, Optional, Tuple
+# Local
+import globals
+from constants import LogLevel
+from constants import EventType
+from log_linux import log
+
+DEFAULT_RULES = [
+    {
+        "name": "high_iowait", "id": "high_io_delay", "source": "last_cpu",
+        "path": ("total",), "field": "iowait", "data_key": "iowait", "data": "value",
+        "event_type": EventType.HIGH_IOWAIT,
+    },
+    {
+        "name": "high_cpu_usage", "source": "last_cpu", "path": ("total",), "field": "usage",
+        "data_key": "cpu_usage", "data": "value", "event_type": EventType.HIGH_CPU_USAGE,
+        "attach": "cpu",
+    },
+    {
+        "name": "high_memory_usage", "source": "last_memory_info", "path": ("meminfo",),
+        "field": "percent", "data_key": "memory_usage",
+        "event_type": EventType.HIGH_MEMORY_USAGE, "attach": "memory",
+    },
+    {
+        "name": "high_disk_usage", "source": "last_disk_info", "path": ("disksinfo",),
+        "items": "mountpoint", "field": "percent", "data_key": "disks_stats",
+        "event_type": EventType.HIGH_DISK_USAGE,
+    },
+    {
+        "name": "high_disk_io", "source": "last_diskstats", "path": ("diskstats",),
+        "items": "device", "field": "util", "data_key": "disk_io_stats",
+        "event_type": EventType.HIGH_DISK_IO,
+    },
+    {
+        "name": "high_network_usage", "source": "last_netdev", "path": ("netdev",),
+        "items": "interface", "field": "util", "data_key": "network_stats",
+        "event_type": EventType.HIGH_NETWORK_USAGE,
+    },
+    {
+        "name": "high_network_drops", "source": "last_netdev", "path": ("netdev",),
+        "items": "interface", "field": "drop_percent", "data_key": "network_stats",
+        "event_type": EventType.HIGH_NETWORK_DROPS,
+        "warn": globals.NETDEV_DROP_THRESHOLD, "alert": None, "hysteresis": 0,
+    },
+]
+
+THRESHOLD_OPTIONS = ("warn", "alert", "hysteresis", "sustain", "cooldown")
+# top_processes lists that can be attached
+ATTACH_LISTS = ("cpu", "memory")
+
+
+def merge_rules(rules: List[dict], custom: Optional[List[dict]]) -> List[dict]:
+    """
+    Rules with the config rules applied: same name updates the rule
+    (overrides are merged), new name adds a rule, {"name", "enabled": false} removes it
+    """
+    merged = {rule["name"]: dict(rule) for rule in rules}
+    for rule in custom or []:
+        name = rule.get("name")
+        if name is None:
+            log(f"Rule without name ignored: {rule}", "warning")
+            continue
+        if rule.get("enabled", True) is False:
+            merged.pop(name, None)
+            continue
+        base = merged.setdefault(name, {})
+        overrides = dict(base.get("overrides", {}))
+        overrides.update(rule.get("overrides", {}))
+        base.update(rule)
+        base["overrides"] = overrides
+
+    return list(merged.values())
+
+
+class RuleState:
+    """ Condition state of a rule instance (rule, item) """
+    __slots__ = ("level", "since", "value", "data")
+
+    def __init__(self):
+        self.level = None
+        self.since = None
+        self.value = None
+        self.data = None
+
+
+class Rule:
+    """ Compiled rule """
+    def __init__(self, definition: dict):
+        self.name = definition["name"]
+        self.event_id = definition.get("id", self.name)
+        self.source = definition["source"]
+        self.path = tuple(definition.get("path", ()))
+        self.field = definition["field"]
+        self.items = definition.get("items")
+        self.data_key = definition.get("data_key", self.field)
+        self.data_value = definition.get("data", "container") == "value"
+        self.event_type = definition["event_type"]
+        self.attach = definition.get("attach")
+        if self.attach is not None and self.attach not in ATTACH_LISTS:
+            log(f"Rule {self.name}: invalid attach {self.attach}, valid: {ATTACH_LISTS}",
+                "warning")
+            self.attach = None
+        self.defaults = (
+            definition.get("warn", globals.WARN_THRESHOLD),
+            definition.get("alert", globals.ALERT_THRESHOLD),
+            definition.get("hysteresis", globals.RULE_HYSTERESIS),
+            definition.get("sustain", 0),
+            definition.get("cooldown", globals.EVENT_EXPIRATION),
+        )
+        self.overrides = {
+            ident: tuple(
+                options.get(name, default)
+                for name, default in zip(THRESHOLD_OPTIONS, self.defaults)
+            )
+            for ident, options in definition.get("overrides", {}).items()
+        }
+        # item identity -> state (None identity for scalar rules)
+        self.states: Dict[Any, RuleState] = {}
+        # item identity -> last evaluated container
+        self.seen: Dict[Any, Any] = {}
+
+    def thresholds(self, ident) -> Tuple:
+        """ (warn, alert, hysteresis, sustain, cooldown) of an item """
+        return self.overrides.get(ident, self.defaults)
+
+    def instance_id(self, ident) -> str:
+        """ Event id of an item """
+        return self.event_id if ident is None else f"{self.event_id}_{ident}"
+
+    def containers(self, value) -> Optional[Dict[Any, dict]]:
+        """ {identity: container} of a datastore value, None if not available """
+        for key in self.path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        if self.items is None:
+            return {None: value} if isinstance(value, dict) else None
+        if not isinstance(value, list):
+            return None
+
+        return {entry.get(self.items): entry for entry in value if isinstance(entry, dict)}
+
+    def target_level(self, value, level, thresholds) -> Optional[int]:
+        """ Level for a value, hysteresis keeps the current level """
+        warn, alert, hysteresis = thresholds[:3]
+        if alert is not None:
+            if value > alert or (level == LogLevel.ALERT and value > alert - hysteresis):
+                return LogLevel.ALERT
+        if value > warn or (level is not None and value > warn - hysteresis):
+            return LogLevel.WARNING
+
+        return None
+
+
+class RuleEngine:
+    """
+        Evaluate the compiled rules against the datastore
+
+        fired: {event id: time} last time each event was sent (cooldowns)
+        fired_levels: {event id: (level, cooldown)} of that event, an escalation
+        inside the cooldown is sent even if the condition cleared in between.
+        prune() forgets both together.
+    """
+    def __init__(self, rules: Optional[List[dict]] = None,
+                 fired: Optional[Dict[str, float]] = None):
+        if rules is None:
+            rules = DEFAULT_RULES
+        self.rules: List[Rule] = [Rule(rule) for rule in rules]
+        self.index: Dict[str, List[Rule]] = {}
+        for rule in self.rules:
+            self.index.setdefault(rule.source, []).append(rule)
+        # source -> last evaluated datastore value
+        self.seen: Dict[str, Any] = {}
+        # (rule, ident) -> time a pending/active condition must be checked again
+        self.timers: Dict[Tuple[Rule, Any], float] = {}
+        self.fired: Dict[str, float] = fired if fired is not None else {}
+        self.fired_levels: Dict[str, Tuple[int, float]] = {}
+        # Restored fired entries have no level: kept the longest cooldown
+        self.max_cooldown = max(
+            (thresholds[4] for rule in self.rules
+             for thresholds in (rule.defaults, *rule.overrides.values())),
+            default=0
+        )
+        self.evaluations = 0
+
+    def evaluate(self, datastore, now: float, top_processes=None) -> List[Dict]:
+        """
+        Returns:
+            list: events [{"name": str, "data": dict}]
+        """
+        events = []
+        for source, rules in self.index.items():
+            value = datastore.get_data(source)
+            if source in self.seen and value is self.seen[source]:
+                continue
+            self.seen[source] = value
+            for rule in rules:
+                self._update_rule(rule, value, now, events, top_processes)
+
+        for (rule, ident), due in list(self.timers.items()):
+            if due <= now:
+                self._check(rule, ident, now, events, top_processes)
+
+        return events
+
+    def prune(self, now: float, expiration: float):
+        """ Forget the events fired more than max(their cooldown, expiration) ago """
+        for event_id, fired_at in list(self.fired.items()):
+            fired_level = self.fired_levels.get(event_id)
+            cooldown = fired_level[1] if fired_level else self.max_cooldown
+            if now - fired_at > max(cooldown, expiration):
+                del self.fired[event_id]
+                self.fired_levels.pop(event_id, None)
+
+    def _update_rule(self, rule: Rule, value, now: float, events: list, top_processes):
+        containers = rule.containers(value)
+        if containers is None:
+            containers = {}
+        # Gone items (unmounted disk, removed interface)
+        for ident in [ident for ident in rule.seen if ident not in containers]:
+            del rule.seen[ident]
+            rule.states.pop(ident, None)
+            self.timers.pop((rule, ident), None)
+        for ident, container in containers.items():
+            if rule.seen.get(ident) == container:
+                continue
+            rule.seen[ident] = container
+            self._update_item(rule, ident, container, now, events, top_processes)
+
+    def _update_item(self, rule: Rule, ident, container: dict, now: float, events: list,
+                     top_processes):
+        self.evaluations += 1
+        value = container.get(rule.field)
+        if not isinstance(value, (int, float)):
+            return
+        state = rule.states.get(ident)
+        thresholds = rule.thresholds(ident)
+        level = rule.target_level(value, state.level if state else None, thresholds)
+        if level is None:
+            if state is not None:
+                del rule.states[ident]
+                self.timers.pop((rule, ident), None)
+            return
+        if state is None:
+            state = rule.states[ident] = RuleState()
+            state.since = now
+        state.level = level
+        state.value = value
+        state.data = value if rule.data_value else container
+        self._check(rule, ident, now, events, top_processes)
+
+    def _check(self, rule: Rule, ident, now: float, events: list, top_processes):
+        """ Send the event of an active condition if sustained and not in cooldown """
+        state = rule.states.get(ident)
+        if state is None:
+            self.timers.pop((rule, ident), None)
+            return
+        _warn, _alert, _hysteresis, sustain, cooldown = rule.thresholds(ident)
+        if now - state.since < sustain:
+            self.timers[(rule, ident)] = state.since + sustain
+            return
+        event_id = rule.instance_id(ident)
+        last = self.fired.get(event_id)
+        fired_level = self.fired_levels.get(event_id)
+        # Lower LogLevel is more severe
+        escalated = fired_level is not None and state.level < fired_level[0]
+        if last is not None and now - last <= cooldown and not escalated:
+            self.timers[(rule, ident)] = last + cooldown
+            return
+        self.fired[event_id] = now
+        self.fired_levels[event_id] = (state.level, cooldown)
+        self.timers[(rule, ident)] = now + cooldown
+        data = {
+            rule.data_key: state.data,
+            "event_value": state.value,
+            "log_level": state.level,
+            "event_type": rule.event_type
+        }
+        if rule.attach and top_processes:
+            data["top_processes"] = top_processes[rule.attach]
+        events.append({"name": rule.name, "data": data})
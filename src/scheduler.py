@@ -0,0 +1,231 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Single thread job scheduler
+
+Jobs run in the calling thread ordered by a heap of monotonic deadlines.
+Deadlines are aligned to the job grid (start + n * interval), the job runtime
+does not shift the period.
+"""
+
+# Standard
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Optional
+# Local
+import globals
+from log_linux import log
+
+POLICY_SKIP = "skip"
+POLICY_CATCHUP = "catchup"
+
+
+class Job:
+    """
+        Scheduled job and its runtime stats
+    """
+    def __init__(self, name: str, func: Callable, interval: float, policy: str,
+                 args: tuple = (), kwargs: Optional[dict] = None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.policy = policy
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.next_run = 0.0
+        # Invalidates old heap entries on reschedule
+        self.version = 0
+        self.running = False
+        self.runs = 0
+        self.missed = 0
+        self.errors = 0
+        self.last_runtime = 0.0
+        self.max_runtime = 0.0
+        self.total_runtime = 0.0
+
+    def stats(self) -> dict:
+        """ Runtime stats """
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "missed": self.missed,
+            "errors": self.errors,
+            "last_runtime": round(self.last_runtime, 4),
+            "max_runtime": round(self.max_runtime, 4),
+            "avg_runtime": round(self.total_runtime / self.runs, 4) if self.runs else 0,
+        }
+
+
+class Scheduler:
+    """
+        Heap based scheduler. No thread is created per run, jobs never overlap.
+        Missed deadlines:
+            skip: jump to the next deadline of the grid (missed are counted)
+            catchup: run back to back until on time, up to SCHEDULER_MAX_CATCHUP runs
+    """
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.jobs: Dict[str, Job] = {}
+        self._heap = []
+        self._counter = itertools.count()
+        # Guards the heap. Reentrant: stop() is called from signal handlers
+        # of the running thread
+        self._wakeup = threading.Condition(threading.RLock())
+        # Job added or stop() since run() last checked: do not wait
+        self._woken = False
+        self._stopped = False
+        self.running = False
+
+    def add_job(self, name: str, func: Callable, interval: float, policy: str = POLICY_SKIP,
+                delay: float = 0, args: tuple = (), kwargs: Optional[dict] = None) -> Job:
+        """
+        Add or replace a job
+
+        Args:
+            name (str): Job name
+            func (callable): Function to run
+            interval (float): Seconds between runs
+            policy (str): POLICY_SKIP or POLICY_CATCHUP
+            delay (float): Seconds until the first run
+
+        Returns:
+            Job
+        """
+        if interval <= 0:
+            raise ValueError(f"Invalid interval for job {name}: {interval}")
+        if policy not in (POLICY_SKIP, POLICY_CATCHUP):
+            raise ValueError(f"Invalid policy for job {name}: {policy}")
+        job = Job(name, func, interval, policy, args, kwargs)
+        with self._wakeup:
+            old_job = self.jobs.get(name)
+            if old_job:
+                old_job.version = -1
+            self.jobs[name] = job
+            self._push(job, self.clock() + delay)
+            self._notify()
+
+        return job
+
+    def remove_job(self, name: str):
+        """ Remove a job (its heap entry is dropped when reached) """
+        job = self.jobs.pop(name, None)
+        if job:
+            job.version = -1
+
+    def set_interval(self, name: str, interval: float):
+        """ Change the interval of a job, next deadline is last deadline + new interval """
+        job = self.jobs.get(name)
+        if not job or job.interval == interval:
+            return
+        if interval <= 0:
+            raise ValueError(f"Invalid interval for job {name}: {interval}")
+        with self._wakeup:
+            next_run = job.next_run - job.interval + interval
+            job.interval = interval
+            self._push(job, next_run)
+            self._notify()
+
+    def stats(self) -> dict:
+        """ Stats of all jobs """
+        return {name: job.stats() for name, job in self.jobs.items()}
+
+    def stop(self):
+        """ Stop run() loop, also a later run(). Signal handler safe """
+        self._stopped = True
+        with self._wakeup:
+            self._notify()
+
+    def run(self):
+        """ Run jobs until stop() """
+        self.running = True
+        while not self._stopped:
+            self.run_pending()
+            # Deadline, stop and wakeup checked with the lock held: a job added
+            # or stop() before the wait is not lost
+            with self._wakeup:
+                if self._stopped:
+                    break
+                entry = self._peek()
+                if entry is None:
+                    timeout = globals.SCHEDULER_IDLE_WAIT
+                else:
+                    timeout = entry[0] - self.clock()
+                if timeout > 0 and not self._woken:
+                    self._wakeup.wait(timeout)
+                self._woken = False
+        self.running = False
+
+    def run_pending(self) -> Optional[float]:
+        """
+        Run all due jobs
+
+        Returns:
+            float or None: Seconds until the next deadline, None without jobs
+        """
+        while True:
+            with self._wakeup:
+                entry = self._peek()
+                if entry is None:
+                    return None
+                next_run, _count, version, job = entry
+                now = self.clock()
+                if next_run > now:
+                    return next_run - now
+                heapq.heappop(self._heap)
+            self._run_job(job)
+            with self._wakeup:
+                # Removed, replaced or rescheduled (set_interval) while running
+                if self.jobs.get(job.name) is job and job.version == version:
+                    self._push(job, self._next_deadline(job, self.clock()))
+
+    def _peek(self) -> Optional[tuple]:
+        """ Next heap entry, stale ones dropped. Lock held """
+        while self._heap:
+            entry = self._heap[0]
+            if entry[2] == entry[3].version:
+                return entry
+            heapq.heappop(self._heap)
+
+        return None
+
+    def _notify(self):
+        """ Wake up run(). Lock held """
+        self._woken = True
+        self._wakeup.notify_all()
+
+    def _push(self, job: Job, next_run: float):
+        job.version += 1
+        job.next_run = next_run
+        heapq.heappush(self._heap, (next_run, next(self._counter), job.version, job))
+
+    def _next_deadline(self, job: Job, now: float) -> float:
+        next_run = job.next_run + job.interval
+        if next_run > now:
+            return next_run
+        behind = int((now - next_run) // job.interval) + 1
+        if job.policy == POLICY_CATCHUP and behind <= globals.SCHEDULER_MAX_CATCHUP:
+            return next_run
+        job.missed += behind
+        log("Job %s missed %d deadlines", "debug", job.name, behind)
+
+        return next_run + behind * job.interval
+
+    def _run_job(self, job: Job):
+        if job.running:
+            return
+        job.running = True
+        start = self.clock()
+        try:
+            job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            job.errors += 1
+            log(f"Job {job.name} error: {e}", "err")
+        finally:
+            job.running = False
+            runtime = self.clock() - start
+            job.runs += 1
+            job.last_runtime = runtime
+            job.total_runtime += runtime
+            job.max_runtime = max(job.max_runtime, runtime)
@@ -0,0 +1,200 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Incremental socket inode to process index
+"""
+
+# Standard
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set
+# Local
+import globals
+from log_linux import log
+
+
+class SocketInodeIndex:
+    """
+        Socket inode -> owner processes, kept between runs.
+
+        Only the inodes asked for (listening sockets) are indexed. Every call:
+            - dead pids are dropped (one /proc listdir)
+            - new pids are scanned
+            - known owners are verified with one readlink per owner pid
+            - old pids are only walked when a wanted inode has no owner, once
+              found the walk stops. Inodes without owner (kernel sockets) are
+              not searched again until the next full rescan.
+        A full rescan runs every SOCKET_INDEX_FULL_RESCAN seconds. At most
+        SOCKET_INDEX_MAX_PIDS processes are indexed, new ones over the limit
+        are skipped (counted, their sockets may be listed without owner).
+    """
+    def __init__(self, proc_root: Optional[str] = None, full_rescan: Optional[float] = None,
+                 max_pids: Optional[int] = None):
+        self.proc_root = proc_root or globals.PROC_ROOT
+        self.full_rescan = full_rescan or globals.SOCKET_INDEX_FULL_RESCAN
+        self.max_pids = max_pids or globals.SOCKET_INDEX_MAX_PIDS
+        # pid -> comm of scanned processes
+        self.pids: Dict[int, str] = {}
+        # pid -> indexed inodes held
+        self.pid_inodes: Dict[int, Set[int]] = {}
+        # inode -> {pid: fd}
+        self.inode_owners: Dict[int, Dict[int, str]] = {}
+        self.unresolved: Set[int] = set()
+        # Processes not indexed in the last call (over max_pids)
+        self.skipped = 0
+        self.last_full = None
+        self.scans = 0
+        self.full_scans = 0
+
+    def owners(self, inodes: Iterable[int]) -> Dict[int, List[str]]:
+        """
+        Owner process names of the given socket inodes
+
+        Args:
+            inodes: socket inodes
+
+        Returns:
+            dict: {inode: [comm, ...]} inodes without owner are omitted
+        """
+        wanted = set(inodes)
+        now = time.monotonic()
+        current_pids = self._list_pids()
+
+        if self.last_full is None or now - self.last_full > self.full_rescan:
+            self._clear()
+            self.last_full = now
+            self.full_scans += 1
+            for pid in current_pids:
+                self._scan_pid(pid, wanted)
+            self.unresolved = wanted - self.inode_owners.keys()
+            self._count_skipped(current_pids)
+            return self._result(wanted)
+
+        for pid in self.pids.keys() - current_pids:
+            self._drop_pid(pid)
+        new_pids = current_pids - self.pids.keys()
+        for pid in new_pids:
+            self._scan_pid(pid, wanted)
+        self._verify(wanted)
+
+        missing = wanted - self.inode_owners.keys() - self.unresolved
+        if missing:
+            for pid in current_pids - new_pids:
+                self._drop_pid(pid)
+                self._scan_pid(pid, wanted)
+                missing -= self.inode_owners.keys()
+                if not missing:
+                    break
+            self.unresolved |= missing
+        # Keep only still existing sockets
+        self.unresolved &= wanted
+        self._count_skipped(current_pids)
+
+        return self._result(wanted)
+
+    def stats(self) -> dict:
+        """ Index size and scans """
+        return {
+            "pids": len(self.pids),
+            "inodes": len(self.inode_owners),
+            "unresolved": len(self.unresolved),
+            "skipped": self.skipped,
+            "scans": self.scans,
+            "full_scans": self.full_scans,
+        }
+
+    def _result(self, wanted: Set[int]) -> Dict[int, List[str]]:
+        result = {}
+        for inode in wanted:
+            owners = self.inode_owners.get(inode)
+            if not owners:
+                continue
+            names = []
+            for pid in sorted(owners):
+                comm = self.pids.get(pid)
+                if comm and comm not in names:
+                    names.append(comm)
+            result[inode] = names
+
+        return result
+
+    def _list_pids(self) -> Set[int]:
+        return {int(name) for name in os.listdir(self.proc_root) if name.isdigit()}
+
+    def _count_skipped(self, current_pids: Set[int]):
+        skipped = len(current_pids - self.pids.keys())
+        if skipped and not self.skipped:
+            log(f"Socket index limit reached ({self.max_pids} processes),"
+                f" {skipped} not indexed", "warning")
+        self.skipped = skipped
+
+    def _clear(self):
+        self.pids.clear()
+        self.pid_inodes.clear()
+        self.inode_owners.clear()
+        self.unresolved.clear()
+
+    def _drop_pid(self, pid: int):
+        self.pids.pop(pid, None)
+        for inode in self.pid_inodes.pop(pid, ()):
+            owners = self.inode_owners.get(inode)
+            if owners is not None:
+                owners.pop(pid, None)
+                if not owners:
+                    del self.inode_owners[inode]
+
+    def _scan_pid(self, pid: int, wanted: Set[int]):
+        """ Walk /proc/<pid>/fd recording the wanted socket inodes """
+        if len(self.pids) >= self.max_pids:
+            return
+        self.scans += 1
+        fd_dir = os.path.join(self.proc_root, str(pid), "fd")
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            return
+        held = set()
+        for fd in fds:
+            try:
+                target = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            if not target.startswith("socket:["):
+                continue
+            inode = int(target[8:-1])
+            if inode in wanted:
+                held.add(inode)
+                self.inode_owners.setdefault(inode, {})[pid] = fd
+        comm = ""
+        try:
+            with open(os.path.join(self.proc_root, str(pid), "comm"), "r") as f:
+                comm = f.read().strip()
+        except OSError:
+            pass
+        # Remember scanned pids even without sockets, they are not scanned again
+        self.pids[pid] = comm
+        if held:
+            self.pid_inodes[pid] = held
+
+    def _verify(self, wanted: Set[int]):
+        """
+        Drop not wanted inodes and owners that are no longer the scanned process
+        (pid reuse). One readlink per owner pid, not per socket.
+        """
+        for inode in list(self.inode_owners):
+            if inode not in wanted:
+                for pid in self.inode_owners.pop(inode):
+                    self.pid_inodes.get(pid, set()).discard(inode)
+        for pid, held in list(self.pid_inodes.items()):
+            if not held:
+                del self.pid_inodes[pid]
+                continue
+            inode = next(iter(held))
+            fd = self.inode_owners[inode][pid]
+            try:
+                target = os.readlink(os.path.join(self.proc_root, str(pid), "fd", fd))
+            except OSError:
+                target = None
+            if target != f"socket:[{inode}]":
+                # Rescanned as a new process next call
+                self._drop_pid(pid)
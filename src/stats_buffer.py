@@ -0,0 +1,109 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Local high resolution sampling: fixed size ring buffers and interval aggregates
+"""
+
+# Standard
+import math
+from array import array
+from typing import Dict, Optional
+# Local
+import globals
+
+
+class RingBuffer:
+    """
+        Fixed size float ring buffer (array backed, no allocation per sample)
+    """
+    def __init__(self, size: int):
+        if size <= 0:
+            raise ValueError(f"Invalid ring buffer size: {size}")
+        self.size = size
+        self.buffer = array("d", bytes(8 * size))
+        self.index = 0
+        self.count = 0
+
+    def add(self, value: float):
+        """ Add a sample, overwrite the oldest when full """
+        self.buffer[self.index] = value
+        self.index = (self.index + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def clear(self):
+        """ Drop all samples """
+        self.index = 0
+        self.count = 0
+
+    def values(self) -> list:
+        """ Samples, oldest first """
+        if self.count < self.size:
+            return self.buffer[:self.count].tolist()
+
+        return self.buffer[self.index:].tolist() + self.buffer[:self.index].tolist()
+
+    def last(self) -> Optional[float]:
+        """ Last sample """
+        if not self.count:
+            return None
+
+        return self.buffer[self.index - 1]
+
+    def summary(self) -> Optional[dict]:
+        """
+        Aggregates of the samples
+
+        Returns:
+            dict or None: min, max, mean, p95, last and samples count
+        """
+        if not self.count:
+            return None
+        ordered = sorted(self.buffer[:self.count] if self.count < self.size else self.buffer)
+        # Nearest rank
+        p95 = ordered[max(0, math.ceil(0.95 * self.count) - 1)]
+
+        return {
+            "min": round(ordered[0], 2),
+            "max": round(ordered[-1], 2),
+            "mean": round(sum(ordered) / self.count, 2),
+            "p95": round(p95, 2),
+            "last": round(self.last(), 2),
+            "samples": self.count
+        }
+
+
+class MetricSampler:
+    """
+        One RingBuffer per metric. Sized for a full stats interval of samples
+    """
+    def __init__(self, size: Optional[int] = None):
+        self.size = size or max(1, int(globals.TIMER_STATS_INTERVAL / globals.STATS_SAMPLE_INTERVAL))
+        self.buffers: Dict[str, RingBuffer] = {}
+
+    def add(self, name: str, value: float):
+        """ Add a sample to a metric """
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            buffer = self.buffers[name] = RingBuffer(self.size)
+        buffer.add(value)
+
+    def summary(self, reset: bool = True) -> dict:
+        """
+        Aggregates of every metric
+
+        Args:
+            reset (bool): Start a new interval
+
+        Returns:
+            dict: {metric: summary}
+        """
+        summary = {}
+        for name, buffer in self.buffers.items():
+            metric_summary = buffer.summary()
+            if metric_summary is not None:
+                summary[name] = metric_summary
+            if reset:
+                buffer.clear()
+
+        return summary
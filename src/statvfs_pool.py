@@ -0,0 +1,113 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Hang proof statvfs: worker pool, per mount timeout, stale values and quarantine
+"""
+
+# Standard
+import os
+import time
+from concurrent.futures import Future, wait
+from typing import Dict, Iterable, Optional, Tuple
+# Local
+import globals
+from log_linux import log
+from worker_pool import WorkerPool
+
+
+class StatvfsPool:
+    """
+        os.statvfs() in a small worker pool. A mount that does not answer in
+        STATVFS_TIMEOUT keeps its last known value marked stale and is
+        quarantined (not asked again) with exponential backoff up to
+        STATVFS_MAX_QUARANTINE. The hung call keeps its (daemon) thread, a new
+        worker takes its place; a hung mount is not asked again until its call
+        returns, at most one thread per hung mount.
+    """
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = None):
+        self.workers = workers or globals.STATVFS_WORKERS
+        self.timeout = timeout or globals.STATVFS_TIMEOUT
+        self.pool = WorkerPool(self.workers, "statvfs")
+        # mountpoint -> last good statvfs result
+        self.last: Dict[str, os.statvfs_result] = {}
+        # mountpoint -> hung (abandoned) call
+        self.pending: Dict[str, Future] = {}
+        # mountpoint -> (until, backoff)
+        self.quarantine: Dict[str, Tuple[float, float]] = {}
+
+    def statvfs_many(self, mountpoints: Iterable[str], now: Optional[float] = None) -> Dict:
+        """
+        statvfs of every mountpoint, returns in STATVFS_TIMEOUT at most
+
+        Returns:
+            dict: {mountpoint: (statvfs_result, stale)} mounts without any value are omitted
+        """
+        if now is None:
+            now = time.monotonic()
+        mountpoints = list(mountpoints)
+        results = {}
+        submitted = {}
+        for mountpoint in mountpoints:
+            future = self.pending.get(mountpoint)
+            if future is not None and future.done():
+                # Hung call finally returned
+                del self.pending[mountpoint]
+                self._store(mountpoint, future)
+            if mountpoint in self.pending or self._quarantined(mountpoint, now):
+                if mountpoint in self.last:
+                    results[mountpoint] = (self.last[mountpoint], True)
+                continue
+            submitted[mountpoint] = self.pool.submit(os.statvfs, mountpoint)
+
+        if submitted:
+            wait(submitted.values(), timeout=self.timeout)
+        for mountpoint, future in submitted.items():
+            # Running: abandoned, its worker replaced. Queued: cancelled
+            if not future.done() and self.pool.abandon(future):
+                self.pending[mountpoint] = future
+            if future.done() and not future.cancelled():
+                if self._store(mountpoint, future):
+                    results[mountpoint] = (self.last[mountpoint], False)
+                continue
+            self._set_quarantine(mountpoint, now)
+            if mountpoint in self.last:
+                results[mountpoint] = (self.last[mountpoint], True)
+
+        # Unmounted
+        current = set(mountpoints)
+        for mountpoint in [mp for mp in self.last if mp not in current]:
+            del self.last[mountpoint]
+        for mountpoint in [mp for mp in self.quarantine if mp not in current]:
+            del self.quarantine[mountpoint]
+
+        return results
+
+    def shutdown(self):
+        """ Stop the workers, hung calls do not block the agent exit (daemon threads) """
+        self.pool.shutdown()
+
+    def _quarantined(self, mountpoint: str, now: float) -> bool:
+        entry = self.quarantine.get(mountpoint)
+
+        return entry is not None and now < entry[0]
+
+    def _set_quarantine(self, mountpoint: str, now: float):
+        _until, backoff = self.quarantine.get(mountpoint, (0.0, 0.0))
+        if backoff:
+            backoff = min(backoff * 2, globals.STATVFS_MAX_QUARANTINE)
+        else:
+            backoff = globals.STATVFS_QUARANTINE
+        self.quarantine[mountpoint] = (now + backoff, backoff)
+        log(f"statvfs {mountpoint} timeout, quarantined {backoff}s", "warning")
+
+    def _store(self, mountpoint: str, future) -> bool:
+        """ Keep a finished result, True if it was good """
+        try:
+            self.last[mountpoint] = future.result()
+        except OSError:
+            self.last.pop(mountpoint, None)
+            return False
+        if self.quarantine.pop(mountpoint, None):
+            log(f"statvfs {mountpoint} answering again", "notice")
+
+        return True
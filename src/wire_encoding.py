@@ -0,0 +1,138 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Wire encoding for agent payloads
+
+Negotiation:
+    The agent advertises what it can do on every request:
+        'encodings': ['json', 'gzip', 'msgpack']     # msgpack only if installed
+
+    The server may answer (pong) with:
+        'encoding': str,     # 'json' or 'msgpack'
+        'gzip': bool,        # Accept gzip bodies over WIRE_GZIP_THRESHOLD bytes
+        'meta_ack': str      # meta_id the server has stored for this session
+        'meta_resend': bool  # meta_id unknown (server restart, cache loss)
+
+    Until the server answers nothing changes except the compact JSON separators.
+
+Meta:
+    Static meta (hostname, nodename, ip, timezone, version) is sent whole with a
+    'meta_id' until the server acks that id, then only the dynamic fields plus
+    'meta_id' are sent. A change in static meta produces a new id (full meta again).
+    The ack is dropped (full meta again) on meta_resend, on a failed request
+    (connection reset, server down) and on a HTTP error.
+"""
+
+# Standard
+import gzip
+import json
+import hashlib
+# TrdParty (optional)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+# Local
+import globals
+from log_linux import log
+
+STATIC_META_FIELDS = ("timezone", "hostname", "nodename", "ip_address", "agent_version")
+
+
+class WireEncoder:
+    """
+        Encode payloads with the negotiated format and keep the session meta state
+    """
+    def __init__(self, gzip_threshold: int = None, gzip_level: int = None):
+        self.gzip_threshold = gzip_threshold or globals.WIRE_GZIP_THRESHOLD
+        self.gzip_level = gzip_level or globals.WIRE_GZIP_LEVEL
+        self.encoding = "json"
+        self.gzip = False
+        self.meta_id = None
+        self.meta_acked = None
+        # Static meta values of meta_id, the digest is only computed on change
+        self.meta_static = None
+
+    @staticmethod
+    def capabilities() -> list:
+        """ Encodings this agent supports """
+        encodings = ["json", "gzip"]
+        if msgpack is not None:
+            encodings.append("msgpack")
+
+        return encodings
+
+    def negotiate(self, response: dict):
+        """
+        Apply the server choices from a valid response
+
+        Args:
+            response (dict): Server response
+        """
+        encoding = response.get("encoding")
+        if encoding and encoding != self.encoding:
+            if encoding in ("json", "msgpack") and encoding in self.capabilities():
+                self.encoding = encoding
+                log(f"Wire encoding set to {encoding}", "info")
+            else:
+                log(f"Server request unsupported encoding {encoding}", "warning")
+        if "gzip" in response:
+            self.gzip = bool(response["gzip"])
+        if "meta_ack" in response:
+            self.meta_acked = response["meta_ack"]
+        if response.get("meta_resend"):
+            self.forget_meta()
+
+    def forget_meta(self):
+        """ The server may not know meta_id: send the full meta until acked again """
+        if self.meta_acked is not None:
+            log("Meta ack dropped, sending full meta", "debug")
+        self.meta_acked = None
+
+    def compact_meta(self, meta: dict) -> dict:
+        """
+        Replace static meta by its meta_id once acked by the server
+
+        Args:
+            meta (dict): Full meta
+
+        Returns:
+            dict: meta to send
+        """
+        static = {field: meta.get(field) for field in STATIC_META_FIELDS}
+        if static != self.meta_static:
+            digest = hashlib.sha1(json.dumps(static, sort_keys=True).encode()).hexdigest()
+            self.meta_id = digest[:16]
+            self.meta_static = static
+        if self.meta_acked == self.meta_id:
+            compact = {key: value for key, value in meta.items() if key not in static}
+            compact["meta_id"] = self.meta_id
+            return compact
+
+        full = dict(meta)
+        full["meta_id"] = self.meta_id
+
+        return full
+
+    def encode(self, payload: dict):
+        """
+        Serialize payload
+
+        Args:
+            payload (dict): Payload
+
+        Returns:
+            tuple: (body bytes, headers dict)
+        """
+        if self.encoding == "msgpack" and msgpack is not None:
+            body = msgpack.packb(payload, use_bin_type=True)
+            headers = {"Content-Type": "application/msgpack"}
+        else:
+            body = json.dumps(payload, separators=(",", ":")).encode()
+            headers = {"Content-Type": "application/json"}
+
+        if self.gzip and len(body) > self.gzip_threshold:
+            body = gzip.compress(body, compresslevel=self.gzip_level)
+            headers["Content-Encoding"] = "gzip"
+
+        return body, headers
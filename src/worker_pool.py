@@ -0,0 +1,97 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Daemon thread worker pool for calls that can hang (collectors, statvfs)
+"""
+
+# Standard
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Set
+
+
+class WorkerPool:
+    """
+        Daemon worker threads fed by a queue. ThreadPoolExecutor threads are
+        joined at interpreter exit, a hung call (NFS, D state) would block the
+        agent stop. submit() returns a concurrent.futures.Future.
+
+        abandon() gives up on a hung call: a new worker takes its place and the
+        hung thread exits when the call returns.
+    """
+    def __init__(self, workers: int, name: str):
+        self.workers = workers
+        self.name = name
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        # Live worker threads, hung ones included
+        self.threads = 0
+        self.abandoned: Set[Future] = set()
+        self.stopped = False
+
+    def submit(self, func: Callable, *args) -> Future:
+        """ Queue func(*args) """
+        future = Future()
+        with self.lock:
+            if self.stopped:
+                raise RuntimeError(f"Worker pool {self.name} is shut down")
+            while self.threads < self.workers + len(self.abandoned):
+                self._start_thread()
+        self.queue.put((future, func, args))
+
+        return future
+
+    def abandon(self, future: Future) -> bool:
+        """
+        Give up on a call. Queued: cancelled. Running: its worker is replaced
+
+        Returns:
+            bool: True if a running call was abandoned
+        """
+        with self.lock:
+            if future.cancel() or future.done() or future in self.abandoned or self.stopped:
+                return False
+            self.abandoned.add(future)
+            self._start_thread()
+
+        return True
+
+    def hung(self) -> int:
+        """ Abandoned calls still running """
+        return len(self.abandoned)
+
+    def shutdown(self):
+        """ Stop the idle workers, hung ones exit when their call returns """
+        with self.lock:
+            self.stopped = True
+            for _ in range(self.threads - len(self.abandoned)):
+                self.queue.put(None)
+            self.threads = len(self.abandoned)
+
+    def _start_thread(self):
+        self.threads += 1
+        threading.Thread(
+            target=self._run, name=f"{self.name}-{self.threads}", daemon=True
+        ).start()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            future, func, args = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            with self.lock:
+                if future in self.abandoned:
+                    # Replaced by a new worker
+                    self.abandoned.discard(future)
+                    self.threads -= 1
+                    return
@@ -0,0 +1,40 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Agent self metrics tests
+"""
+# Standard
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from agent_metrics import AgentMetrics
+
+
+class TestAgentMetrics(unittest.TestCase):
+
+    def test_report(self):
+        metrics = AgentMetrics(bounds=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            metrics.observe("loop", value)
+        metrics.count("bytes_sent", 100)
+        metrics.count("bytes_sent", 50)
+        collectors = {"cpu": {"runs": 2, "errors": 0, "timeouts": 0,
+                              "avg_cpu": 0.0012, "avg_wall": 0.002}}
+        report = metrics.report(collectors)
+        self.assertEqual(report["h"]["loop"], [4, 3.65, 3, [2, 1, 1]])
+        self.assertEqual(report["c"], {"bytes_sent": 150})
+        self.assertEqual(report["col"], {"cpu": [2, 0, 0, 1.2, 2.0]})
+        self.assertGreater(report["rss"], 0)
+        self.assertGreater(report["cpu"], 0)
+        # Histograms are per report interval, counters cumulative
+        report = metrics.report()
+        self.assertEqual(report["h"]["loop"], [0, 0, 0, [0, 0, 0]])
+        self.assertEqual(report["c"], {"bytes_sent": 150})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Collector registry tests: timeouts, hung runs and CPU budget (fake collectors)
+"""
+# Standard
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+import globals
+from collectors import Collector, CollectorRegistry
+
+
+class HungCollector(Collector):
+    """ Blocks until released (hung NFS statvfs, D state read) """
+    name = "hung"
+
+    def __init__(self):
+        super().__init__(interval=1, timeout=0.2)
+        self.release = threading.Event()
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    def collect(self):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.release.wait(10)
+        self.running -= 1
+        return self.calls
+
+
+class BusyCollector(Collector):
+    """ Burns CPU """
+    name = "busy"
+    expensive = True
+
+    def __init__(self, seconds):
+        super().__init__(interval=1)
+        self.seconds = seconds
+
+    def collect(self):
+        start = time.thread_time()
+        while time.thread_time() - start < self.seconds:
+            pass
+        return True
+
+
+class TestCollectorRegistry(unittest.TestCase):
+
+    def setUp(self):
+        patch = mock.patch.multiple(globals, COLLECTOR_WAIT=0.05, COLLECTOR_BUDGET_CHECK=0)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_hung_collector_abandoned_and_rerun(self):
+        registry = CollectorRegistry(workers=1)
+        hung = registry.register(HungCollector())
+        try:
+            self.assertEqual(registry.run_due(now=0), {})
+            # Timed out: abandoned, its worker replaced
+            registry.run_due(now=1)
+            self.assertEqual(hung.timeouts, 1)
+            self.assertEqual(hung.hung, 1)
+            # Not run again while the abandoned run is still running
+            registry.run_due(now=2)
+            registry.run_due(now=5)
+            self.assertEqual(hung.calls, 1)
+            workers = [thread for thread in threading.enumerate()
+                       if thread.name.startswith("collector")]
+            self.assertTrue(workers)
+            # Never block the interpreter exit
+            self.assertTrue(all(thread.daemon for thread in workers))
+
+            hung.release.set()
+            time.sleep(0.1)
+            results = registry.run_due(now=10)
+            self.assertEqual(hung.hung, 0)
+            self.assertIn("hung", results)
+            self.assertEqual(hung.calls, 2)
+            self.assertEqual(hung.max_running, 1)
+            self.assertEqual(registry.pool.hung(), 0)
+        finally:
+            hung.release.set()
+            registry.shutdown()
+
+    def test_cpu_budget_throttle_and_relax(self):
+        # Wait the whole run
+        globals.COLLECTOR_WAIT = 1
+        registry = CollectorRegistry(cpu_budget=0.05, workers=1)
+        busy = registry.register(BusyCollector(0.2))
+        try:
+            registry.run_due(now=0)
+            self.assertEqual(busy.throttle, 1)
+            registry.run_due(now=1)
+            # Agent process CPU, ~0.2s in ~0.2s
+            self.assertGreater(registry.cpu_samples[-1][1] - registry.cpu_samples[0][1], 0.1)
+            self.assertEqual(busy.throttle, 2)
+            self.assertEqual(busy.stats()["interval"], 2)
+
+            # Idle for a window: relaxed
+            idle_cpu = registry.cpu_samples[-1][1]
+            with mock.patch("collectors.base.process_cpu", return_value=idle_cpu):
+                registry._apply_budget(time.monotonic() + registry.budget_window)
+            self.assertEqual(busy.throttle, 1)
+        finally:
+            registry.shutdown()
+
+    def test_trigger(self):
+        registry = CollectorRegistry(workers=1)
+        busy = registry.register(BusyCollector(0))
+        busy.interval = 60
+        try:
+            self.assertIn("busy", registry.run_due(now=0))
+            self.assertEqual(registry.run_due(now=1), {})
+            registry.trigger("busy")
+            self.assertIn("busy", registry.run_due(now=2))
+        finally:
+            registry.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+/proc/stat CPU collector tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from cpu_stat import CpuStat
+from proc_reader import ProcReader
+from collectors import CollectorRegistry, CpuCollector
+
+
+class TestCpuStat(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.reader = ProcReader(self.tmp.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.tmp.cleanup()
+
+    def write(self, total, *cores):
+        lines = ["cpu  " + " ".join(map(str, total))]
+        lines += [f"cpu{n} " + " ".join(map(str, core)) for n, core in cores]
+        lines.append("intr 12345 0 0")
+        with open(os.path.join(self.tmp.name, "stat"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def test_breakdown(self):
+        cpu_stat = CpuStat(self.reader)
+        # user nice system idle iowait irq softirq steal guest guest_nice
+        self.write((100, 0, 100, 800, 0, 0, 0, 0, 0, 0),
+                   (0, (50, 0, 50, 400, 0, 0, 0, 0)), (2, (50, 0, 50, 400, 0, 0, 0, 0)))
+        self.assertFalse(cpu_stat.sample())
+        self.assertIsNone(cpu_stat.snapshot())
+        self.write((150, 0, 120, 800, 20, 0, 0, 10, 0, 0),
+                   (0, (50, 0, 50, 400, 0, 0, 0, 0)), (2, (100, 0, 70, 400, 20, 0, 0, 10)))
+        self.assertTrue(cpu_stat.sample())
+        snapshot = cpu_stat.snapshot()
+        self.assertEqual(snapshot["total"]["user"], 50.0)
+        self.assertEqual(snapshot["total"]["steal"], 10.0)
+        self.assertEqual(snapshot["total"]["usage"], 80.0)
+        # Offline cpu1 is not listed, idle core has no elapsed ticks
+        self.assertEqual([core["core"] for core in snapshot["cores"]], [0, 2])
+        self.assertEqual(snapshot["cores"][0]["usage"], 0.0)
+        self.assertEqual(cpu_stat.iowait(), 20.0)
+
+    def test_iowait_backwards(self):
+        cpu_stat = CpuStat(self.reader)
+        self.write((100, 0, 100, 800, 50, 0, 0, 0, 0, 0))
+        cpu_stat.sample()
+        # iowait one tick lower: not a counter wrap
+        self.write((150, 0, 150, 899, 49, 0, 0, 0, 0, 0))
+        self.assertTrue(cpu_stat.sample())
+        self.assertEqual(cpu_stat.iowait(), 0.0)
+        self.assertEqual(cpu_stat.usage(), 50.25)
+
+    def test_collector_in_registry(self):
+        self.write((100, 0, 100, 800, 0, 0, 0, 0, 0, 0), (0, (100, 0, 100, 800, 0, 0, 0, 0)))
+        collector = CpuCollector(cores=False)
+        collector.cpu_stat = CpuStat(self.reader)
+        registry = CollectorRegistry(workers=1)
+        registry.register(collector)
+        try:
+            self.assertEqual(registry.run_due(now=0), {"cpu": None})
+            self.write((100, 0, 200, 900, 0, 0, 0, 0, 0, 0), (0, (100, 0, 200, 900, 0, 0, 0, 0)))
+            results = registry.run_due(now=1)
+        finally:
+            registry.shutdown()
+        self.assertEqual(results["cpu"]["total"]["system"], 50.0)
+        self.assertNotIn("cores", results["cpu"])
+        self.assertEqual(collector.payload(results["cpu"])["iowait"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
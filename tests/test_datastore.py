@@ -0,0 +1,66 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Datastore persistence tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from datastore import Datastore
+from event_processor import EventProcessor
+
+
+class TestDatastore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "datastore.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_coalesced_save_and_reload(self):
+        datastore = Datastore(self.filename)
+        processed = {}
+        datastore.attach("processed_events", lambda: dict(processed), processed.update)
+        self.assertFalse(datastore.save_data())
+        for percent in (10, 20, 30):
+            datastore.update_data("last_memory_info", {"meminfo": {"percent": percent}})
+        self.assertFalse(os.path.exists(self.filename))
+        self.assertTrue(datastore.save_data())
+        # Nothing changed: no write
+        self.assertFalse(datastore.save_data())
+        processed["high_cpu_usage"] = 1000.0
+        self.assertTrue(datastore.save_data())
+        self.assertEqual(os.listdir(self.tmp.name), ["datastore.json"])
+
+        restarted = Datastore(self.filename)
+        self.assertTrue(restarted.load_data())
+        self.assertEqual(restarted.get_data("last_memory_info"), {"meminfo": {"percent": 30}})
+        event_processor = EventProcessor()
+        restarted.attach(
+            "processed_events",
+            lambda: dict(event_processor.processed_events),
+            event_processor.processed_events.update
+        )
+        self.assertEqual(event_processor.processed_events, {"high_cpu_usage": 1000.0})
+        # Restored state is not dirty
+        self.assertFalse(restarted.save_data())
+
+    def test_old_snapshot_ignored(self):
+        with open(self.filename, "w") as f:
+            json.dump({"saved": 0, "data": {"last_cpu": {"total": {}}}}, f)
+        datastore = Datastore(self.filename)
+        self.assertFalse(datastore.load_data())
+        self.assertIsNone(datastore.get_data("last_cpu"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Delta encoder tests
+"""
+# Standard
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from delta_encoder import DeltaEncoder
+
+
+def build_state(percent=50, used=100):
+    return {
+        "meminfo": {"total": 1000, "used": used, "percent": percent},
+        "disksinfo": [
+            {"device": "/dev/sda1", "mountpoint": "/", "used": 10, "percent": 1.0},
+            {"device": "/dev/sdb1", "mountpoint": "/data", "used": 20, "percent": 2.0},
+        ],
+        "iowait": 0.5
+    }
+
+
+class TestDeltaEncoder(unittest.TestCase):
+
+    def test_first_payload_is_full(self):
+        encoder = DeltaEncoder(full_every=10)
+        payload = encoder.encode(build_state())
+        self.assertEqual(payload["seq"], 1)
+        self.assertTrue(payload["full"])
+        self.assertEqual(payload["state"], build_state())
+
+    def test_no_changes_sends_only_seq(self):
+        encoder = DeltaEncoder(full_every=10)
+        encoder.encode(build_state())
+        self.assertEqual(encoder.encode(build_state()), {"seq": 2})
+
+    def test_changed_leaves_only(self):
+        encoder = DeltaEncoder(full_every=10)
+        encoder.encode(build_state())
+        payload = encoder.encode(build_state(percent=60))
+        self.assertEqual(payload["delta"], {"meminfo": {"percent": 60}})
+
+    def test_keyed_list_entries(self):
+        encoder = DeltaEncoder(full_every=10)
+        encoder.encode(build_state())
+        state = build_state()
+        state["disksinfo"][1]["used"] = 21
+        state["disksinfo"].pop(0)
+        state["disksinfo"].append({"device": "/dev/sdc1", "mountpoint": "/new", "used": 1})
+        delta = encoder.encode(state)["delta"]
+        self.assertEqual(delta["disksinfo"]["_del"], ["/"])
+        self.assertEqual(delta["disksinfo"]["_upd"], [
+            {"used": 21, "mountpoint": "/data"},
+            {"device": "/dev/sdc1", "mountpoint": "/new", "used": 1},
+        ])
+
+    def test_removed_key(self):
+        encoder = DeltaEncoder(full_every=10)
+        encoder.encode(build_state())
+        state = build_state()
+        del state["iowait"]
+        self.assertEqual(encoder.encode(state)["delta"], {"_del": ["iowait"]})
+
+    def test_periodic_full_and_resync(self):
+        encoder = DeltaEncoder(full_every=2)
+        encoder.encode(build_state())
+        self.assertNotIn("full", encoder.encode(build_state()))
+        self.assertNotIn("full", encoder.encode(build_state()))
+        self.assertTrue(encoder.encode(build_state())["full"])
+        encoder.resync()
+        payload = encoder.encode(build_state())
+        self.assertTrue(payload["full"])
+        self.assertEqual(payload["seq"], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+/proc/diskstats collector tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from diskstats import DiskStats, counter_deltas
+from proc_reader import ProcReader
+from datastore import Datastore
+from event_processor import EventProcessor
+from constants import EventType
+
+
+def diskstats_line(major, minor, name, reads, sectors_read, read_ms, writes,
+                   sectors_written, write_ms, io_ticks):
+    return (
+        f"{major:4d} {minor:7d} {name} {reads} 0 {sectors_read} {read_ms} {writes} 0 "
+        f"{sectors_written} {write_ms} 0 {io_ticks} 0 0 0 0 0\n"
+    )
+
+
+class TestDiskStats(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.proc = os.path.join(self.tmp.name, "proc")
+        sys_root = os.path.join(self.tmp.name, "sys")
+        os.makedirs(self.proc)
+        os.makedirs(os.path.join(sys_root, "block"))
+        for device, parent in (("sda", "pci0000:00/ata1"), ("loop0", "virtual/block")):
+            target = os.path.join(sys_root, "devices", parent, device)
+            os.makedirs(target)
+            os.symlink(target, os.path.join(sys_root, "block", device))
+        self.reader = ProcReader(self.proc)
+        self.diskstats = DiskStats(sys_root, self.reader)
+
+    def tearDown(self):
+        self.reader.close()
+        self.tmp.cleanup()
+
+    def write(self, *lines):
+        with open(os.path.join(self.proc, "diskstats"), "w") as f:
+            f.write("".join(lines))
+
+    def test_rates_and_filters(self):
+        self.write(
+            diskstats_line(8, 0, "sda", 100, 1000, 50, 200, 4000, 150, 1000),
+            diskstats_line(8, 1, "sda1", 100, 1000, 50, 200, 4000, 150, 1000),
+            diskstats_line(7, 0, "loop0", 1, 1, 1, 1, 1, 1, 1),
+        )
+        self.assertIsNone(self.diskstats.sample(now=100))
+        self.write(
+            diskstats_line(8, 0, "sda", 200, 3000, 150, 300, 8000, 250, 6000),
+            diskstats_line(8, 1, "sda1", 200, 3000, 150, 300, 8000, 250, 6000),
+            diskstats_line(7, 0, "loop0", 9, 9, 9, 9, 9, 9, 9),
+        )
+        stats = self.diskstats.sample(now=110)
+        self.assertEqual([entry["device"] for entry in stats], ["sda"])
+        self.assertEqual(stats[0], {
+            "device": "sda",
+            "read_bytes": 2000 * 512 // 10,
+            "write_bytes": 4000 * 512 // 10,
+            "read_iops": 10.0,
+            "write_iops": 10.0,
+            "await": 1.0,
+            "util": 50.0,
+        })
+
+    def test_counter_reset(self):
+        self.assertEqual(counter_deltas((5, 7), (2, 7)), [3, 0])
+        self.assertIsNone(counter_deltas((5, 7), (2 ** 40, 7)))
+        self.write(diskstats_line(8, 0, "sda", 100, 1000, 50, 200, 4000, 150, 1000))
+        self.diskstats.sample(now=100)
+        # Device re-created: counters restart, no 2^64 jump
+        self.write(diskstats_line(8, 0, "sda", 10, 100, 5, 20, 400, 15, 100))
+        self.assertEqual(self.diskstats.sample(now=110), [])
+        # Rates again from the new baseline
+        self.write(diskstats_line(8, 0, "sda", 20, 200, 10, 20, 400, 15, 600))
+        stats = self.diskstats.sample(now=120)
+        self.assertEqual(stats[0]["read_iops"], 1.0)
+        self.assertEqual(stats[0]["util"], 5.0)
+
+    def test_saturation_event(self):
+        datastore = Datastore()
+        datastore.data["last_disk_info"] = {"disksinfo": []}
+        datastore.data["last_diskstats"] = {
+            "diskstats": [{"device": "sda", "util": 95.0}, {"device": "sdb", "util": 10.0}]
+        }
+        events = EventProcessor().process_changes(datastore)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["name"], "high_disk_io")
+        self.assertEqual(events[0]["data"]["event_type"], EventType.HIGH_DISK_IO)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Event aggregation tests
+"""
+# Standard
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from event_aggregator import EventAggregator
+from constants import LogLevel
+
+
+def disk_event(mountpoint, percent, level=LogLevel.WARNING):
+    return {"name": "high_disk_usage", "data": {
+        "disks_stats": {"mountpoint": mountpoint}, "event_value": percent, "log_level": level
+    }}
+
+
+class TestEventAggregator(unittest.TestCase):
+
+    def test_group_within_window(self):
+        aggregator = EventAggregator(window=5, jitter=0, burst=5, period=60)
+        aggregator.add([disk_event("/a", 85), disk_event("/b", 95, LogLevel.ALERT)], now=0)
+        aggregator.add([disk_event("/c", 88), {"name": "high_memory_usage", "data": {}}], now=2)
+        self.assertEqual(aggregator.flush(now=4), [])
+        notifications = aggregator.flush(now=7)
+        self.assertEqual([n["name"] for n in notifications], ["high_disk_usage", "high_memory_usage"])
+        disk = notifications[0]["data"]
+        self.assertEqual(disk["disks_stats"]["mountpoint"], "/b")
+        self.assertEqual(disk["count"], 3)
+        self.assertEqual([d["event_value"] for d in disk["aggregated"]], [88, 85])
+
+    def test_rate_limit_and_suppressed_count(self):
+        aggregator = EventAggregator(window=0, jitter=0, burst=2, period=60)
+        sent = []
+        for now in range(5):
+            aggregator.add([disk_event("/a", 85)], now=now)
+            sent.append([n["name"] for n in aggregator.flush(now=now)])
+        self.assertEqual(sent, [
+            ["high_disk_usage"], ["high_disk_usage"], ["events_suppressed"], [], []
+        ])
+        # Reported with the next notification of the class once a token is back
+        aggregator.add([disk_event("/a", 85)], now=61)
+        notifications = aggregator.flush(now=61)
+        self.assertEqual(len(notifications), 1)
+        self.assertEqual(notifications[0]["data"]["suppressed"], 2)
+        self.assertEqual(aggregator.total_suppressed, 3)
+
+if __name__ == '__main__':
+    unittest.main()
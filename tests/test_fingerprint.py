@@ -0,0 +1,61 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Change detection tests
+"""
+# Standard
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from fingerprint import fingerprint, ChangeTracker
+
+
+def disks(*percents):
+    return {
+        "disksinfo": [
+            {"mountpoint": f"/m{index}", "percent": percent, "stale": False}
+            for index, percent in enumerate(percents)
+        ],
+        "meminfo": {"percent": 10.0, "nested": {"a": [1, 2]}},
+    }
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(disks(1, 2)), fingerprint(disks(1, 2)))
+        self.assertNotEqual(fingerprint(disks(1, 2)), fingerprint(disks(1, 3)))
+        self.assertNotEqual(fingerprint({"a": [1, {"b": 2}]}), fingerprint({"a": [1, {"b": 3}]}))
+
+    def test_types(self):
+        # Equal hashes, different values
+        for old, new in ((1, 1.0), (0, False), (1, True)):
+            self.assertNotEqual(fingerprint({"a": old}), fingerprint({"a": new}))
+            self.assertNotEqual(fingerprint([old]), fingerprint([new]))
+            self.assertNotEqual(fingerprint({"a": [old, {}]}), fingerprint({"a": [new, {}]}))
+        # Documented limitation (CPython hash(-1) == hash(-2))
+        self.assertEqual(fingerprint({"a": -1}), fingerprint({"a": -2}))
+
+    def test_changed_parts(self):
+        tracker = ChangeTracker({"disksinfo": "mountpoint"})
+        self.assertEqual(tracker.update("last_disk_info", disks(1, 2)),
+                         {"disksinfo": None, "meminfo": None})
+        self.assertEqual(tracker.update("last_disk_info", disks(1, 2)), {})
+        # Changed entry, then removed entry
+        self.assertEqual(tracker.update("last_disk_info", disks(1, 5)), {"disksinfo": ["/m1"]})
+        self.assertEqual(tracker.update("last_disk_info", disks(1)), {"disksinfo": ["/m1"]})
+        value = disks(1)
+        value["meminfo"]["nested"]["a"].append(3)
+        del value["disksinfo"]
+        self.assertEqual(tracker.update("last_disk_info", value),
+                         {"meminfo": None, "disksinfo": None})
+        tracker.forget("last_disk_info")
+        self.assertTrue(tracker.update("last_disk_info", value))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Logging tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import syslog
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+import log_linux
+
+
+class Payload:
+    """ Counts the str conversions """
+    def __init__(self):
+        self.converted = 0
+
+    def __str__(self):
+        self.converted += 1
+        return "payload"
+
+
+class TestLog(unittest.TestCase):
+
+    def tearDown(self):
+        log_linux.set_log_level("debug")
+
+    def test_lazy_and_async(self):
+        payload = Payload()
+        with mock.patch.object(log_linux.syslog, "syslog") as syslog_call:
+            log_linux.set_log_level("info")
+            log_linux.log("Payload: %s", "debug", payload)
+            log_linux.logpo("Payload: ", payload, "debug")
+            self.assertEqual(payload.converted, 0)
+            log_linux.log("Payload: %s", "info", payload)
+            log_linux.logpo("Data: ", payload, "err")
+            log_linux.writer.stop()
+        self.assertEqual(payload.converted, 2)
+        syslog_call.assert_any_call(syslog.LOG_INFO, "Payload: payload")
+        syslog_call.assert_any_call(syslog.LOG_ERR, "Data: payload")
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            log_linux.log("message", "verbose")
+        with self.assertRaises(ValueError):
+            log_linux.set_log_level("verbose")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Host metadata cache and default route address tests (fake proc root)
+"""
+# Standard
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+import globals
+import info_linux
+from meta_cache import MetaCache
+
+ROUTE = (
+    "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+    "wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0\n"
+    "eth0\t0002A8C0\t00000000\t0001\t0\t0\t0\tFFFFFF00\t0\t0\t0\n"
+    "eth0\t00000000\t0102A8C0\t0003\t0\t0\t100\t00000000\t0\t0\t0\n"
+)
+
+
+class FakeSocket:
+    """ UDP socket of the route lookup fallback """
+    def __init__(self, *args):
+        self.connected = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def connect(self, address):
+        self.connected = address
+
+    def getsockname(self):
+        return ("192.168.1.7", 40000)
+
+
+class TestDefaultRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "net"))
+        self.proc_root = globals.PROC_ROOT
+        globals.PROC_ROOT = self.tmp.name
+
+    def tearDown(self):
+        globals.PROC_ROOT = self.proc_root
+        self.tmp.cleanup()
+
+    def write_route(self, content):
+        with open(os.path.join(self.tmp.name, "net", "route"), "w") as f:
+            f.write(content)
+
+    def test_lowest_metric_default_route(self):
+        self.write_route(ROUTE)
+        self.assertEqual(info_linux.get_default_route_interface(), "eth0")
+        with mock.patch("info_linux.get_interface_ip_address",
+                        return_value="192.168.2.10") as interface_address:
+            self.assertEqual(info_linux.get_ip_address(), "192.168.2.10")
+        interface_address.assert_called_once_with("eth0")
+
+    def test_udp_fallback(self):
+        # No default route
+        self.write_route(ROUTE.splitlines(True)[0] + ROUTE.splitlines(True)[2])
+        self.assertIsNone(info_linux.get_default_route_interface())
+        with mock.patch("info_linux.socket.socket", FakeSocket):
+            self.assertEqual(info_linux.get_ip_address(), "192.168.1.7")
+        with mock.patch("info_linux.socket.socket", side_effect=OSError):
+            self.assertEqual(info_linux.get_ip_address(), "127.0.0.1")
+
+    def test_missing_route_file(self):
+        self.assertIsNone(info_linux.get_default_route_interface())
+
+
+class TestMetaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.nodename = "host1"
+        patches = [
+            mock.patch("info_linux.get_nodename", lambda: self.nodename),
+            mock.patch("info_linux.get_hostname", lambda: self.nodename),
+            mock.patch("info_linux.get_ip_address", return_value="10.0.0.1"),
+            mock.patch("meta_cache.time.monotonic", lambda: self.now),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.ip_address = info_linux.get_ip_address
+        self.now = 1000.0
+
+    def test_refresh_on_interval_and_nodename(self):
+        cache = MetaCache(refresh_interval=600)
+        meta = cache.get_meta()
+        self.assertEqual(meta["nodename"], "host1")
+        self.assertEqual(meta["ip_address"], "10.0.0.1")
+        self.assertNotEqual(meta["uuid"], cache.get_meta()["uuid"])
+        self.assertEqual(self.ip_address.call_count, 1)
+
+        # Interval
+        self.now += 601
+        cache.get_meta()
+        self.assertEqual(self.ip_address.call_count, 2)
+        self.now += 10
+        cache.get_meta()
+        self.assertEqual(self.ip_address.call_count, 2)
+
+        # Nodename change, before the interval
+        self.nodename = "host2"
+        self.assertEqual(cache.get_meta()["hostname"], "host2")
+        self.assertEqual(self.ip_address.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Metrics history ring files tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from metrics_history import MetricsHistory
+
+
+class TestMetricsHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tiers = ((1, 120), (60, 60))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_query_and_downsampling(self):
+        history = MetricsHistory(self.tmp.name, self.tiers)
+        start = 1_000_020
+        for second in range(100):
+            history.add("cpu_usage", float(second), start + second)
+        now = start + 99
+        # 1s tier covers one minute
+        points = history.query("cpu_usage", 1, now)
+        self.assertEqual(points[-1], [now, 99.0, 99.0, 99.0])
+        self.assertEqual(len(points), 61)
+        # 1min tier for 10 minutes: bucket 1000020 - 1000079 and the current one
+        points = history.query("cpu_usage", 10, now)
+        self.assertEqual(points[0], [1_000_020, 29.5, 0.0, 59.0])
+        self.assertEqual(points[1], [1_000_080, 79.5, 60.0, 99.0])
+        self.assertEqual(history.query("unknown", 1, now), [])
+        history.close()
+
+    def test_ring_overwrite(self):
+        history = MetricsHistory(self.tmp.name, ((1, 10),))
+        for second in range(25):
+            history.add("memory", float(second), 500 + second)
+        points = history.query("memory", 1, 524)
+        # Only the last 10 seconds kept
+        self.assertEqual([point[0] for point in points], list(range(515, 525)))
+        history.close()
+
+    def test_persistence_and_geometry_change(self):
+        history = MetricsHistory(self.tmp.name, self.tiers)
+        history.add("loadavg", 1.5, 2000)
+        history.add("iowait", 0.5, 2000)
+        history.close()
+        history = MetricsHistory(self.tmp.name, self.tiers)
+        # Previous run metrics, before any new sample
+        self.assertEqual(history.query_all(1, now=2001), {
+            "iowait": [[2000, 0.5, 0.5, 0.5]], "loadavg": [[2000, 1.5, 1.5, 1.5]]
+        })
+        history.add("loadavg", 2.5, 2001)
+        self.assertEqual(history.query("loadavg", 1, 2001),
+                         [[2000, 1.5, 1.5, 1.5], [2001, 2.5, 2.5, 2.5]])
+        history.close()
+        # Other tiers: files recreated
+        history = MetricsHistory(self.tmp.name, ((1, 30),))
+        history.add("loadavg", 3.0, 2002)
+        self.assertEqual(history.query("loadavg", 1, 2002), [[2002, 3.0, 3.0, 3.0]])
+        self.assertEqual(history.query_all(1, now=2002),
+                         {"iowait": [], "loadavg": [[2002, 3.0, 3.0, 3.0]]})
+        history.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Mount table tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import tempfile
+import threading
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from mounts import MountTable, parse_mountinfo
+from statvfs_pool import StatvfsPool
+
+MOUNTINFO = (
+    "22 1 8:1 / / rw,relatime shared:1 - ext4 /dev/sda1 rw,errors=remount-ro\n"
+    "23 22 0:21 / /proc rw,nosuid shared:12 - proc proc rw\n"
+    "24 22 8:2 / /mnt/my\\040disk rw,relatime shared:2 master:1 - xfs /dev/sdb1 rw\n"
+    "25 22 0:50 / /var/lib/docker/overlay2/abc/merged rw - overlay overlay rw,lowerdir=/x\n"
+)
+
+
+class TestMounts(unittest.TestCase):
+
+    def test_parse_mountinfo(self):
+        self.assertEqual(parse_mountinfo(MOUNTINFO), [
+            ("/dev/sda1", "/", "ext4"),
+            ("proc", "/proc", "proc"),
+            ("/dev/sdb1", "/mnt/my disk", "xfs"),
+            ("overlay", "/var/lib/docker/overlay2/abc/merged", "overlay"),
+        ])
+
+    def test_filter_applied_once_per_reload(self):
+        with tempfile.NamedTemporaryFile("w", suffix="mountinfo") as f:
+            f.write(MOUNTINFO)
+            f.flush()
+            table = MountTable(f.name, mount_filter=lambda mount: mount[0].startswith("/dev/"))
+            self.assertEqual(table.get_mounts(), [
+                ("/dev/sda1", "/", "ext4"),
+                ("/dev/sdb1", "/mnt/my disk", "xfs"),
+            ])
+            # Regular file: no change notification, the cached table is kept
+            table.get_mounts()
+            self.assertEqual(table.reloads, 1)
+            table.close()
+
+
+
+class TestStatvfsPool(unittest.TestCase):
+
+    def test_hung_mount_stale_and_quarantined(self):
+        release = threading.Event()
+        real_statvfs = os.statvfs
+
+        def fake_statvfs(path):
+            if path == "/hung" and hung:
+                release.wait(5)
+            return real_statvfs("/")
+
+        pool = StatvfsPool(workers=2, timeout=0.1)
+        hung = False
+        with mock.patch("statvfs_pool.os.statvfs", fake_statvfs):
+            result = pool.statvfs_many(["/", "/hung"], now=0)
+            self.assertFalse(result["/hung"][1])
+
+            hung = True
+            result = pool.statvfs_many(["/", "/hung"], now=10)
+            self.assertFalse(result["/"][1])
+            self.assertTrue(result["/hung"][1])
+            self.assertIn("/hung", pool.quarantine)
+
+            # Quarantined: not asked again, last value kept
+            result = pool.statvfs_many(["/", "/hung"], now=11)
+            self.assertTrue(result["/hung"][1])
+
+            hung = False
+            release.set()
+            pool.pending["/hung"].result(5)
+            result = pool.statvfs_many(["/", "/hung"], now=12)
+            self.assertNotIn("/hung", pool.quarantine)
+            self.assertNotIn("/hung", pool.pending)
+        pool.shutdown()
+
+    def test_hung_mount_replaced_worker(self):
+        release = threading.Event()
+        real_statvfs = os.statvfs
+
+        def fake_statvfs(path):
+            if path == "/hung":
+                release.wait(5)
+            return real_statvfs("/")
+
+        pool = StatvfsPool(workers=1, timeout=0.1)
+        try:
+            with mock.patch("statvfs_pool.os.statvfs", fake_statvfs), \
+                    mock.patch("statvfs_pool.log") as log:
+                for now in range(5):
+                    result = pool.statvfs_many(["/hung", "/"], now=now * 100)
+                    # The only worker hung: a new one answers
+                    self.assertFalse(result["/"][1])
+                self.assertEqual(list(pool.pending), ["/hung"])
+                # One thread per hung mount
+                self.assertEqual(pool.pool.threads, 2)
+                workers = [thread for thread in threading.enumerate()
+                           if thread.name.startswith("statvfs")]
+                self.assertTrue(all(thread.daemon for thread in workers))
+                self.assertEqual([call.args[1] for call in log.call_args_list], ["warning"])
+        finally:
+            release.set()
+            pool.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+/proc/net/dev collector tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from netdev import NetDev
+from proc_reader import ProcReader
+
+HEADER = (
+    "Inter-|   Receive                                                |  Transmit\n"
+    " face |bytes    packets errs drop fifo frame compressed multicast|"
+    "bytes    packets errs drop fifo colls carrier compressed\n"
+)
+
+
+def netdev_line(name, rx_bytes, rx_packets, rx_drop, tx_bytes, tx_packets):
+    return (
+        f"{name:>6}: {rx_bytes} {rx_packets} 0 {rx_drop} 0 0 0 0 "
+        f"{tx_bytes} {tx_packets} 0 0 0 0 0 0\n"
+    )
+
+
+class TestNetDev(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.proc = os.path.join(self.tmp.name, "proc")
+        sys_root = os.path.join(self.tmp.name, "sys")
+        os.makedirs(os.path.join(self.proc, "net"))
+        os.makedirs(os.path.join(sys_root, "class", "net", "eth0"))
+        with open(os.path.join(sys_root, "class", "net", "eth0", "speed"), "w") as f:
+            f.write("1000\n")
+        self.reader = ProcReader(self.proc)
+        self.netdev = NetDev(("lo", "veth*"), sys_root, self.reader)
+
+    def tearDown(self):
+        self.reader.close()
+        self.tmp.cleanup()
+
+    def write(self, *lines):
+        with open(os.path.join(self.proc, "net", "dev"), "w") as f:
+            f.write(HEADER + "".join(lines))
+
+    def test_rates_and_ignore(self):
+        self.write(
+            netdev_line("lo", 10, 1, 0, 10, 1),
+            netdev_line("eth0", 0, 1000, 0, 0, 1000),
+            netdev_line("veth12ab", 0, 0, 0, 0, 0),
+            netdev_line("eth1", 0, 0, 0, 0, 0),
+        )
+        self.assertIsNone(self.netdev.sample(now=0))
+        self.write(
+            netdev_line("lo", 20, 2, 0, 20, 2),
+            # 1250000000 bytes in 10s (1 Gb/s)
+            netdev_line("eth0", 1250000000, 1980, 20, 0, 2000),
+            netdev_line("veth12ab", 5, 5, 5, 5, 5),
+            netdev_line("eth1", 100, 10, 0, 0, 0),
+        )
+        stats = {entry["interface"]: entry for entry in self.netdev.sample(now=10)}
+        self.assertEqual(sorted(stats), ["eth0", "eth1"])
+        eth0 = stats["eth0"]
+        self.assertEqual(eth0["rx_bytes"], 125000000)
+        self.assertEqual(eth0["rx_packets"], 98.0)
+        self.assertEqual(eth0["rx_drops"], 2.0)
+        self.assertEqual(eth0["drop_percent"], 1.0)
+        self.assertEqual(eth0["util"], 100)
+        # Unknown link speed: no utilization
+        self.assertNotIn("util", stats["eth1"])
+
+    def test_counter_reset(self):
+        self.write(netdev_line("eth0", 2 ** 40, 1000, 0, 2 ** 40, 1000))
+        self.netdev.sample(now=0)
+        # Interface re-created: 64 bit counters restart, not a wrap
+        self.write(netdev_line("eth0", 5000, 10, 0, 5000, 10))
+        self.assertEqual(self.netdev.sample(now=10), [])
+        # Rates again from the new baseline, no high_network_usage spike
+        self.write(netdev_line("eth0", 15000, 20, 0, 5000, 10))
+        eth0 = self.netdev.sample(now=20)[0]
+        self.assertEqual(eth0["rx_bytes"], 1000)
+        self.assertEqual(eth0["util"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Native /proc/net scanner tests (fake proc root)
+"""
+# Standard
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import socket
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+import proc_net
+from socket_index import SocketInodeIndex
+from port_watcher import PortWatcher, port_change_events
+from tasks import check_listen_ports
+from constants import EventType
+
+TCP = (
+    "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+    "   0: 0100007F:BC8F 00000000:0000 0A 00000000:00000000 00:00000000 00000000 0 0 907 1 0 100 0 0 10 0\n"
+    "   1: 00000000:0016 00000000:0000 0A 00000000:00000000 00:00000000 00000000 0 0 100 1 0 100 0 0 10 0\n"
+    "   2: 0100007F:0016 0100007F:D2B4 01 00000000:00000000 00:00000000 00000000 0 0 101 1 0 100 0 0 10 0\n"
+)
+TCP6 = (
+    "  sl  local_address                         remote_address                        st tx_queue\n"
+    "   0: 00000000000000000000000000000000:0016 00000000000000000000000000000000:0000 0A "
+    "00000000:00000000 00:00000000 00000000 0 0 102 1 0 100 0 0 10 0\n"
+    "   1: 00000000000000000000000001000000:0277 00000000000000000000000000000000:0000 0A "
+    "00000000:00000000 00:00000000 00000000 0 0 103 1 0 100 0 0 10 0\n"
+)
+UDP = (
+    "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+    "   0: 3500007F:0035 00000000:0000 07 00000000:00000000 00:00000000 00000000 0 0 104 2 0 0\n"
+)
+
+
+class TestProcNet(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        os.makedirs(os.path.join(root, "net"))
+        for name, content in (("tcp", TCP), ("tcp6", TCP6), ("udp", UDP)):
+            with open(os.path.join(root, "net", name), "w") as f:
+                f.write(content)
+        self.add_process("10", "sshd", (100, 102))
+        self.add_process("20", "cupsd", (103,))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_listen_sockets(self):
+        sockets = proc_net.read_listen_sockets(self.tmp.name)
+        self.assertEqual(sockets, [
+            ("tcp", "ipv4", "127.0.0.1", 48271, 907),
+            ("tcp", "ipv4", "0.0.0.0", 22, 100),
+            ("tcp", "ipv6", "[::]", 22, 102),
+            ("tcp", "ipv6", "[::1]", 631, 103),
+            ("udp", "ipv4", "127.0.0.53", 53, 104),
+        ])
+
+    def test_get_listen_ports(self):
+        records = proc_net.get_listen_ports(self.tmp.name)
+        self.assertEqual(records, [
+            {'interface': '0.0.0.0', 'port': 22, 'service': 'sshd',
+             'protocol': 'tcp', 'ip_version': 'ipv4'},
+            {'interface': '[::]', 'port': 22, 'service': 'sshd',
+             'protocol': 'tcp', 'ip_version': 'ipv6'},
+            {'interface': '[::1]', 'port': 631, 'service': 'cupsd',
+             'protocol': 'tcp', 'ip_version': 'ipv6'},
+        ])
+
+    def add_process(self, pid, comm, inodes):
+        root = self.tmp.name
+        os.makedirs(os.path.join(root, pid, "fd"))
+        with open(os.path.join(root, pid, "comm"), "w") as f:
+            f.write(comm + "\n")
+        for fd, inode in enumerate(inodes):
+            os.symlink(f"socket:[{inode}]", os.path.join(root, pid, "fd", str(fd)))
+
+    def test_socket_index_incremental(self):
+        index = SocketInodeIndex(self.tmp.name, full_rescan=3600)
+        self.assertEqual(index.owners([100, 102, 103, 907]), {100: ["sshd"], 102: ["sshd"], 103: ["cupsd"]})
+        self.assertEqual(index.full_scans, 1)
+        self.assertEqual(index.unresolved, {907})
+        scans = index.scans
+        # Nothing changed: no pid scanned
+        index.owners([100, 102, 103, 907])
+        self.assertEqual(index.scans, scans)
+        # New forked child holding the socket, new listener on a known pid
+        self.add_process("30", "sshd-child", (100,))
+        os.symlink("socket:[105]", os.path.join(self.tmp.name, "20", "fd", "9"))
+        owners = index.owners([100, 103, 105])
+        self.assertEqual(owners[100], ["sshd", "sshd-child"])
+        self.assertEqual(owners[105], ["cupsd"])
+        # Dead pid
+        shutil.rmtree(os.path.join(self.tmp.name, "30"))
+        self.assertEqual(index.owners([100])[100], ["sshd"])
+        self.assertEqual(index.full_scans, 1)
+
+    def test_socket_index_max_pids(self):
+        index = SocketInodeIndex(self.tmp.name, full_rescan=3600, max_pids=2)
+        index.owners([100, 103])
+        self.add_process("30", "nginx", (106,))
+        # Over the limit: not indexed, no full rescan
+        self.assertEqual(index.owners([100, 103, 106]), {100: ["sshd"], 103: ["cupsd"]})
+        self.assertEqual(index.stats()["skipped"], 1)
+        self.assertEqual(len(index.pids), 2)
+        self.assertEqual(index.full_scans, 1)
+        # Room again
+        shutil.rmtree(os.path.join(self.tmp.name, "20"))
+        self.assertEqual(index.owners([100, 106]), {100: ["sshd"], 106: ["nginx"]})
+        self.assertEqual(index.stats()["skipped"], 0)
+
+
+class FakeDatastore:
+    """ get_data / update_data """
+    def __init__(self):
+        self.data = {}
+
+    def get_data(self, key):
+        return self.data.get(key)
+
+    def update_data(self, key, data):
+        self.data[key] = data
+
+
+class TestPortChangeEvents(unittest.TestCase):
+
+    def test_new_and_down(self):
+        ssh = {'interface': '0.0.0.0', 'port': 22, 'service': 'sshd',
+               'protocol': 'tcp', 'ip_version': 'ipv4'}
+        http = {'interface': '0.0.0.0', 'port': 80, 'service': 'nginx',
+                'protocol': 'tcp', 'ip_version': 'ipv4'}
+        dns = {'interface': '127.0.0.53', 'port': 53, 'service': 'resolved',
+               'protocol': 'udp', 'ip_version': 'ipv4'}
+        events = port_change_events([ssh, dns], [dict(ssh, service='sshd2'), http])
+        self.assertEqual(
+            [(event["name"], event["data"]["event_value"], event["data"]["event_type"])
+             for event in events],
+            [("port_new", 80, EventType.PORT_NEW), ("port_down", 53, EventType.PORT_DOWN)]
+        )
+
+    def test_check_listen_ports(self):
+        ssh = {'interface': '0.0.0.0', 'port': 22, 'service': 'sshd',
+               'protocol': 'tcp', 'ip_version': 'ipv4'}
+        http = {'interface': '0.0.0.0', 'port': 80, 'service': 'nginx',
+                'protocol': 'tcp', 'ip_version': 'ipv4'}
+        sent = []
+        events = []
+
+        def notify(name, data):
+            # As send_notification
+            data["name"] = name
+            sent.append((name, dict(data)))
+            data.pop("name")
+
+        datastore = FakeDatastore()
+        check_listen_ports(datastore, notify, events.extend, [ssh], startup=True)
+        check_listen_ports(datastore, notify, events.extend, [ssh], startup=False)
+        check_listen_ports(datastore, notify, events.extend, [http], startup=False)
+        self.assertEqual([name for name, _ in sent], ["listen_ports_info", "listen_ports_info"])
+        self.assertEqual(sent[1][1]["listen_ports_info"], [http])
+        # Port events go to the aggregator, not straight to the server
+        self.assertEqual([event["name"] for event in events], ["port_new", "port_down"])
+        self.assertEqual(datastore.get_data("last_listen_ports_info"), [http])
+
+
+class TestPortWatcher(unittest.TestCase):
+
+    def test_connection_closes_filtered_in_kernel(self):
+        watcher = PortWatcher()
+        if watcher.netlink is None:
+            self.skipTest("sock_diag destroy notifications unavailable")
+        self.addCleanup(watcher.close)
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        for _ in range(20):
+            client = socket.create_connection(server.getsockname())
+            accepted, _address = server.accept()
+            client.close()
+            accepted.close()
+        time.sleep(0.05)
+        # Connections (remote port) never reach the agent
+        with self.assertRaises(BlockingIOError):
+            watcher.netlink.recv(65536)
+        server.close()
+        time.sleep(0.05)
+        self.assertTrue(watcher._listen_destroyed())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Persistent /proc reader tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from proc_reader import ProcReader
+
+MEMINFO = (
+    "MemTotal:        8000000 kB\n"
+    "MemFree:         1000000 kB\n"
+    "MemAvailable:    4000000 kB\n"
+    "Buffers:          200000 kB\n"
+    "Cached:          1500000 kB\n"
+    "SwapCached:            0 kB\n"
+)
+
+
+class TestProcReader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.reader = ProcReader(self.tmp.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        with open(os.path.join(self.tmp.name, name), "w") as f:
+            f.write(content)
+
+    def test_meminfo_selected_fields(self):
+        self.write("meminfo", MEMINFO)
+        meminfo = self.reader.meminfo()
+        self.assertEqual(meminfo["MemTotal"], 8000000 * 1024)
+        # "Cached:" does not match "SwapCached:"
+        self.assertEqual(meminfo["Cached"], 1500000 * 1024)
+        self.assertNotIn("SwapCached", meminfo)
+
+    def test_reread_same_descriptor(self):
+        self.write("uptime", "100.50 200.00\n")
+        self.assertEqual(self.reader.uptime(), 100.5)
+        fd = self.reader.file("uptime").fd
+        # Rewrite in place, the open descriptor sees the new content
+        with open(os.path.join(self.tmp.name, "uptime"), "r+") as f:
+            f.write("101.75 201.00\n")
+        self.assertEqual(self.reader.uptime(), 101.75)
+        self.assertEqual(self.reader.file("uptime").fd, fd)
+
+    def test_stat_grows_buffer(self):
+        cpus = "".join(f"cpu{n} 1 2 3 4 5 6 7 8 0 0\n" for n in range(300))
+        self.write("stat", "cpu  10 20 30 40 50 60 70 80 0 0\n" + cpus)
+        self.assertEqual(self.reader.cpu_times(), (10, 20, 30, 40, 50, 60, 70, 80))
+        self.assertGreater(len(self.reader.file("stat").buffer), 4096)
+
+    def test_loadavg(self):
+        self.write("loadavg", "1.25 0.98 0.77 3/1520 43210\n")
+        self.assertEqual(self.reader.loadavg(), (1.25, 0.98, 0.77))
+
+
+if __name__ == '__main__':
+    unittest.main()
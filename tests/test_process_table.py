@@ -0,0 +1,73 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Top processes table tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from process_table import ProcessTable, CLK_TCK
+from datastore import Datastore
+from event_processor import EventProcessor
+
+
+class TestProcessTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, pid, comm, ticks, starttime=100, rss=256):
+        os.makedirs(os.path.join(self.tmp.name, str(pid)), exist_ok=True)
+        # pid (comm) state ppid pgrp session tty tpgid flags minflt cminflt majflt
+        # cmajflt utime stime cutime cstime prio nice threads itreal starttime vsize rss
+        fields = ["S", "1"] + ["0"] * 9 + [str(ticks), "0"] + ["0"] * 6 + [str(starttime), "0", str(rss)]
+        with open(os.path.join(self.tmp.name, str(pid), "stat"), "w") as f:
+            f.write(f"{pid} ({comm}) " + " ".join(fields) + " 0 0\n")
+
+    def test_top_eviction_and_pid_reuse(self):
+        table = ProcessTable(self.tmp.name, max_slots=3)
+        self.write(10, "idle proc", 0)
+        self.write(20, "busy (x)", 0, rss=1024)
+        self.write(30, "gone", 0)
+        self.write(40, "no slot", 0)
+        self.assertFalse(table.scan(now=0))
+        self.assertEqual(sorted(table.slots), [10, 20, 30])
+
+        shutil.rmtree(os.path.join(self.tmp.name, "30"))
+        self.write(20, "busy (x)", CLK_TCK * 5, rss=1024)
+        # pid 10 reused by a new process: no delta on its first scan
+        self.write(10, "new", CLK_TCK * 50, starttime=200)
+        self.assertTrue(table.scan(now=10))
+        top = table.top(2)
+        self.assertEqual(top["cpu"], [{
+            "pid": 20, "name": "busy (x)", "cpu": 50.0,
+            "rss": round(1024 * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2, 2)
+        }])
+        self.assertEqual(top["memory"][0]["pid"], 20)
+        self.assertNotIn(30, table.slots)
+        # Table was full, new process in the released slot
+        self.assertIn(40, table.slots)
+        self.assertEqual(table.comms[table.slots[10]], "new")
+
+    def test_attached_to_cpu_event(self):
+        datastore = Datastore()
+        datastore.data["last_disk_info"] = {"disksinfo": []}
+        datastore.data["last_cpu"] = {"total": {"usage": 95.0, "iowait": 0.0}}
+        top = {"cpu": [{"pid": 1, "name": "x", "cpu": 90.0, "rss": 1.0}], "memory": []}
+        events = EventProcessor().process_changes(datastore, top)
+        self.assertEqual(events[0]["name"], "high_cpu_usage")
+        self.assertEqual(events[0]["data"]["top_processes"], top["cpu"])
+
+
+if __name__ == '__main__':
+    unittest.main()
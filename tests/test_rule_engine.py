@@ -0,0 +1,147 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Rule engine tests
+"""
+# Standard
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from rule_engine import RuleEngine, DEFAULT_RULES, merge_rules
+from datastore import Datastore
+from constants import LogLevel
+
+
+def disks(*entries):
+    return {"disksinfo": [{"mountpoint": mp, "percent": percent} for mp, percent in entries]}
+
+
+class TestRuleEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.datastore = Datastore()
+
+    def set(self, key, value):
+        self.datastore.data[key] = value
+
+    def test_hysteresis_and_cooldown(self):
+        engine = RuleEngine([{
+            "name": "high_memory_usage", "source": "mem", "path": ("meminfo",),
+            "field": "percent", "event_type": 2, "cooldown": 100,
+        }])
+        self.set("mem", {"meminfo": {"percent": 85}})
+        events = engine.evaluate(self.datastore, 0)
+        self.assertEqual(events[0]["data"]["log_level"], LogLevel.WARNING)
+        # Below threshold but inside hysteresis: still active, no new event
+        self.set("mem", {"meminfo": {"percent": 78}})
+        self.assertEqual(engine.evaluate(self.datastore, 10), [])
+        # Escalation is sent despite the cooldown
+        self.set("mem", {"meminfo": {"percent": 95}})
+        events = engine.evaluate(self.datastore, 20)
+        self.assertEqual(events[0]["data"]["log_level"], LogLevel.ALERT)
+        # Still active: reminder after the cooldown, without data change
+        self.assertEqual(engine.evaluate(self.datastore, 60), [])
+        self.assertEqual(len(engine.evaluate(self.datastore, 121)), 1)
+
+    def test_escalation_after_clear_inside_cooldown(self):
+        engine = RuleEngine([{
+            "name": "high_memory_usage", "source": "mem", "path": ("meminfo",),
+            "field": "percent", "event_type": 2, "cooldown": 100, "hysteresis": 0,
+        }])
+        self.set("mem", {"meminfo": {"percent": 85}})
+        self.assertEqual(len(engine.evaluate(self.datastore, 0)), 1)
+        self.set("mem", {"meminfo": {"percent": 50}})
+        self.assertEqual(engine.evaluate(self.datastore, 10), [])
+        # Back at the same level: cooldown
+        self.set("mem", {"meminfo": {"percent": 86}})
+        self.assertEqual(engine.evaluate(self.datastore, 20), [])
+        self.set("mem", {"meminfo": {"percent": 50}})
+        engine.evaluate(self.datastore, 30)
+        # Back escalated: sent
+        self.set("mem", {"meminfo": {"percent": 95}})
+        events = engine.evaluate(self.datastore, 40)
+        self.assertEqual(events[0]["data"]["log_level"], LogLevel.ALERT)
+
+    def test_prune_keeps_cooldown_and_levels(self):
+        engine = RuleEngine([{
+            "name": "high_memory_usage", "source": "mem", "path": ("meminfo",),
+            "field": "percent", "event_type": 2, "cooldown": 1000, "hysteresis": 0,
+        }, {
+            "name": "high_disk_usage", "source": "disks", "path": ("disksinfo",),
+            "items": "mountpoint", "field": "percent", "event_type": 3, "cooldown": 10,
+        }])
+        self.set("mem", {"meminfo": {"percent": 85}})
+        self.set("disks", disks(*[(f"/srv/{n}", 85) for n in range(20)]))
+        self.assertEqual(len(engine.evaluate(self.datastore, 0)), 21)
+        self.set("mem", {"meminfo": {"percent": 50}})
+        self.set("disks", disks())
+        engine.evaluate(self.datastore, 1)
+        # Expiration shorter than the memory rule cooldown
+        engine.prune(500, 100)
+        self.assertEqual(list(engine.fired), ["high_memory_usage"])
+        self.assertEqual(list(engine.fired_levels), ["high_memory_usage"])
+        self.set("mem", {"meminfo": {"percent": 86}})
+        self.assertEqual(engine.evaluate(self.datastore, 600), [])
+        engine.prune(1100, 100)
+        self.assertEqual(engine.fired, {})
+        self.assertEqual(engine.fired_levels, {})
+        # Restored without level: the longest cooldown
+        engine.fired["high_disk_usage_/old"] = 1100
+        engine.prune(1200, 100)
+        self.assertIn("high_disk_usage_/old", engine.fired)
+        engine.prune(2101, 100)
+        self.assertEqual(engine.fired, {})
+
+    def test_invalid_attach(self):
+        engine = RuleEngine(merge_rules(DEFAULT_RULES, [{
+            "name": "high_load", "source": "load", "path": ("loadavg",), "field": "usage",
+            "event_type": 4, "attach": "io",
+        }]))
+        self.set("load", {"loadavg": {"usage": 95}})
+        events = engine.evaluate(self.datastore, 0, {"cpu": [], "memory": []})
+        self.assertEqual(events[0]["name"], "high_load")
+        self.assertNotIn("top_processes", events[0]["data"])
+
+    def test_sustain(self):
+        engine = RuleEngine([{
+            "name": "high_cpu_usage", "source": "cpu", "path": ("total",), "field": "usage",
+            "data": "value", "event_type": 4, "sustain": 30,
+        }])
+        self.set("cpu", {"total": {"usage": 95}})
+        self.assertEqual(engine.evaluate(self.datastore, 0), [])
+        self.assertEqual(engine.evaluate(self.datastore, 20), [])
+        events = engine.evaluate(self.datastore, 30)
+        self.assertEqual(events[0]["data"]["usage"], 95)
+        # Short spike does not fire
+        self.set("cpu", {"total": {"usage": 10}})
+        engine.evaluate(self.datastore, 40)
+        self.assertEqual(engine.timers, {})
+
+    def test_mountpoint_overrides_and_changed_only(self):
+        rules = merge_rules(DEFAULT_RULES, [
+            {"name": "high_disk_usage", "overrides": {"/backup": {"warn": 97, "alert": 99}}},
+            {"name": "high_network_drops", "enabled": False},
+        ])
+        engine = RuleEngine(rules)
+        self.assertNotIn("high_network_drops", [rule.name for rule in engine.rules])
+        entries = [(f"/srv/{n}", 10) for n in range(50)]
+        self.set("last_disk_info", disks(("/", 85), ("/backup", 96), *entries))
+        events = engine.evaluate(self.datastore, 0)
+        self.assertEqual([event["name"] for event in events], ["high_disk_usage"])
+        self.assertEqual(events[0]["data"]["disks_stats"]["mountpoint"], "/")
+        evaluations = engine.evaluations
+        # Unchanged datastore value: nothing evaluated
+        engine.evaluate(self.datastore, 1)
+        self.assertEqual(engine.evaluations, evaluations)
+        # One entry changed: one evaluation
+        self.set("last_disk_info", disks(("/", 85), ("/backup", 98), *entries))
+        engine.evaluate(self.datastore, 2)
+        self.assertEqual(engine.evaluations, evaluations + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Scheduler tests (fake clock)
+"""
+# Standard
+import unittest
+import sys
+import os
+import signal
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from scheduler import Scheduler, POLICY_CATCHUP
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(clock=self.clock)
+        self.calls = []
+
+    def job(self, name, runtime=0.0):
+        def func():
+            self.calls.append((name, self.clock.now))
+            self.clock.now += runtime
+        return func
+
+    def test_runtime_does_not_drift(self):
+        self.scheduler.add_job("a", self.job("a", runtime=2), 10)
+        for _ in range(3):
+            wait = self.scheduler.run_pending()
+            self.clock.now += wait
+        self.assertEqual([t for _, t in self.calls], [100.0, 110.0, 120.0])
+        self.assertEqual(self.scheduler.jobs["a"].stats()["runs"], 3)
+        self.assertEqual(self.scheduler.jobs["a"].stats()["last_runtime"], 2)
+
+    def test_skip_missed_deadlines(self):
+        self.scheduler.add_job("a", self.job("a", runtime=25), 10)
+        self.scheduler.run_pending()
+        job = self.scheduler.jobs["a"]
+        self.assertEqual(job.next_run, 130.0)
+        self.assertEqual(job.missed, 2)
+
+    def test_catchup(self):
+        self.scheduler.add_job("a", self.job("a"), 10, policy=POLICY_CATCHUP)
+        self.scheduler.run_pending()
+        self.clock.now = 125.0
+        self.scheduler.run_pending()
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(self.scheduler.jobs["a"].next_run, 130.0)
+
+    def test_set_interval_from_job(self):
+        def func():
+            self.calls.append(self.clock.now)
+            self.scheduler.set_interval("a", 5)
+        self.scheduler.add_job("a", func, 10)
+        self.scheduler.run_pending()
+        self.assertEqual(self.scheduler.jobs["a"].next_run, 105.0)
+        self.assertEqual(len(self.scheduler._heap), 1)
+
+    def test_job_error_counted(self):
+        def fail():
+            raise RuntimeError("boom")
+        self.scheduler.add_job("a", fail, 10)
+        self.scheduler.run_pending()
+        self.assertEqual(self.scheduler.jobs["a"].errors, 1)
+
+
+class TestSchedulerStop(unittest.TestCase):
+
+    def test_stop_from_signal_handler(self):
+        scheduler = Scheduler()
+        runs = []
+
+        def job():
+            runs.append(1)
+            os.kill(os.getpid(), signal.SIGUSR2)
+
+        old_handler = signal.signal(signal.SIGUSR2, lambda signum, frame: scheduler.stop())
+        try:
+            scheduler.add_job("a", job, 0.05)
+            scheduler.run()
+        finally:
+            signal.signal(signal.SIGUSR2, old_handler)
+        self.assertEqual(runs, [1])
+        self.assertFalse(scheduler.running)
+
+    def test_stop_before_run(self):
+        scheduler = Scheduler()
+        runs = []
+        scheduler.add_job("a", lambda: runs.append(1), 0.05)
+        scheduler.stop()
+        scheduler.run()
+        self.assertEqual(runs, [])
+
+    def test_add_job_wakes_run(self):
+        scheduler = Scheduler()
+        scheduler.add_job("idle", lambda: None, 100, delay=100)
+        timer = threading.Timer(0.1, scheduler.add_job, args=("stop", scheduler.stop, 100))
+        start = time.monotonic()
+        timer.start()
+        scheduler.run()
+        timer.join()
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_stop_before_wait_not_lost(self):
+        scheduler = None
+        calls = []
+
+        def clock():
+            # Second deadline computed right before the wait (the first one
+            # skips it, add_job woke run): stop() lands there
+            calls.append(1)
+            if len(calls) == 5:
+                scheduler.stop()
+            return time.monotonic()
+
+        scheduler = Scheduler(clock=clock)
+        scheduler.add_job("idle", lambda: None, 100, delay=100)
+        start = time.monotonic()
+        scheduler.run()
+        self.assertLess(time.monotonic() - start, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
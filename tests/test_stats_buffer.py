@@ -0,0 +1,57 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Ring buffer / sampler tests
+"""
+# Standard
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from stats_buffer import RingBuffer, MetricSampler
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_wraps_oldest_first(self):
+        buffer = RingBuffer(3)
+        for value in range(5):
+            buffer.add(value)
+        self.assertEqual(buffer.values(), [2.0, 3.0, 4.0])
+        self.assertEqual(buffer.last(), 4.0)
+
+    def test_summary(self):
+        buffer = RingBuffer(100)
+        for value in range(1, 101):
+            buffer.add(value)
+        summary = buffer.summary()
+        self.assertEqual(summary["min"], 1)
+        self.assertEqual(summary["max"], 100)
+        self.assertEqual(summary["mean"], 50.5)
+        self.assertEqual(summary["p95"], 95)
+        self.assertEqual(summary["last"], 100)
+        self.assertEqual(summary["samples"], 100)
+
+    def test_empty(self):
+        self.assertIsNone(RingBuffer(3).summary())
+        self.assertIsNone(RingBuffer(3).last())
+
+
+class TestMetricSampler(unittest.TestCase):
+
+    def test_summary_resets_interval(self):
+        sampler = MetricSampler(size=10)
+        sampler.add("iowait", 1.0)
+        sampler.add("iowait", 30.0)
+        sampler.add("iowait", 2.0)
+        summary = sampler.summary()
+        self.assertEqual(summary["iowait"]["max"], 30.0)
+        self.assertEqual(summary["iowait"]["last"], 2.0)
+        self.assertEqual(sampler.summary(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
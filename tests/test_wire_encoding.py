@@ -0,0 +1,75 @@
+"""
+@copyright Copyright CC BY-NC-ND 4.0 @ 2020 - 2024 Diego Garcia (diego/@/envigo.net)
+
+Wire encoding tests
+"""
+# Standard
+import unittest
+import sys
+import os
+import gzip
+import json
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Local
+from wire_encoding import WireEncoder
+
+META = {
+    "timestamp": "2024-12-01T10:00:00+00:00", "timezone": "UTC", "hostname": "host",
+    "nodename": "host", "ip_address": "10.0.0.1", "agent_version": "0.131", "uuid": "x"
+}
+
+
+class TestWireEncoder(unittest.TestCase):
+
+    def test_compact_json(self):
+        body, headers = WireEncoder().encode({"a": 1, "b": [1, 2]})
+        self.assertEqual(body, b'{"a":1,"b":[1,2]}')
+        self.assertEqual(headers, {"Content-Type": "application/json"})
+
+    def test_gzip_over_threshold(self):
+        encoder = WireEncoder(gzip_threshold=10)
+        encoder.negotiate({"gzip": True})
+        payload = {"data": "x" * 100}
+        body, headers = encoder.encode(payload)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(body)), payload)
+        _body, headers = encoder.encode({"a": 1})
+        self.assertNotIn("Content-Encoding", headers)
+
+    def test_meta_sent_until_acked(self):
+        encoder = WireEncoder()
+        meta = encoder.compact_meta(META)
+        self.assertEqual(meta["hostname"], "host")
+        encoder.negotiate({"meta_ack": meta["meta_id"]})
+        compact = encoder.compact_meta(META)
+        self.assertEqual(set(compact), {"timestamp", "uuid", "meta_id"})
+        # Static meta change: full meta again
+        changed = dict(META, ip_address="10.0.0.2")
+        self.assertIn("hostname", encoder.compact_meta(changed))
+
+    def test_meta_digest_cached(self):
+        encoder = WireEncoder()
+        meta_id = encoder.compact_meta(META)["meta_id"]
+        with mock.patch("wire_encoding.hashlib.sha1") as sha1:
+            self.assertEqual(encoder.compact_meta(dict(META, uuid="y"))["meta_id"], meta_id)
+        sha1.assert_not_called()
+
+    def test_meta_ack_dropped(self):
+        encoder = WireEncoder()
+        meta_id = encoder.compact_meta(META)["meta_id"]
+        encoder.negotiate({"meta_ack": meta_id})
+        self.assertNotIn("hostname", encoder.compact_meta(META))
+        # Server lost its meta cache
+        encoder.negotiate({"meta_resend": True})
+        self.assertIn("hostname", encoder.compact_meta(META))
+        encoder.negotiate({"meta_ack": meta_id})
+        # Connection reset
+        encoder.forget_meta()
+        self.assertIn("hostname", encoder.compact_meta(META))
+
+
+if __name__ == '__main__':
+    unittest.main()